@@ -0,0 +1,254 @@
+"""
+Micro-benchmarks of every buffer class of ``rlopt.common.buffer`` (drivers in
+``buffers.py``), parametrized over the number of environments, the buffer size, the
+observation dimension and the episode reset density. For each combination:
+
+- ``add``: latency of one ``add`` call (one step of all environments), over
+  ``--rounds`` fills of the buffer;
+- ``minibatch``: latency of one minibatch of ``get``/``get_generator`` (setup of
+  the generator included in the first one) or of one ``sample`` for replay
+  buffers;
+- memory: bytes held by the buffer, number of tensor allocations and peak of the
+  allocated bytes during one fill and during one epoch of minibatches. On CUDA these
+  come from the caching allocator statistics, on CPU from the torch profiler (peak
+  approximated from the allocation/free events), plus the peak of python/numpy
+  allocations from ``tracemalloc``.
+
+Prints a table in the style of pytest-benchmark and optionally writes the results
+as JSON.
+
+Usage::
+
+    python benchmarks/buffer_micro.py [--buffers "^Rollout"] [--n-envs 16 256] \
+        [--buffer-size 32 128] [--obs-dim 48 512] [--reset-prob 0.0 0.05] \
+        [--output buffers.json]
+"""
+
+import argparse
+import itertools
+import json
+import re
+import statistics
+import time
+import tracemalloc
+import traceback
+from typing import Callable, Dict, List
+
+import torch
+from torch.profiler import ProfilerActivity, profile
+
+from buffers import BUFFER_CLASSES, BufferDriver
+
+
+def summarize(times: List[float]) -> Dict[str, float]:
+    mean = statistics.fmean(times)
+    return {
+        "min": min(times),
+        "max": max(times),
+        "mean": mean,
+        "stddev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "median": statistics.median(times),
+        "ops": 1.0 / mean,
+        "rounds": len(times),
+    }
+
+
+def timed_round(driver: BufferDriver, buffer, batch_size: int, sync: Callable):
+    """Fill, finish and read the buffer once, return add and minibatch latencies."""
+    buffer.reset()
+    add_times = []
+    for t in range(driver.buffer_size):
+        start = time.perf_counter()
+        driver.add_step(buffer, t)
+        sync()
+        add_times.append(time.perf_counter() - start)
+    driver.finish(buffer)
+    sync()
+    minibatch_times = []
+    minibatches = iter(driver.minibatches(buffer, batch_size))
+    while True:
+        start = time.perf_counter()
+        try:
+            next(minibatches)
+        except StopIteration:
+            break
+        sync()
+        minibatch_times.append(time.perf_counter() - start)
+    return add_times, minibatch_times
+
+
+def buffer_bytes(buffer) -> int:
+    """Bytes of the tensors (and dicts of tensors) held by the buffer."""
+    total = 0
+    for value in vars(buffer).values():
+        values = value.values() if isinstance(value, dict) else [value]
+        total += sum(v.nbytes for v in values if isinstance(v, torch.Tensor))
+    return total
+
+
+def measure_memory(
+    fn: Callable[[], object], setup: Callable[[], object], device: torch.device
+) -> Dict[str, int]:
+    """
+    Tensor allocations and peak allocated bytes (above the start) during ``fn``, and
+    peak of the python allocations in a second call (``setup`` runs before both).
+    """
+    setup()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats(device)
+        before = torch.cuda.memory_stats(device)
+        fn()
+        torch.cuda.synchronize()
+        after = torch.cuda.memory_stats(device)
+        allocations = after["allocation.all.allocated"] - before.get(
+            "allocation.all.allocated", 0
+        )
+        peak = after["allocated_bytes.all.peak"] - before.get(
+            "allocated_bytes.all.current", 0
+        )
+    else:
+        with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+            fn()
+        # self memory usage counts each allocation/free once, in the op doing it
+        events = sorted(prof.events(), key=lambda e: e.time_range.start)
+        allocations, current, peak = 0, 0, 0
+        for event in events:
+            if event.self_cpu_memory_usage > 0:
+                allocations += 1
+            current += event.self_cpu_memory_usage
+            peak = max(peak, current)
+
+    # separately, tracemalloc slows down the profiler post-processing a lot
+    setup()
+    tracemalloc.start()
+    fn()
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "allocations": allocations,
+        "peak_bytes": peak,
+        "python_peak_bytes": python_peak,
+    }
+
+
+def bench(name: str, params: Dict, args) -> Dict:
+    driver = BufferDriver(name, device=args.device, seed=args.seed, **params)
+    device = driver.device
+    sync = torch.cuda.synchronize if device.type == "cuda" else (lambda: None)
+    buffer = driver.build()
+    result = {"buffer_bytes": buffer_bytes(buffer)}
+
+    # warmup round (lazy initializations, compilation of the generators)
+    timed_round(driver, buffer, args.batch_size, sync)
+    add_times, minibatch_times = [], []
+    for _ in range(args.rounds):
+        add, minibatch = timed_round(driver, buffer, args.batch_size, sync)
+        add_times += add
+        minibatch_times += minibatch
+    result["add"] = summarize(add_times)
+    result["add"]["transitions_per_s"] = driver.n_envs / result["add"]["mean"]
+    result["minibatch"] = summarize(minibatch_times)
+
+    if not args.no_memory:
+        result["add"]["memory"] = measure_memory(
+            lambda: driver.fill(buffer), buffer.reset, device
+        )
+        result["minibatch"]["memory"] = measure_memory(
+            lambda: driver.read(buffer, args.batch_size),
+            lambda: (buffer.reset(), driver.fill(buffer), driver.finish(buffer)),
+            device,
+        )
+    return result
+
+
+def print_table(results: Dict[str, Dict]) -> None:
+    header = (
+        "Name (time in us)",
+        "Min",
+        "Max",
+        "Mean",
+        "StdDev",
+        "Median",
+        "OPS",
+        "Rounds",
+        "Allocs",
+        "Peak (KiB)",
+    )
+    rows, errors = [], []
+    for name, result in results.items():
+        if "error" in result:
+            errors.append(f"{name}: {result['error']}")
+            continue
+        for phase in ("add", "minibatch"):
+            stats = result[phase]
+            memory = stats.get("memory", {})
+            rows.append(
+                (
+                    f"{phase}:{name}",
+                    *(
+                        f"{stats[k] * 1e6:.1f}"
+                        for k in ("min", "max", "mean", "stddev", "median")
+                    ),
+                    f"{stats['ops']:.1f}",
+                    str(stats["rounds"]),
+                    str(memory.get("allocations", "-")),
+                    f"{memory['peak_bytes'] / 1024:.1f}" if memory else "-",
+                )
+            )
+    widths = [max(len(row[i]) for row in rows + [header]) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+    if errors:
+        print("\nErrors:\n" + "\n".join(errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--buffers", type=str, default=None, help="Regex on class names"
+    )
+    parser.add_argument("--n-envs", type=int, nargs="+", default=[16, 256])
+    parser.add_argument("--buffer-size", type=int, nargs="+", default=[32, 128])
+    parser.add_argument("--obs-dim", type=int, nargs="+", default=[48, 512])
+    parser.add_argument("--reset-prob", type=float, nargs="+", default=[0.0, 0.05])
+    parser.add_argument("--action-dim", type=int, default=12)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    names = [
+        n for n in BUFFER_CLASSES if args.buffers is None or re.search(args.buffers, n)
+    ]
+    grid = [
+        dict(
+            n_envs=n, buffer_size=s, obs_dim=o, reset_prob=p, action_dim=args.action_dim
+        )
+        for n, s, o, p in itertools.product(
+            args.n_envs, args.buffer_size, args.obs_dim, args.reset_prob
+        )
+    ]
+    results = {}
+    for name in names:
+        for params in grid:
+            case_id = "-".join(
+                f"{k}={v}" for k, v in params.items() if k != "action_dim"
+            )
+            try:
+                results[f"{name}[{case_id}]"] = bench(name, params, args)
+            except Exception as e:
+                traceback.print_exc()
+                results[f"{name}[{case_id}]"] = {"error": f"{type(e).__name__}: {e}"}
+
+    print_table(results)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Drivers filling and reading every buffer class of ``rlopt.common.buffer`` with
+synthetic data, shared by the benchmark suite and the buffer micro-benchmarks.
+
+A driver builds the buffer, adds one step of pre-generated data per ``add_step``
+call (episode starts drawn with probability ``reset_prob``), finishes the rollout
+(GAE for rollout buffers) and reads it in minibatches (``get`` generators for
+rollout buffers, ``sample`` for replay buffers).
+"""
+
+from typing import Callable, Dict, Iterator
+
+import numpy as np
+import torch
+from gymnasium import spaces
+from sb3_contrib.common.recurrent.type_aliases import RNNStates
+
+from rlopt.common import buffer as buffers
+
+BUFFER_CLASSES = [
+    "ReplayBuffer",
+    "DictReplayBuffer",
+    "RolloutBuffer",
+    "DictRolloutBuffer",
+    "RecurrentRolloutBuffer",
+    "RecurrentDictRolloutBuffer",
+    "RecurrentSequenceRolloutBuffer",
+    "RecurrentSequenceDictRolloutBuffer",
+    "RLOptDictRecurrentReplayBuffer",
+]
+
+
+class BufferDriver:
+    """
+    :param name: Buffer class name in ``rlopt.common.buffer``
+    :param n_envs: Number of environments
+    :param buffer_size: Steps per environment
+    :param obs_dim: Observation dimension (of each group for dict buffers)
+    :param action_dim: Action dimension
+    :param hidden_size: LSTM hidden size of the recurrent buffers
+    :param reset_prob: Probability of an episode start at each step
+    :param device: Device of the buffer
+    :param seed: Seed of the synthetic data
+    """
+
+    def __init__(
+        self,
+        name: str,
+        n_envs: int = 64,
+        buffer_size: int = 128,
+        obs_dim: int = 48,
+        action_dim: int = 12,
+        hidden_size: int = 64,
+        reset_prob: float = 0.01,
+        device: str = "cpu",
+        seed: int = 0,
+    ):
+        self.name = name
+        self.cls = getattr(buffers, name)
+        self.n_envs = n_envs
+        self.buffer_size = buffer_size
+        self.device = torch.device(device)
+        self.is_dict = "Dict" in name
+        self.is_replay = name in ("ReplayBuffer", "DictReplayBuffer")
+        self.is_recurrent = "Recurrent" in name
+        box = spaces.Box(-np.inf, np.inf, shape=(obs_dim,), dtype=np.float32)
+        self.observation_space = (
+            spaces.Dict({"teacher": box, "student": box}) if self.is_dict else box
+        )
+        self.action_space = spaces.Box(-1, 1, shape=(action_dim,), dtype=np.float32)
+        self.hidden_state_shape = (buffer_size, 1, n_envs, hidden_size)
+
+        generator = torch.Generator().manual_seed(seed)
+
+        def randn(*shape):
+            return torch.randn(*shape, generator=generator).to(self.device)
+
+        def observation():
+            if self.is_dict:
+                return {
+                    "teacher": randn(n_envs, obs_dim),
+                    "student": randn(n_envs, obs_dim),
+                }
+            return randn(n_envs, obs_dim)
+
+        # a few distinct steps are enough, they are reused cyclically
+        n_distinct = min(buffer_size, 16)
+        self.steps = [
+            {
+                "obs": observation(),
+                "next_obs": observation(),
+                "action": randn(n_envs, action_dim).clamp(-1, 1),
+                "reward": randn(n_envs),
+                "value": randn(n_envs),
+                "log_prob": randn(n_envs),
+                "episode_start": (
+                    torch.rand(n_envs, generator=generator) < reset_prob
+                ).to(self.device, torch.float32),
+            }
+            for _ in range(n_distinct)
+        ]
+        self.lstm_states = RNNStates(
+            (randn(1, n_envs, hidden_size), randn(1, n_envs, hidden_size)),
+            (randn(1, n_envs, hidden_size), randn(1, n_envs, hidden_size)),
+        )
+        self.infos = [{} for _ in range(n_envs)]
+        self.last_values = randn(n_envs)
+        self.last_dones = torch.zeros(n_envs, device=self.device)
+
+    def build(self):
+        kwargs = dict(device=self.device, n_envs=self.n_envs)
+        if self.is_replay:
+            # replay buffer sizes count transitions of all environments
+            return self.cls(
+                self.buffer_size * self.n_envs,
+                self.observation_space,
+                self.action_space,
+                **kwargs,
+            )
+        if self.is_recurrent:
+            kwargs["hidden_state_shape"] = self.hidden_state_shape
+        return self.cls(
+            self.buffer_size, self.observation_space, self.action_space, **kwargs
+        )
+
+    def add_step(self, buffer, t: int) -> None:
+        step = self.steps[t % len(self.steps)]
+        if self.is_replay:
+            buffer.add(
+                step["obs"],
+                step["next_obs"],
+                step["action"],
+                step["reward"],
+                step["episode_start"],
+                self.infos,
+            )
+            return
+        args = (
+            step["obs"],
+            step["action"],
+            step["reward"],
+            step["episode_start"],
+            step["value"],
+            step["log_prob"],
+        )
+        if self.name == "RLOptDictRecurrentReplayBuffer":
+            buffer.add(*args, self.lstm_states, step["episode_start"])
+        elif self.is_recurrent:
+            buffer.add(*args, lstm_states=self.lstm_states)
+        else:
+            buffer.add(*args)
+
+    def fill(self, buffer) -> None:
+        for t in range(self.buffer_size):
+            self.add_step(buffer, t)
+
+    def finish(self, buffer) -> None:
+        """GAE of rollout buffers, nothing for replay buffers."""
+        if not self.is_replay:
+            buffer.compute_returns_and_advantage(
+                last_values=self.last_values, dones=self.last_dones
+            )
+
+    def minibatches(self, buffer, batch_size: int) -> Iterator:
+        if self.is_replay:
+            n_batches = max(self.buffer_size * self.n_envs // batch_size, 1)
+            return (buffer.sample(batch_size) for _ in range(n_batches))
+        if self.name == "RLOptDictRecurrentReplayBuffer":
+            return buffer.get_generator(
+                max(self.n_envs * self.buffer_size // batch_size, 1), num_epochs=1
+            )
+        if self.name.startswith("RecurrentSequence"):
+            # minibatches of whole sequences
+            return buffer.get(max(batch_size // 64, 1))
+        return buffer.get(batch_size)
+
+    def read(self, buffer, batch_size: int) -> int:
+        """Iterate over one epoch of minibatches, return their number."""
+        n = 0
+        for _ in self.minibatches(buffer, batch_size):
+            n += 1
+        return n
+
+
+def make_drivers(**kwargs) -> Dict[str, Callable[[], BufferDriver]]:
+    return {name: (lambda n=name: BufferDriver(n, **kwargs)) for name in BUFFER_CLASSES}
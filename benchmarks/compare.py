@@ -0,0 +1,84 @@
+"""
+Compare two result files of ``suite.py``: prints the median time ratio of every case
+and exits with status 1 if a case is slower than the baseline by more than
+``--threshold`` (relative), or fails while it ran in the baseline.
+
+Usage::
+
+    python benchmarks/compare.py baseline.json results.json [--threshold 0.1]
+"""
+
+import argparse
+import json
+import sys
+
+
+def describe(result: dict) -> str:
+    if "median_s" in result:
+        return f"{result['median_s']:.3e}"
+    # "skipped", "error" or missing from the file
+    return next(iter(result), "missing")
+
+
+def compare(baseline: dict, current: dict, threshold: float):
+    """Return the table rows and the names of the regressed cases."""
+    rows, regressions = [], []
+    for name in sorted(set(baseline) | set(current)):
+        before, after = baseline.get(name, {}), current.get(name, {})
+        if "median_s" in before and "median_s" in after:
+            ratio = after["median_s"] / before["median_s"]
+            status = "ok"
+            if ratio > 1.0 + threshold:
+                status = "REGRESSION"
+                regressions.append(name)
+            elif ratio < 1.0 - threshold:
+                status = "improved"
+            rows.append(
+                (
+                    name,
+                    f"{before['median_s']:.3e}",
+                    f"{after['median_s']:.3e}",
+                    f"{ratio:.3f}",
+                    status,
+                )
+            )
+        elif "median_s" in before and "error" in after:
+            regressions.append(name)
+            rows.append((name, f"{before['median_s']:.3e}", "error", "-", "REGRESSION"))
+        else:
+            rows.append((name, describe(before), describe(after), "-", "-"))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline", type=str)
+    parser.add_argument("current", type=str)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Tolerated relative slowdown of the median time",
+    )
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+    rows, regressions = compare(baseline, current, args.threshold)
+
+    header = ("case", "baseline (s)", "current (s)", "ratio", "status")
+    widths = [max(len(row[i]) for row in rows + [header]) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+    if regressions:
+        print(
+            f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: "
+            + ", ".join(regressions)
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Frames per second of stepping ``--num-envs`` gymnasium environments with random
+actions through stable-baselines3 ``DummyVecEnv`` (in process) and ``SubprocVecEnv``
+(one process per env, pickled observations) versus ``SharedMemoryVecEnv`` with
+several numbers of environments per worker process.
+
+Usage::
+
+    python benchmarks/env_pool.py --env-id HalfCheetah-v4 --num-envs 64 \
+        --envs-per-worker 1 4 16 --cpu-affinity
+"""
+
+import argparse
+import json
+import time
+from functools import partial
+
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
+
+from rlopt.envs.pool_vec_env import SharedMemoryVecEnv
+
+
+def frames_per_second(vec_env, n_steps: int, n_warmup: int = 10) -> float:
+    vec_env.seed(0)
+    vec_env.reset()
+    actions = np.stack([vec_env.action_space.sample() for _ in range(vec_env.num_envs)])
+    for _ in range(n_warmup):
+        vec_env.step(actions)
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        vec_env.step(actions)
+    fps = n_steps * vec_env.num_envs / (time.perf_counter() - start)
+    vec_env.close()
+    return fps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--env-id", type=str, default="CartPole-v1")
+    parser.add_argument("--num-envs", type=int, default=16)
+    parser.add_argument("--envs-per-worker", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--n-steps", type=int, default=500)
+    parser.add_argument("--cpu-affinity", action="store_true")
+    args = parser.parse_args()
+
+    env_fns = [partial(gym.make, args.env_id)] * args.num_envs
+    result = {
+        "dummy_vec_env": frames_per_second(DummyVecEnv(env_fns), args.n_steps),
+        "subproc_vec_env": frames_per_second(
+            SubprocVecEnv(env_fns, start_method="forkserver"), args.n_steps
+        ),
+    }
+    for envs_per_worker in args.envs_per_worker:
+        vec_env = SharedMemoryVecEnv(
+            env_fns,
+            envs_per_worker=envs_per_worker,
+            cpu_affinity="auto" if args.cpu_affinity else None,
+        )
+        result[f"shared_memory_{envs_per_worker}_per_worker"] = frames_per_second(
+            vec_env, args.n_steps
+        )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
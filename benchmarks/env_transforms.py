@@ -0,0 +1,133 @@
+"""
+Per-step overhead of the observation transforms of ``make_gym_env``: the
+``VecNorm`` / ``ClipTransform`` / ``RewardSum`` / ``StepCounter`` / ``DoubleToFloat``
+chain versus a single ``FusedObservationNorm``, on a mock batched environment returning
+float64 observations (so the environment itself costs almost nothing).
+
+Usage::
+
+    python benchmarks/env_transforms.py --num-envs 1 64 4096 --obs-dim 17 --device cuda
+"""
+
+import argparse
+import json
+import time
+
+import torch
+from tensordict import TensorDict
+from torchrl.data import Categorical, Composite, Unbounded
+from torchrl.envs import (
+    ClipTransform,
+    Compose,
+    DoubleToFloat,
+    EnvBase,
+    RewardSum,
+    StepCounter,
+    TransformedEnv,
+    VecNorm,
+)
+
+from rlopt.envs.transforms import FusedObservationNorm
+
+
+class MockEnv(EnvBase):
+    def __init__(self, num_envs: int, obs_dim: int, device="cpu"):
+        super().__init__(device=device, batch_size=torch.Size([num_envs]))
+        self.observation_spec = Composite(
+            observation=Unbounded(
+                shape=(num_envs, obs_dim), dtype=torch.float64, device=self.device
+            ),
+            shape=(num_envs,),
+        )
+        self.action_spec = Unbounded(shape=(num_envs, 1), device=self.device)
+        self.reward_spec = Unbounded(shape=(num_envs, 1), device=self.device)
+        done = Categorical(2, shape=(num_envs, 1), dtype=torch.bool, device=self.device)
+        self.full_done_spec = Composite(
+            done=done.clone(),
+            terminated=done.clone(),
+            truncated=done.clone(),
+            shape=(num_envs,),
+        )
+
+    def _output(self) -> TensorDict:
+        done = torch.zeros((*self.batch_size, 1), dtype=torch.bool, device=self.device)
+        return TensorDict(
+            {
+                "observation": torch.randn(
+                    self.observation_spec["observation"].shape,
+                    dtype=torch.float64,
+                    device=self.device,
+                ),
+                "done": done,
+                "terminated": done.clone(),
+                "truncated": done.clone(),
+            },
+            self.batch_size,
+            device=self.device,
+        )
+
+    def _reset(self, tensordict=None, **kwargs):
+        return self._output()
+
+    def _step(self, tensordict):
+        out = self._output()
+        out.set("reward", torch.ones(self.reward_spec.shape, device=self.device))
+        return out
+
+    def _set_seed(self, seed):
+        return seed
+
+
+def chain():
+    return Compose(
+        VecNorm(in_keys=["observation"], decay=0.99999, eps=1e-2),
+        ClipTransform(in_keys=["observation"], low=-10, high=10),
+        RewardSum(),
+        StepCounter(),
+        DoubleToFloat(in_keys=["observation"]),
+    )
+
+
+def seconds_per_step(env: EnvBase, n_steps: int, n_warmup: int = 20) -> float:
+    td = env.reset()
+    action = env.action_spec.zero()
+    for i in range(n_warmup + n_steps):
+        if i == n_warmup:
+            if env.device.type == "cuda":
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+        td.set("action", action)
+        td = env.step_mdp(env.step(td))
+    if env.device.type == "cuda":
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / n_steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-envs", type=int, nargs="+", default=[1, 64, 4096])
+    parser.add_argument("--obs-dim", type=int, default=17)
+    parser.add_argument("--n-steps", type=int, default=500)
+    parser.add_argument("--device", type=str, default="cpu")
+    args = parser.parse_args()
+
+    result = {}
+    for num_envs in args.num_envs:
+        timings = {}
+        base = MockEnv(num_envs, args.obs_dim, args.device)
+        timings["no_transform_us"] = seconds_per_step(base, args.n_steps) * 1e6
+        for name, transform in (("chain", chain()), ("fused", FusedObservationNorm())):
+            env = TransformedEnv(
+                MockEnv(num_envs, args.obs_dim, args.device), transform
+            )
+            timings[f"{name}_us"] = seconds_per_step(env, args.n_steps) * 1e6
+        for name in ("chain", "fused"):
+            timings[f"{name}_overhead_us"] = (
+                timings[f"{name}_us"] - timings["no_transform_us"]
+            )
+        result[num_envs] = timings
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
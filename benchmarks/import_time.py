@@ -0,0 +1,92 @@
+"""
+Import time of the ``rlopt`` packages, measured with ``python -X importtime`` in fresh
+interpreters, and the heavy dependencies each import pulls in. Exits with status 1
+when the median cumulative time of ``import rlopt`` exceeds ``--budget-ms``, so it can
+be run as a regression check.
+
+Usage::
+
+    python benchmarks/import_time.py --budget-ms 50 --modules rlopt rlopt.agent
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+
+import numpy as np
+
+HEAVY_MODULES = (
+    "torch",
+    "torchrl",
+    "tensordict",
+    "stable_baselines3",
+    "sb3_contrib",
+    "gymnasium",
+    "hydra",
+    "wandb",
+)
+
+# import time:      self [us] |  cumulative | imported package, indented when nested
+IMPORTTIME_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)$")
+
+
+def measure(module: str):
+    """Cumulative import time of ``module`` in ms and the heavy modules it loads."""
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    root = module.split(".")[0]
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        # top-level entries of the package, its dependencies are nested below them
+        if match and match.group(2).split(".")[0] == root:
+            cumulative_us += int(match.group(1))
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+    return cumulative_us / 1e3, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--modules",
+        type=str,
+        nargs="+",
+        default=["rlopt", "rlopt.agent", "rlopt.common", "rlopt.envs", "rlopt.opt"],
+    )
+    parser.add_argument("--n-repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    result = {}
+    for module in args.modules:
+        times, loaded = [], []
+        for _ in range(args.n_repeat):
+            time_ms, loaded = measure(module)
+            times.append(time_ms)
+        result[module] = {
+            "import_ms_p50": float(np.median(times)),
+            "heavy_modules": loaded,
+        }
+
+    within_budget = True
+    if "rlopt" in result:
+        result["budget_ms"] = args.budget_ms
+        within_budget = result["rlopt"]["import_ms_p50"] <= args.budget_ms
+        result["within_budget"] = within_budget
+    print(json.dumps(result, indent=2))
+    if not within_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Load-generator benchmark for ``rlopt.common.serving.InferenceServer``.
+
+Spawns ``--clients`` concurrent asyncio clients that each send one observation
+at a time to a randomly initialized ``RecurrentActorCriticPolicy`` and reports
+p50/p99 latency and throughput.
+
+Usage::
+
+    python benchmarks/inference_server.py --clients 256 --max-batch-size 64 --max-latency-ms 2
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import torch as th
+from gymnasium import spaces
+
+from rlopt.agent.l2t.policies import RecurrentActorCriticPolicy
+from rlopt.common.serving import InferenceServer, latency_percentiles
+
+
+def make_policy(obs_dim: int, action_dim: int, hidden_size: int, device: str):
+    return RecurrentActorCriticPolicy(
+        spaces.Box(low=-1.0, high=1.0, shape=(obs_dim,)),
+        spaces.Box(low=-1.0, high=1.0, shape=(action_dim,)),
+        lambda _: 3e-4,
+        lstm_hidden_size=hidden_size,
+    ).to(device)
+
+
+async def run_client(server, client_id, obs_dim, duration, latencies):
+    episode_start = True
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        obs = th.randn(obs_dim)
+        start = time.perf_counter()
+        await server.act(client_id, obs, episode_start=episode_start)
+        latencies.append(time.perf_counter() - start)
+        episode_start = False
+
+
+async def run_benchmark(args) -> dict:
+    policy = make_policy(args.obs_dim, args.action_dim, args.hidden_size, args.device)
+    server = InferenceServer(
+        policy,
+        max_batch_size=args.max_batch_size,
+        max_latency_ms=args.max_latency_ms,
+        num_slots=max(args.clients, 1),
+        device=args.device,
+    )
+    latencies = []
+    with server:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[
+                run_client(server, i, args.obs_dim, args.duration, latencies)
+                for i in range(args.clients)
+            ]
+        )
+        elapsed = time.perf_counter() - start
+
+    return {
+        "clients": args.clients,
+        "max_batch_size": args.max_batch_size,
+        "max_latency_ms": args.max_latency_ms,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed,
+        "mean_batch_size": server.mean_batch_size,
+        **latency_percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-latency-ms", type=float, default=2.0)
+    parser.add_argument("--obs-dim", type=int, default=48)
+    parser.add_argument("--action-dim", type=int, default=12)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--device", type=str, default="cpu")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run_benchmark(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
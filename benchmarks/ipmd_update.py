@@ -0,0 +1,106 @@
+"""
+Updates/s of the IPMD update with one backward per optimizer versus the fused
+single-backward update (``optim.fused_update``), on synthetic minibatches.
+
+Usage::
+
+    python benchmarks/ipmd_update.py --batch-size 256 --n-updates 200 [--compile]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import torch
+from omegaconf import OmegaConf
+from tensordict import TensorDict
+from torchrl.data import Bounded
+
+IPMD_DIR = os.path.join(os.path.dirname(__file__), "..", "rlopt", "agent", "ipmd")
+sys.path.insert(0, IPMD_DIR)
+
+from ipmd import (  # noqa: E402
+    make_ipmd_agent,
+    make_ipmd_optimizer,
+    make_ipmd_update,
+    make_loss_module,
+)
+
+
+def make_fake_env(obs_dim: int, action_dim: int):
+    return SimpleNamespace(
+        action_spec=Bounded(-1.0, 1.0, (action_dim,)),
+        batch_size=torch.Size([]),
+        fake_tensordict=lambda: TensorDict(
+            {"observation": torch.zeros(obs_dim), "action": torch.zeros(action_dim)},
+            [],
+        ),
+    )
+
+
+def make_batch(batch_size: int, obs_dim: int, action_dim: int, device):
+    return TensorDict(
+        {
+            "observation": torch.randn(batch_size, obs_dim),
+            "action": torch.rand(batch_size, action_dim) * 2 - 1,
+            ("next", "observation"): torch.randn(batch_size, obs_dim),
+            ("next", "reward"): torch.randn(batch_size, 1),
+            ("next", "done"): torch.zeros(batch_size, 1, dtype=torch.bool),
+            ("next", "terminated"): torch.zeros(batch_size, 1, dtype=torch.bool),
+        },
+        [batch_size],
+        device=device,
+    )
+
+
+def run(cfg, fused: bool, args) -> float:
+    cfg.optim.fused_update = fused
+    env = make_fake_env(args.obs_dim, args.action_dim)
+    model, _ = make_ipmd_agent(cfg, env, env, args.device)
+    loss_module, target_net_updater = make_loss_module(cfg, model)
+    optimizers = make_ipmd_optimizer(cfg, loss_module)
+    update = make_ipmd_update(cfg, loss_module, target_net_updater, optimizers)
+
+    batch = make_batch(cfg.optim.batch_size, args.obs_dim, args.action_dim, args.device)
+    expert = batch.exclude("next")
+    for _ in range(args.n_warmup):
+        update(batch.clone(), expert)
+    start = time.perf_counter()
+    for _ in range(args.n_updates):
+        update(batch.clone(), expert)
+    if args.device.startswith("cuda"):
+        torch.cuda.synchronize()
+    return args.n_updates / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--obs-dim", type=int, default=17)
+    parser.add_argument("--action-dim", type=int, default=6)
+    parser.add_argument("--n-updates", type=int, default=200)
+    parser.add_argument("--n-warmup", type=int, default=10)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--compile", action="store_true")
+    args = parser.parse_args()
+
+    cfg = OmegaConf.load(os.path.join(IPMD_DIR, "config.yaml"))
+    cfg.optim.batch_size = args.batch_size
+    cfg.compile.compile = args.compile
+
+    result = {
+        "batch_size": args.batch_size,
+        "sequential_updates_per_s": run(cfg, False, args),
+        "fused_updates_per_s": run(cfg, True, args),
+    }
+    result["speedup"] = (
+        result["fused_updates_per_s"] / result["sequential_updates_per_s"]
+    )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+IPMD updates/s at several update-to-data (UTD) ratios, sampling and updating one
+minibatch at a time with the fused update versus drawing ``--minibatches``
+minibatches per replay buffer sample and consuming them with
+``make_ipmd_multi_update`` (``optim.minibatches_per_sample``). With ``--compile`` both
+the fused update and the loop over minibatches are compiled.
+
+Before timing, both paths are run from the same initial parameters on the same
+minibatches and the largest parameter difference is reported, which should be 0
+without ``--compile`` (compiled code draws different random numbers).
+
+Usage::
+
+    python benchmarks/ipmd_utd.py --utd 1 4 20 --frames-per-batch 50 [--compile]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import torch
+from omegaconf import OmegaConf
+from torchrl.data import LazyTensorStorage, TensorDictReplayBuffer
+
+from ipmd_update import IPMD_DIR, make_batch, make_fake_env
+
+from ipmd import (  # noqa: E402
+    make_ipmd_agent,
+    make_ipmd_multi_update,
+    make_ipmd_optimizer,
+    make_ipmd_update,
+    make_loss_module,
+)
+
+
+def make_updates(cfg, args, seed: int = 0):
+    torch.manual_seed(seed)
+    env = make_fake_env(args.obs_dim, args.action_dim)
+    model, _ = make_ipmd_agent(cfg, env, env, args.device)
+    loss_module, target_net_updater = make_loss_module(cfg, model)
+    optimizers = make_ipmd_optimizer(cfg, loss_module)
+    update = make_ipmd_update(cfg, loss_module, target_net_updater, optimizers)
+    multi_update = make_ipmd_multi_update(
+        cfg, loss_module, target_net_updater, optimizers
+    )
+    return loss_module, update, multi_update
+
+
+def max_param_diff(cfg, args) -> float:
+    """Run both paths on identical minibatches and compare the parameters."""
+    minibatches = make_batch(
+        args.minibatches * cfg.optim.batch_size,
+        args.obs_dim,
+        args.action_dim,
+        args.device,
+    ).reshape(args.minibatches, -1)
+    expert = minibatches.exclude("next")
+
+    sequential_loss, update, _ = make_updates(cfg, args)
+    for i in range(args.minibatches):
+        update(minibatches[i].clone(), expert[i])
+    batched_loss, _, multi_update = make_updates(cfg, args)
+    multi_update(minibatches.clone(), expert)
+
+    sequential = dict(sequential_loss.named_parameters())
+    return max(
+        float((param - sequential[name]).detach().abs().max())
+        for name, param in batched_loss.named_parameters()
+    )
+
+
+def run(cfg, args, utd: int, num_minibatches: int) -> float:
+    batch_size = cfg.optim.batch_size
+    replay_buffer = TensorDictReplayBuffer(
+        storage=LazyTensorStorage(args.buffer_size),
+        batch_size=batch_size * num_minibatches,
+    )
+    replay_buffer.extend(
+        make_batch(args.buffer_size, args.obs_dim, args.action_dim, "cpu")
+    )
+    _, update, multi_update = make_updates(cfg, args)
+    num_updates = args.frames_per_batch * utd
+
+    def iteration():
+        for first in range(0, num_updates, num_minibatches):
+            sampled = replay_buffer.sample().to(args.device)
+            if num_minibatches == 1:
+                update(sampled, sampled.exclude("next"))
+                continue
+            sampled = sampled.reshape(num_minibatches, -1)
+            sampled = sampled[: min(num_minibatches, num_updates - first)]
+            multi_update(sampled, sampled.exclude("next"))
+
+    iteration()  # warm-up
+    start = time.perf_counter()
+    iteration()
+    if args.device.startswith("cuda"):
+        torch.cuda.synchronize()
+    return num_updates / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--utd", type=int, nargs="+", default=[1, 4, 20])
+    parser.add_argument("--frames-per-batch", type=int, default=50)
+    parser.add_argument("--minibatches", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--buffer-size", type=int, default=100_000)
+    parser.add_argument("--obs-dim", type=int, default=17)
+    parser.add_argument("--action-dim", type=int, default=6)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--compile", action="store_true")
+    args = parser.parse_args()
+
+    cfg = OmegaConf.load(os.path.join(IPMD_DIR, "config.yaml"))
+    cfg.optim.batch_size = args.batch_size
+    cfg.optim.fused_update = True
+    cfg.compile.compile = args.compile
+
+    result = {
+        "batch_size": args.batch_size,
+        "minibatches_per_sample": args.minibatches,
+        "max_param_diff": max_param_diff(cfg, args),
+    }
+    for utd in args.utd:
+        num_minibatches = min(args.minibatches, args.frames_per_batch * utd)
+        sequential = run(cfg, args, utd, 1)
+        batched = run(cfg, args, utd, num_minibatches)
+        result[f"utd_{utd}"] = {
+            "sequential_updates_per_s": sequential,
+            "batched_updates_per_s": batched,
+            "speedup": batched / sequential,
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Deterministic mock vector environments for the benchmarks, all backed by
+``MockBatchedSim`` (configurable observation/action dimensions, episode length and
+per-step cost):
+
+- ``make_mock_vec_env``: ``TensorVecEnv`` with ``"teacher"``/``"student"``
+  observation groups, for the stable-baselines3-style agents;
+- ``MockBatchedEnv``: torchrl ``EnvBase`` with an ``"observation"`` entry, for the
+  torchrl agents.
+"""
+
+from typing import Optional
+
+import torch
+from tensordict import TensorDict, TensorDictBase
+from torchrl.data import Bounded, Categorical, Composite, Unbounded
+from torchrl.envs import EnvBase
+
+from rlopt.envs.mock_sim import MockBatchedSim
+from rlopt.envs.tensor_vec_env import TensorVecEnv
+
+
+def make_mock_sim(args) -> MockBatchedSim:
+    return MockBatchedSim(
+        args.n_envs,
+        group_dims={"policy": args.obs_dim, "student": args.student_obs_dim},
+        action_dim=args.action_dim,
+        max_episode_length=args.episode_length,
+        device=args.device,
+        seed=args.seed,
+        step_cost=args.step_cost,
+    )
+
+
+def make_mock_vec_env(args) -> TensorVecEnv:
+    return TensorVecEnv(
+        make_mock_sim(args), groups={"teacher": "policy", "student": "student"}
+    )
+
+
+class MockBatchedEnv(EnvBase):
+    """
+    torchrl view of a ``MockBatchedSim``. The simulator resets finished environments
+    on its own, so ``_reset`` only returns the current observations (except for the
+    first reset).
+    """
+
+    def __init__(self, sim: MockBatchedSim):
+        super().__init__(device=sim.device, batch_size=torch.Size([sim.num_envs]))
+        self.sim = sim
+        num_envs = sim.num_envs
+        obs_dim = sim.single_observation_space["policy"].shape[0]
+        action_dim = sim.single_action_space.shape[0]
+        self.observation_spec = Composite(
+            observation=Unbounded(shape=(num_envs, obs_dim), device=self.device),
+            shape=(num_envs,),
+        )
+        self.action_spec = Bounded(
+            -1.0, 1.0, shape=(num_envs, action_dim), device=self.device
+        )
+        self.reward_spec = Unbounded(shape=(num_envs, 1), device=self.device)
+        done = Categorical(2, shape=(num_envs, 1), dtype=torch.bool, device=self.device)
+        self.full_done_spec = Composite(
+            done=done.clone(),
+            terminated=done.clone(),
+            truncated=done.clone(),
+            shape=(num_envs,),
+        )
+        self._obs: Optional[torch.Tensor] = None
+
+    def _output(self, terminated, truncated) -> TensorDict:
+        return TensorDict(
+            {
+                "observation": self._obs,
+                "done": (terminated | truncated).unsqueeze(-1),
+                "terminated": terminated.unsqueeze(-1),
+                "truncated": truncated.unsqueeze(-1),
+            },
+            self.batch_size,
+            device=self.device,
+        )
+
+    def _reset(self, tensordict: Optional[TensorDictBase] = None, **kwargs):
+        if self._obs is None:
+            self._obs = self.sim.reset()[0]["policy"]
+        zeros = torch.zeros(self.batch_size, dtype=torch.bool, device=self.device)
+        return self._output(zeros, zeros)
+
+    def _step(self, tensordict: TensorDictBase) -> TensorDictBase:
+        obs, reward, terminated, truncated, _ = self.sim.step(tensordict["action"])
+        self._obs = obs["policy"]
+        out = self._output(terminated, truncated)
+        out.set("reward", reward.unsqueeze(-1))
+        return out
+
+    def _set_seed(self, seed: Optional[int]) -> Optional[int]:
+        return seed
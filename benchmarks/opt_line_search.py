@@ -0,0 +1,77 @@
+"""
+Wall time and oracle calls of the first AC-FGD iteration (the step size line search)
+with the sequential doubling/bisection search versus the speculative search over a
+grid of step sizes evaluated in one stacked oracle call, on l2-regularized logistic
+regression with autograd gradients.
+
+Usage::
+
+    python benchmarks/opt_line_search.py --device cuda --n-candidates 8 --reg 10
+"""
+
+import argparse
+import json
+import time
+
+import torch
+
+from opt_oracle import make_logistic_regression
+from rlopt.opt.ac_fgd import AutoConditionedFastGradidentDescent
+from rlopt.opt.oracle import AutogradOracle
+
+
+def run(loss, x_init, line_search: str, n_candidates: int, n_repeat: int):
+    times = []
+    for _ in range(n_repeat + 1):
+        optimizer = AutoConditionedFastGradidentDescent(
+            AutogradOracle(loss),
+            x_init,
+            projection=None,
+            alpha=0.5,
+            line_search=line_search,
+            n_candidates=n_candidates,
+        )
+        optimizer.oracle.reset_counters()
+        if x_init.is_cuda:
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        optimizer.step(1)
+        if x_init.is_cuda:
+            torch.cuda.synchronize()
+        times.append(time.perf_counter() - start)
+    return {
+        # the first repetition is a warm-up
+        "first_iteration_ms": 1e3 * sum(times[1:]) / n_repeat,
+        "first_eta": float(optimizer.first_eta),
+        **optimizer.oracle.counters,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--n-samples", type=int, default=4096)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--reg", type=float, default=10.0)
+    parser.add_argument("--n-candidates", type=int, default=8)
+    parser.add_argument("--n-repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    loss = make_logistic_regression(
+        args.n_samples, args.dim, reg=args.reg, device=args.device
+    )
+    x_init = torch.zeros(args.dim, dtype=torch.float64, device=args.device)
+    result = {
+        line_search: run(loss, x_init, line_search, args.n_candidates, args.n_repeat)
+        for line_search in ("sequential", "speculative")
+    }
+    result["speedup"] = (
+        result["sequential"]["first_iteration_ms"]
+        / result["speculative"]["first_iteration_ms"]
+    )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
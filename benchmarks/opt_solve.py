@@ -0,0 +1,95 @@
+"""
+Wall time of ``Optimizer.solve`` with a host synchronization every iteration versus
+every ``--check-every`` iterations (optionally with ``torch.compile``), for AC-FGD on
+a batch of random quadratics and on l2-regularized logistic regression.
+
+Usage::
+
+    python benchmarks/opt_solve.py --device cuda --check-every 25 [--compile]
+"""
+
+import argparse
+import json
+import time
+
+import torch
+
+from opt_oracle import make_logistic_regression
+from rlopt.opt.ac_fgd import AutoConditionedFastGradidentDescent
+from rlopt.opt.oracle import AutogradOracle
+
+
+def make_quadratics(n_problems: int, dim: int, device):
+    M = torch.randn(n_problems, dim, dim, dtype=torch.float64, device=device)
+    A = M @ M.transpose(1, 2) / dim + 0.1 * torch.eye(
+        dim, dtype=torch.float64, device=device
+    )
+    b = torch.randn(n_problems, dim, dtype=torch.float64, device=device)
+
+    def loss(x):
+        return 0.5 * torch.einsum("bi,bij,bj->b", x, A, x) - (b * x).sum(-1)
+
+    return loss, torch.zeros(n_problems, dim, dtype=torch.float64, device=device)
+
+
+def run(loss, x_init, batched: bool, n_iter: int, check_every: int, compile: bool):
+    def solve():
+        return AutoConditionedFastGradidentDescent(
+            AutogradOracle(loss),
+            x_init,
+            projection=None,
+            alpha=0.5,
+            n_iter=n_iter,
+            tol=0.0,
+            batched=batched,
+        ).solve(check_every=check_every, compile=compile)
+
+    solve()  # warm-up (and compilation)
+    if x_init.is_cuda:
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    _, f_arr, _ = solve()
+    if x_init.is_cuda:
+        torch.cuda.synchronize()
+    return {
+        "time_s": time.perf_counter() - start,
+        "final_f": float(f_arr[-1].sum()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--n-iter", type=int, default=200)
+    parser.add_argument("--check-every", type=int, default=25)
+    parser.add_argument("--n-problems", type=int, default=256)
+    parser.add_argument("--dim", type=int, default=32)
+    parser.add_argument("--compile", action="store_true")
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    problems = {
+        "quadratic": (*make_quadratics(args.n_problems, args.dim, args.device), True),
+        "logistic_regression": (
+            make_logistic_regression(4096, 256, device=args.device),
+            torch.zeros(256, dtype=torch.float64, device=args.device),
+            False,
+        ),
+    }
+    result = {}
+    for name, (loss, x_init, batched) in problems.items():
+        result[name] = {
+            "check_every_1": run(loss, x_init, batched, args.n_iter, 1, False),
+            f"check_every_{args.check_every}": run(
+                loss, x_init, batched, args.n_iter, args.check_every, False
+            ),
+        }
+        if args.compile:
+            result[name]["compiled"] = run(
+                loss, x_init, batched, args.n_iter, args.check_every, True
+            )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Export a randomly initialized ``RecurrentActorCriticPolicy`` to ONNX and compare
+it against PyTorch on CPU (action/state parity and per-step latency).
+
+Usage::
+
+    python benchmarks/recurrent_onnx.py --batch-size 1 --n-steps 1000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+import torch as th
+from gymnasium import spaces
+
+from rlopt.agent.l2t.policies import RecurrentActorCriticPolicy
+from rlopt.common.utils import compare_recurrent_onnx, export_recurrent_to_onnx
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--obs-dim", type=int, default=48)
+    parser.add_argument("--action-dim", type=int, default=12)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--n-steps", type=int, default=1000)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    th.set_num_threads(1)
+    policy = RecurrentActorCriticPolicy(
+        spaces.Box(low=-1.0, high=1.0, shape=(args.obs_dim,)),
+        spaces.Box(low=-1.0, high=1.0, shape=(args.action_dim,)),
+        lambda _: 3e-4,
+        lstm_hidden_size=args.hidden_size,
+    )
+    onnx_filename = args.output or os.path.join(
+        tempfile.mkdtemp(), "recurrent_policy.onnx"
+    )
+    export_recurrent_to_onnx(policy, onnx_filename)
+    result = compare_recurrent_onnx(
+        policy, onnx_filename, n_steps=args.n_steps, batch_size=args.batch_size
+    )
+    print(json.dumps({"onnx_filename": onnx_filename, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Startup time (imports + load + first action) and peak resident memory of loading a
+recurrent student for inference in a fresh interpreter: the stable-baselines3
+``RecurrentActorCriticPolicy.load`` path versus ``rlopt.runtime.load_policy`` on the
+exported actor (torch only) and, when ``onnxruntime`` is installed, on its ONNX
+export (no torch).
+
+Usage::
+
+    python benchmarks/runtime_load.py --obs-dim 48 --action-dim 12 --hidden-size 256
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+# run in a fresh interpreter, `{load}` is replaced by the loading code
+CHILD = """
+import time
+start = time.perf_counter()
+import numpy as np
+{load}
+load_s = time.perf_counter() - start
+act(np.zeros((1, {obs_dim}), dtype=np.float32))
+total_s = time.perf_counter() - start
+# peak RSS of this process (ru_maxrss would include the parent's peak before exec)
+with open("/proc/self/status") as f:
+    hwm_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM"))
+print(load_s, total_s, hwm_kb / 1024)
+"""
+
+LOADERS = {
+    "sb3_policy_load": """
+import torch as th
+from rlopt.agent.l2t.policies import RecurrentActorCriticPolicy
+policy = RecurrentActorCriticPolicy.load({sb3_path!r})
+state = (th.zeros(policy.lstm_hidden_state_shape), th.zeros(policy.lstm_hidden_state_shape))
+def act(obs):
+    return policy.predict_and_return_tensor(
+        th.as_tensor(obs), state, th.zeros(1), deterministic=True
+    )
+""",
+    "runtime": """
+from rlopt.runtime import load_policy
+act = load_policy({runtime_path!r}).act
+""",
+    "runtime_onnx": """
+from rlopt.runtime import load_policy
+act = load_policy({onnx_path!r}).act
+""",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--obs-dim", type=int, default=48)
+    parser.add_argument("--action-dim", type=int, default=12)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--n-repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from gymnasium import spaces
+
+    from rlopt.agent.l2t.policies import RecurrentActorCriticPolicy
+    from rlopt.common.utils import export_recurrent_to_onnx
+    from rlopt.runtime import export_runtime_policy
+
+    directory = tempfile.mkdtemp()
+    paths = {
+        "sb3_path": os.path.join(directory, "policy.zip"),
+        "runtime_path": os.path.join(directory, "policy.pt"),
+        "onnx_path": os.path.join(directory, "policy.onnx"),
+    }
+    policy = RecurrentActorCriticPolicy(
+        spaces.Box(low=-1.0, high=1.0, shape=(args.obs_dim,)),
+        spaces.Box(low=-1.0, high=1.0, shape=(args.action_dim,)),
+        lambda _: 3e-4,
+        lstm_hidden_size=args.hidden_size,
+    )
+    policy.save(paths["sb3_path"])
+    export_runtime_policy(policy, paths["runtime_path"])
+    loaders = dict(LOADERS)
+    if importlib.util.find_spec("onnxruntime"):
+        export_recurrent_to_onnx(policy, paths["onnx_path"])
+    else:
+        del loaders["runtime_onnx"]
+
+    result = {}
+    for name, load in loaders.items():
+        code = CHILD.format(load=load.format(**paths), obs_dim=args.obs_dim)
+        runs = []
+        for _ in range(args.n_repeat):
+            output = subprocess.run(
+                [sys.executable, "-c", code],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.split()
+            runs.append([float(value) for value in output[-3:]])
+        load_s, total_s, max_rss_mb = np.median(runs, axis=0)
+        result[name] = {
+            "load_s": float(load_s),
+            "first_action_s": float(total_s),
+            "max_rss_mb": float(max_rss_mb),
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
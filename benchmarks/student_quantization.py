@@ -0,0 +1,60 @@
+"""
+Prune and int8-quantize a randomly initialized ``RecurrentActorCriticPolicy`` and
+report action parity (on random rollouts) and CPU latency versus fp32.
+
+Usage::
+
+    python benchmarks/student_quantization.py --prune-amount 0.3 --n-envs 1
+"""
+
+import argparse
+import json
+from types import SimpleNamespace
+
+import torch as th
+from gymnasium import spaces
+
+from rlopt.agent.l2t.policies import RecurrentActorCriticPolicy
+from rlopt.common.quantization import optimize_student_policy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--obs-dim", type=int, default=48)
+    parser.add_argument("--action-dim", type=int, default=12)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--prune-amount", type=float, default=0.0)
+    parser.add_argument("--n-envs", type=int, default=1)
+    parser.add_argument("--n-steps", type=int, default=1000)
+    parser.add_argument("--rollout-length", type=int, default=256)
+    args = parser.parse_args()
+
+    policy = RecurrentActorCriticPolicy(
+        spaces.Box(low=-1.0, high=1.0, shape=(args.obs_dim,)),
+        spaces.Box(low=-1.0, high=1.0, shape=(args.action_dim,)),
+        lambda _: 3e-4,
+        lstm_hidden_size=args.hidden_size,
+    )
+    # stand-in for a filled rollout buffer
+    episode_starts = th.zeros(args.rollout_length, args.n_envs)
+    episode_starts[0] = 1.0
+    rollout = SimpleNamespace(
+        observations=th.randn(args.rollout_length, args.n_envs, args.obs_dim),
+        episode_starts=episode_starts,
+        buffer_size=args.rollout_length,
+        pos=0,
+        full=True,
+    )
+    _, report = optimize_student_policy(
+        policy,
+        rollout,
+        prune_amount=args.prune_amount,
+        obs_key=None,
+        n_envs=args.n_envs,
+        n_steps=args.n_steps,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+End-to-end benchmark suite, runnable offline on CPU with deterministic mock
+environments (``mock_envs.py``). Cases:
+
+- ``rollout/<agent>``: one ``collect_rollouts`` of each agent of ``rlopt.agent``;
+- ``update/<agent>``: one training phase (PPO epochs) on the collected rollout;
+- ``update/PPO``: one epoch of the torchrl PPO agent on a collected batch;
+- ``update/sac``: one SAC-style actor/critic update of IPMD (no expert batch);
+- ``buffer/<class>/{add,gae,get}``: filling every buffer of ``rlopt.common.buffer``,
+  GAE and one epoch of minibatches (``sample`` for replay buffers);
+- ``recurrent/split_and_pad``: padding rollouts into trajectories for recurrent
+  policies;
+- ``onnx/{torch,onnxruntime}``: policy inference on a batch of observations.
+
+Each case is timed ``--repeat`` times after ``--warmup`` calls. Results (median, min,
+mean in seconds, items/s) are written as JSON; cases whose dependencies are missing
+are reported as skipped, cases raising an error as errors. Compare two result files
+with ``compare.py``.
+
+Usage::
+
+    python benchmarks/suite.py --output results.json [--filter rollout/] \
+        [--n-envs 256 --n-steps 32 --step-cost 0.0005]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import torch
+
+from buffers import BUFFER_CLASSES, BufferDriver
+from mock_envs import MockBatchedEnv, make_mock_sim, make_mock_vec_env
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# a case takes the arguments and returns (function to time, items processed per call)
+Case = Callable[[argparse.Namespace], Tuple[Callable[[], object], int]]
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str):
+    def register(fn: Case) -> Case:
+        CASES[name] = fn
+        return fn
+
+    return register
+
+
+# agent name: (collection method, training method)
+SB3_AGENTS = {
+    "L2T": ("collect_rollouts", "train"),
+    "RecurrentL2T": ("collect_rollouts", "train"),
+    "TeacherStudentLearning": ("teacher_collect_rollouts", "teacher_train"),
+    "RecurrentStudent": ("collect_rollouts", "train"),
+}
+
+
+def make_sb3_agent(name: str, args):
+    import rlopt.agent
+    from stable_baselines3.common.policies import ActorCriticPolicy
+
+    env = make_mock_vec_env(args)
+    kwargs = {}
+    if name == "RecurrentStudent":
+        # distills a (here untrained) teacher
+        kwargs["teacher_policy"] = ActorCriticPolicy(
+            env.observation_space["teacher"], env.action_space, lambda _: 3e-4
+        ).to(args.device)
+    model = getattr(rlopt.agent, name)(
+        "MlpPolicy",
+        env,
+        n_steps=args.n_steps,
+        batch_size=args.batch_size,
+        n_epochs=1,
+        device=args.device,
+        seed=args.seed,
+        **kwargs,
+    )
+    _, callback = model._setup_learn(10**12)
+    if name == "TeacherStudentLearning":
+        # the teacher phase only sees the teacher observations
+        model._last_obs = model._last_obs["teacher"]
+    callback.on_training_start(locals(), globals())
+    collect = getattr(model, SB3_AGENTS[name][0])
+
+    def collect_rollouts():
+        assert collect(model.env, callback, model.rollout_buffer, model.n_steps)
+
+    return model, collect_rollouts
+
+
+def _register_sb3_agent(name: str):
+    @case(f"rollout/{name}")
+    def rollout(args):
+        _, collect_rollouts = make_sb3_agent(name, args)
+        return collect_rollouts, args.n_envs * args.n_steps
+
+    @case(f"update/{name}")
+    def update(args):
+        model, collect_rollouts = make_sb3_agent(name, args)
+        collect_rollouts()
+        return getattr(model, SB3_AGENTS[name][1]), args.n_envs * args.n_steps
+
+
+for _name in SB3_AGENTS:
+    _register_sb3_agent(_name)
+
+
+def make_ppo_agent(args):
+    from omegaconf import OmegaConf
+
+    from rlopt.agent import PPO
+
+    cfg = OmegaConf.load(os.path.join(REPO_DIR, "conf", "config.yaml"))
+    cfg.logger.backend = ""
+    cfg.device = args.device
+    cfg.seed = args.seed
+    cfg.collector.frames_per_batch = args.n_envs * args.n_steps
+    cfg.collector.total_frames = 10**12
+    # PPO reads these loss keys, the example config leaves them out
+    cfg.loss.clip_value = None
+    cfg.loss.mini_batch_size = args.batch_size
+    # the learning rate annealing needs the length of a training run
+    cfg.optim.anneal_lr = False
+    return PPO(env=MockBatchedEnv(make_mock_sim(args)), config=cfg)
+
+
+@case("rollout/PPO")
+def rollout_ppo(args):
+    agent = make_ppo_agent(args)
+    collector_iter = iter(agent.collector)
+    return (lambda: next(collector_iter)), args.n_envs * args.n_steps
+
+
+@case("update/PPO")
+def update_ppo(args):
+    agent = make_ppo_agent(args)
+    with torch.no_grad():
+        data = agent.adv_module(next(iter(agent.collector)))
+    agent.data_buffer.extend(data.reshape(-1))
+    num_network_updates = torch.zeros((), dtype=torch.int64, device=agent.device)
+
+    def epoch():
+        # one PPO epoch over the minibatches of the collected batch
+        for batch in agent.data_buffer:
+            agent.update(batch, num_network_updates)
+
+    return epoch, args.n_envs * args.n_steps
+
+
+@case("update/sac")
+def update_sac(args):
+    from omegaconf import OmegaConf
+
+    from ipmd_update import (
+        IPMD_DIR,
+        make_batch,
+        make_fake_env,
+        make_ipmd_agent,
+        make_ipmd_optimizer,
+        make_ipmd_update,
+        make_loss_module,
+    )
+
+    cfg = OmegaConf.load(os.path.join(IPMD_DIR, "config.yaml"))
+    cfg.optim.batch_size = args.batch_size
+    env = make_fake_env(args.obs_dim, args.action_dim)
+    model, _ = make_ipmd_agent(cfg, env, env, args.device)
+    loss_module, target_net_updater = make_loss_module(cfg, model)
+    update = make_ipmd_update(
+        cfg, loss_module, target_net_updater, make_ipmd_optimizer(cfg, loss_module)
+    )
+    batch = make_batch(args.batch_size, args.obs_dim, args.action_dim, args.device)
+    # no expert batch: policy/critic update only
+    return (lambda: update(batch, None)), args.batch_size
+
+
+def _register_buffer(name: str):
+    def driver(args) -> BufferDriver:
+        return BufferDriver(
+            name,
+            n_envs=args.n_envs,
+            buffer_size=args.n_steps,
+            obs_dim=args.obs_dim,
+            action_dim=args.action_dim,
+            device=args.device,
+            seed=args.seed,
+        )
+
+    @case(f"buffer/{name}/add")
+    def add(args):
+        d = driver(args)
+        buffer = d.build()
+
+        def fill():
+            buffer.reset()
+            d.fill(buffer)
+
+        return fill, args.n_envs * args.n_steps
+
+    if not driver_is_replay(name):
+
+        @case(f"buffer/{name}/gae")
+        def gae(args):
+            d = driver(args)
+            buffer = d.build()
+            d.fill(buffer)
+            return (lambda: d.finish(buffer)), args.n_envs * args.n_steps
+
+    @case(f"buffer/{name}/get")
+    def get(args):
+        d = driver(args)
+        buffer = d.build()
+        d.fill(buffer)
+        d.finish(buffer)
+        return (lambda: d.read(buffer, args.batch_size)), args.n_envs * args.n_steps
+
+
+def driver_is_replay(name: str) -> bool:
+    return name in ("ReplayBuffer", "DictReplayBuffer")
+
+
+for _name in BUFFER_CLASSES:
+    _register_buffer(_name)
+
+
+@case("recurrent/split_and_pad")
+def split_and_pad(args):
+    from rlopt.common.utils import split_and_pad_trajectories, unpad_trajectories
+
+    generator = torch.Generator().manual_seed(args.seed)
+    obs = torch.randn(
+        args.n_steps, args.n_envs, args.student_obs_dim, generator=generator
+    )
+    dones = torch.rand(args.n_steps, args.n_envs, 1, generator=generator) < (
+        1.0 / args.episode_length
+    )
+    obs, dones = obs.to(args.device), dones.to(args.device)
+
+    def pad_unpad():
+        padded, masks = split_and_pad_trajectories(obs, dones)
+        unpad_trajectories(padded, masks)
+
+    return pad_unpad, args.n_envs * args.n_steps
+
+
+def _policy_and_batch(args):
+    from stable_baselines3.common.policies import ActorCriticPolicy
+
+    env = make_mock_vec_env(args)
+    policy = ActorCriticPolicy(
+        env.observation_space["teacher"], env.action_space, lambda _: 3e-4
+    ).eval()
+    obs = torch.randn(
+        args.n_envs, args.obs_dim, generator=torch.Generator().manual_seed(args.seed)
+    )
+    return policy, obs
+
+
+@case("onnx/torch")
+def onnx_torch(args):
+    from rlopt.common.utils import OnnxableOnPolicy
+
+    policy, obs = _policy_and_batch(args)
+    model = OnnxableOnPolicy(policy)
+
+    def infer():
+        with torch.inference_mode():
+            model(obs)
+
+    return infer, args.n_envs
+
+
+@case("onnx/onnxruntime")
+def onnx_runtime(args):
+    import onnxruntime as ort
+
+    from rlopt.common.utils import export_to_onnx
+
+    policy, obs = _policy_and_batch(args)
+    path = os.path.join(tempfile.mkdtemp(), "policy.onnx")
+    export_to_onnx(policy, path, input_shape=(args.obs_dim,))
+    session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+    feed = {"input": obs.numpy()}
+    return (lambda: session.run(None, feed)), args.n_envs
+
+
+def run_case(name: str, args) -> dict:
+    np.random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    try:
+        fn, items = CASES[name](args)
+    except ImportError as e:
+        return {"skipped": f"{type(e).__name__}: {e}"}
+    except Exception as e:
+        traceback.print_exc()
+        return {"error": f"{type(e).__name__}: {e}"}
+
+    try:
+        for _ in range(args.warmup):
+            fn()
+        times = []
+        for _ in range(args.repeat):
+            if args.device.startswith("cuda"):
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            fn()
+            if args.device.startswith("cuda"):
+                torch.cuda.synchronize()
+            times.append(time.perf_counter() - start)
+    except Exception as e:
+        traceback.print_exc()
+        return {"error": f"{type(e).__name__}: {e}"}
+    median = statistics.median(times)
+    return {
+        "median_s": median,
+        "min_s": min(times),
+        "mean_s": statistics.fmean(times),
+        "items_per_s": items / median,
+        "repeat": len(times),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filter", type=str, default=None, help="Regex on case names")
+    parser.add_argument("--output", type=str, default=None)
+    parser.add_argument("--list", action="store_true", help="List the cases and exit")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--n-envs", type=int, default=256)
+    parser.add_argument("--n-steps", type=int, default=32)
+    parser.add_argument("--obs-dim", type=int, default=48)
+    parser.add_argument("--student-obs-dim", type=int, default=30)
+    parser.add_argument("--action-dim", type=int, default=12)
+    parser.add_argument("--episode-length", type=int, default=200)
+    parser.add_argument("--step-cost", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    names = [n for n in CASES if args.filter is None or re.search(args.filter, n)]
+    if args.list:
+        print("\n".join(names))
+        return
+
+    results = {}
+    # the agents print while being built, keep stdout for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        for name in names:
+            results[name] = run_case(name, args)
+            print(f"{name}: {results[name]}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
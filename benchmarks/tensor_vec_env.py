@@ -0,0 +1,89 @@
+"""
+Per-step time of a ``MockBatchedSim`` with ``--num-envs`` environments behind
+``TensorVecEnv`` versus the numpy round trip of a conventional ``VecEnv`` adapter
+(observations, rewards and dones converted to numpy, then back to tensors with
+``obs_as_tensor`` by the agent), the agent-side episode bookkeeping included.
+
+Usage::
+
+    python benchmarks/tensor_vec_env.py --num-envs 4096 --device cuda
+"""
+
+import argparse
+import json
+import time
+
+import torch
+
+from rlopt.common.utils import obs_as_tensor
+from rlopt.envs.mock_sim import MockBatchedSim
+from rlopt.envs.tensor_vec_env import TensorVecEnv
+
+
+def numpy_round_trip(env: TensorVecEnv, actions: torch.Tensor):
+    obs, rewards, dones, infos = env.step(actions)
+    obs = {k: v.cpu().numpy() for k, v in obs.items()}
+    rewards, dones = rewards.cpu().numpy(), dones.cpu().numpy()
+    time_outs = infos["time_outs"].cpu().numpy()
+    return (
+        obs_as_tensor(obs, env.device),
+        obs_as_tensor(rewards, env.device),
+        obs_as_tensor(dones, env.device),
+        {"time_outs": obs_as_tensor(time_outs, env.device)},
+    )
+
+
+def tensor_native(env: TensorVecEnv, actions: torch.Tensor):
+    return env.step(actions)
+
+
+def seconds_per_step(step_fn, args, n_warmup: int = 10) -> float:
+    env = TensorVecEnv(
+        MockBatchedSim(args.num_envs, device=args.device),
+        groups={"teacher": "policy", "student": "student"},
+    )
+    env.reset()
+    actions = torch.zeros(args.num_envs, 12, device=env.device)
+    reward_sum = torch.zeros(args.num_envs, device=env.device)
+    episode_length = torch.zeros(args.num_envs, device=env.device)
+    finished = []
+    for i in range(n_warmup + args.n_steps):
+        if i == n_warmup:
+            if env.device.type == "cuda":
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+        _, rewards, dones, _ = step_fn(env, actions)
+        # reward tracking of the teacher-student agents
+        reward_sum += rewards
+        episode_length += 1
+        new_ids = (dones > 0).nonzero(as_tuple=False)
+        finished.extend(reward_sum[new_ids][:, 0].tolist())
+        reward_sum[new_ids] = 0
+        episode_length[new_ids] = 0
+    if env.device.type == "cuda":
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / args.n_steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-envs", type=int, default=4096)
+    parser.add_argument("--n-steps", type=int, default=200)
+    parser.add_argument("--device", type=str, default="cpu")
+    args = parser.parse_args()
+
+    result = {}
+    for name, step_fn in (
+        ("numpy_round_trip", numpy_round_trip),
+        ("tensor_vec_env", tensor_native),
+    ):
+        seconds = seconds_per_step(step_fn, args)
+        result[name] = {
+            "step_ms": seconds * 1e3,
+            "frames_per_second": args.num_envs / seconds,
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
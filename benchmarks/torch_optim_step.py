@@ -0,0 +1,94 @@
+"""
+Per-step time of ``optimizer.step()`` for Adam versus the ``rlopt.opt.torch_optim``
+AC-FGD and AGD optimizers, on actor/critic MLPs with the sizes used by PPO and IPMD
+(two hidden layers of 256 units by default).
+
+Usage::
+
+    python benchmarks/torch_optim_step.py --device cuda --hidden 256 256
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+from torch import nn
+
+from rlopt.opt.torch_optim import make_torch_optimizer
+
+
+def make_mlp(in_features: int, hidden, out_features: int) -> nn.Sequential:
+    layers, last = [], in_features
+    for size in hidden:
+        layers += [nn.Linear(last, size), nn.Tanh()]
+        last = size
+    layers.append(nn.Linear(last, out_features))
+    return nn.Sequential(*layers)
+
+
+def run(name: str, args) -> dict:
+    torch.manual_seed(0)
+    actor = make_mlp(args.obs_dim, args.hidden, 2 * args.action_dim).to(args.device)
+    critic = make_mlp(args.obs_dim + args.action_dim, args.hidden, 1).to(args.device)
+    optimizer = make_torch_optimizer(
+        name,
+        [*actor.parameters(), *critic.parameters()],
+        lr=args.lr,
+        adam_kwargs={"eps": 1e-5},
+    )
+    obs = torch.randn(args.batch_size, args.obs_dim, device=args.device)
+    action = torch.randn(args.batch_size, args.action_dim, device=args.device)
+
+    def closure():
+        optimizer.zero_grad()
+        loss = (
+            actor(obs).pow(2).mean()
+            + critic(torch.cat([obs, action], -1)).pow(2).mean()
+        )
+        loss.backward()
+        return loss
+
+    step_times, losses = [], []
+    for i in range(args.n_warmup + args.n_steps):
+        losses.append(float(closure().detach()))
+        if args.device.startswith("cuda"):
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        optimizer.step()
+        if args.device.startswith("cuda"):
+            torch.cuda.synchronize()
+        if i >= args.n_warmup:
+            step_times.append(time.perf_counter() - start)
+
+    step_times = np.array(step_times) * 1e3
+    return {
+        "step_ms_p50": float(np.percentile(step_times, 50)),
+        "step_ms_mean": float(step_times.mean()),
+        "first_loss": losses[0],
+        "final_loss": losses[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--hidden", type=int, nargs="+", default=[256, 256])
+    parser.add_argument("--obs-dim", type=int, default=17)
+    parser.add_argument("--action-dim", type=int, default=6)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--lr", type=float, default=3e-4)
+    parser.add_argument("--n-steps", type=int, default=200)
+    parser.add_argument("--n-warmup", type=int, default=10)
+    args = parser.parse_args()
+
+    print(
+        json.dumps(
+            {name: run(name, args) for name in ("adam", "acfgd", "agd")}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+from rlopt._lazy import lazy_getattr
+
+# subpackages are imported on first access, `import rlopt` stays cheap
+__getattr__, __dir__ = lazy_getattr(
+    __name__, {}, submodules=("agent", "common", "envs", "opt", "runtime")
+)
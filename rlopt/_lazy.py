@@ -0,0 +1,66 @@
+"""
+Lazy attribute loading for package ``__init__`` modules (PEP 562).
+
+The agents pull in stable-baselines3, sb3-contrib, torchrl, hydra and gymnasium, which
+take seconds to import. Packages declare the names they export and the module each
+name lives in, and the module is only imported the first time the name is accessed.
+"""
+
+import importlib
+from typing import Callable, Dict, Iterable, Tuple
+
+# top-level module of an optional dependency -> pip requirement
+OPTIONAL_DEPENDENCIES = {
+    "stable_baselines3": "stable-baselines3",
+    "sb3_contrib": "sb3-contrib",
+    "torchrl": "torchrl",
+    "tensordict": "tensordict",
+    "gymnasium": "gymnasium",
+    "hydra": "hydra-core",
+    "omegaconf": "omegaconf",
+    "wandb": "wandb",
+}
+
+
+def lazy_getattr(
+    package: str, attributes: Dict[str, str], submodules: Iterable[str] = ()
+) -> Tuple[Callable[[str], object], Callable[[], list]]:
+    """
+    Build the module-level ``__getattr__`` and ``__dir__`` of ``package``.
+
+    :param package: ``__name__`` of the package
+    :param attributes: Exported name -> module defining it, relative to ``package``
+    :param submodules: Subpackages that are imported on attribute access
+    :return: ``__getattr__`` and ``__dir__`` functions
+    """
+    submodules = tuple(submodules)
+
+    def __getattr__(name: str):
+        if name in attributes:
+            module_name = attributes[name]
+        elif name in submodules:
+            module_name = f".{name}"
+        else:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+
+        try:
+            module = importlib.import_module(module_name, package)
+        except ModuleNotFoundError as e:
+            missing = (e.name or "").split(".")[0]
+            if missing not in OPTIONAL_DEPENDENCIES:
+                raise
+            raise ImportError(
+                f"{package}.{name} requires {missing}, "
+                f"install it with `pip install {OPTIONAL_DEPENDENCIES[missing]}`"
+            ) from e
+
+        value = module if name in submodules else getattr(module, name)
+        # cache in the package namespace, later lookups skip __getattr__
+        vars(importlib.import_module(package))[name] = value
+        return value
+
+    def __dir__():
+        namespace = vars(importlib.import_module(package))
+        return sorted({*namespace, *attributes, *submodules})
+
+    return __getattr__, __dir__
@@ -1,8 +1,24 @@
-from .l2t.recurrent_l2t import RecurrentL2T
-from .l2t.l2t import L2T
+from typing import TYPE_CHECKING
 
-# from .ppo.ppo import PPO
-from .tsl.teacher_student_learning import TeacherStudentLearning
-from .tsl.student_only import RecurrentStudent
+from rlopt._lazy import lazy_getattr
 
-__all__ = ["RecurrentL2T", "L2T", "TeacherStudentLearning"]
+if TYPE_CHECKING:
+    from .l2t.recurrent_l2t import RecurrentL2T
+    from .l2t.l2t import L2T
+    from .ppo.ppo import PPO
+    from .tsl.teacher_student_learning import TeacherStudentLearning
+    from .tsl.student_only import RecurrentStudent
+
+# the agents import stable-baselines3, sb3-contrib and torchrl, load them on first use
+__getattr__, __dir__ = lazy_getattr(
+    __name__,
+    {
+        "RecurrentL2T": ".l2t.recurrent_l2t",
+        "L2T": ".l2t.l2t",
+        "PPO": ".ppo.ppo",
+        "TeacherStudentLearning": ".tsl.teacher_student_learning",
+        "RecurrentStudent": ".tsl.student_only",
+    },
+)
+
+__all__ = ["RecurrentL2T", "L2T", "PPO", "TeacherStudentLearning", "RecurrentStudent"]
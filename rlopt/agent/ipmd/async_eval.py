@@ -0,0 +1,151 @@
+"""Deterministic evaluation rollouts in a separate process.
+
+The evaluation process owns its own batched (serial) eval env and a CPU copy of the
+actor. The training process publishes actor weight snapshots into a shared-memory
+TensorDict and only pays for that copy; the evaluation process picks up the most
+recent snapshot, runs ``num_episodes`` deterministic episodes and streams the results
+back through a queue that the training loop polls without blocking.
+"""
+
+from __future__ import annotations
+
+import copy
+import functools
+import multiprocessing as mp
+import queue
+from typing import Dict, List, Tuple
+
+import torch
+from omegaconf import OmegaConf
+from tensordict import TensorDict
+from torchrl.envs import EnvCreator, SerialEnv
+from torchrl.envs.utils import ExplorationType, set_exploration_type
+
+from utils import apply_env_transforms, env_maker
+
+
+def _evaluate(env, actor, num_episodes: int, max_steps: int) -> Dict[str, float]:
+    episode_rewards, episode_lengths = [], []
+    while len(episode_rewards) < num_episodes:
+        rollout = env.rollout(max_steps, actor, break_when_any_done=False)
+        done = rollout["next", "done"]
+        episode_rewards.extend(rollout["next", "episode_reward"][done].tolist())
+        episode_lengths.extend(rollout["next", "step_count"][done].tolist())
+    return {
+        "eval/reward": sum(episode_rewards[:num_episodes]) / num_episodes,
+        "eval/episode_length": sum(episode_lengths[:num_episodes]) / num_episodes,
+    }
+
+
+def _eval_worker(
+    cfg_dict, actor, weights, step, lock, requests, results, num_episodes, num_envs
+):
+    torch.set_num_threads(1)
+    cfg = OmegaConf.create(cfg_dict)
+    env = apply_env_transforms(
+        SerialEnv(num_envs, EnvCreator(functools.partial(env_maker, cfg=cfg))),
+        cfg.env.max_episode_steps,
+    )
+    env.set_seed(cfg.env.seed)
+    params = TensorDict.from_module(actor).data
+
+    stop = False
+    while not stop:
+        # coalesce queued requests, the shared weights hold the newest snapshot anyway
+        items = [requests.get()]
+        while True:
+            try:
+                items.append(requests.get_nowait())
+            except queue.Empty:
+                break
+        stop = None in items
+        if all(item is None for item in items):
+            continue
+        with lock:
+            params.update_(weights)
+            eval_step = int(step.item())
+        with set_exploration_type(ExplorationType.DETERMINISTIC), torch.no_grad():  # type: ignore
+            metrics = _evaluate(env, actor, num_episodes, cfg.env.max_episode_steps)
+        results.put((eval_step, metrics))
+
+    env.close()
+    results.put(None)
+
+
+class AsyncEvaluator:
+    """Evaluate actor snapshots in a background process.
+
+    Args:
+        cfg (DictConfig): the training config, used to build the eval env
+        actor (nn.Module): the actor being trained
+        num_episodes (int): deterministic episodes per evaluation
+        num_envs (int): number of envs of the batched eval env
+    """
+
+    def __init__(self, cfg, actor, num_episodes: int = 10, num_envs: int = 1):
+        ctx = mp.get_context("spawn")
+        self._weights = TensorDict.from_module(actor).data.cpu().clone().share_memory_()
+        self._step = torch.zeros((), dtype=torch.int64).share_memory_()
+        self._lock = ctx.Lock()
+        self._requests = ctx.Queue()
+        self._results = ctx.Queue()
+        self._process = ctx.Process(
+            target=_eval_worker,
+            args=(
+                OmegaConf.to_container(cfg, resolve=True),
+                copy.deepcopy(actor).cpu(),
+                self._weights,
+                self._step,
+                self._lock,
+                self._requests,
+                self._results,
+                num_episodes,
+                num_envs,
+            ),
+            name="ipmd-eval",
+        )
+        self._process.start()
+
+    def submit(self, actor, step: int):
+        """Publish the current actor weights and request an evaluation at ``step``."""
+        with self._lock:
+            self._weights.update_(TensorDict.from_module(actor).data)
+            self._step.fill_(step)
+        self._requests.put(step)
+
+    def poll(self) -> List[Tuple[int, Dict[str, float]]]:
+        """Return the finished evaluations as (step, metrics) pairs, without blocking."""
+        finished = []
+        while True:
+            try:
+                item = self._results.get_nowait()
+            except queue.Empty:
+                return finished
+            if item is not None:
+                finished.append(item)
+
+    def close(self, timeout: float = 10.0) -> List[Tuple[int, Dict[str, float]]]:
+        """Wait for the pending evaluation, stop the process and return the last results.
+
+        Results are collected for as long as the process is alive, so a process that
+        dies mid-evaluation does not block. A process that has not exited ``timeout``
+        seconds after its last result is terminated.
+        """
+        finished = []
+        if self._process.is_alive():
+            self._requests.put(None)
+        while True:
+            try:
+                item = self._results.get(timeout=0.1)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    break
+                continue
+            if item is None:
+                break
+            finished.append(item)
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        return finished
@@ -0,0 +1,191 @@
+"""Sharded, memory-mapped expert demonstrations for IPMD.
+
+Expert data is stored as one or more ``.pt`` shards, each a dict (or TensorDict) of
+tensors sharing the same leading dimension. Shards are memory-mapped with
+``torch.load(mmap=True)``, so only the rows that are sampled are read from disk, and
+minibatches are drawn uniformly across all shards without materializing repeats.
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from typing import Dict, List, Optional, Union
+
+import torch
+from tensordict import TensorDict
+
+
+def write_expert_shards(
+    data: Union[TensorDict, Dict[str, torch.Tensor]],
+    directory: str,
+    shard_size: int = 100_000,
+) -> List[str]:
+    """Split expert demonstrations into ``shard_size``-row shards in ``directory``."""
+    if not isinstance(data, TensorDict):
+        data = TensorDict(data, batch_size=[len(next(iter(data.values())))])
+    data = data.reshape(-1)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, start in enumerate(range(0, len(data), shard_size)):
+        path = os.path.join(directory, f"shard_{i:05d}.pt")
+        shard = data[start : start + shard_size]
+        torch.save({key: value.contiguous() for key, value in shard.items()}, path)
+        paths.append(path)
+    return paths
+
+
+class ShardedExpertDataset:
+    """Uniform random access over sharded expert demonstrations.
+
+    Args:
+        path (str): a shard file, or a directory containing ``*.pt`` shards
+        keys (list of str, optional): keys to load, defaults to all keys of the first shard
+    """
+
+    def __init__(self, path: str, keys: Optional[List[str]] = None):
+        if os.path.isdir(path):
+            self.shard_paths = sorted(
+                os.path.join(path, name)
+                for name in os.listdir(path)
+                if name.endswith(".pt")
+            )
+        else:
+            self.shard_paths = [path]
+        if not self.shard_paths:
+            raise FileNotFoundError(f"No expert shards found in {path}")
+
+        self.keys = keys
+        self._shards: List[Optional[Dict[str, torch.Tensor]]] = [None] * len(
+            self.shard_paths
+        )
+        sizes = []
+        for i in range(len(self.shard_paths)):
+            shard = self._shard(i)
+            sizes.append(len(next(iter(shard.values()))))
+        self.shard_sizes = torch.tensor(sizes)
+        self.cumulative_sizes = torch.cumsum(self.shard_sizes, 0)
+
+    def __len__(self) -> int:
+        return int(self.cumulative_sizes[-1])
+
+    def _shard(self, i: int) -> Dict[str, torch.Tensor]:
+        if self._shards[i] is None:
+            shard = torch.load(
+                self.shard_paths[i], map_location="cpu", mmap=True, weights_only=False
+            )
+            if isinstance(shard, TensorDict):
+                shard = shard.to_dict()
+            if self.keys is None:
+                self.keys = list(shard.keys())
+            self._shards[i] = {key: shard[key] for key in self.keys}
+        return self._shards[i]  # type: ignore
+
+    def get(self, indices: torch.Tensor) -> TensorDict:
+        """Gather the rows at the given global indices."""
+        shard_ids = torch.searchsorted(self.cumulative_sizes, indices, right=True)
+        offsets = self.cumulative_sizes - self.shard_sizes
+        local = indices - offsets[shard_ids]
+        out = {}
+        for key in self.keys:  # type: ignore
+            first = self._shard(0)[key]
+            out[key] = torch.empty(len(indices), *first.shape[1:], dtype=first.dtype)
+        for shard_id in shard_ids.unique().tolist():
+            mask = shard_ids == shard_id
+            rows = local[mask]
+            shard = self._shard(shard_id)
+            for key in self.keys:  # type: ignore
+                out[key][mask] = shard[key][rows]
+        return TensorDict(out, batch_size=[len(indices)])
+
+    def sample(
+        self, batch_size: int, generator: Optional[torch.Generator] = None
+    ) -> TensorDict:
+        """Sample ``batch_size`` rows uniformly (with replacement) across all shards."""
+        indices = torch.randint(0, len(self), (batch_size,), generator=generator)
+        return self.get(indices)
+
+
+class ExpertBatchPrefetcher:
+    """Sample expert minibatches in a background thread.
+
+    Batches are gathered from the shards, pinned and moved to ``device`` ahead of time
+    so that ``next()`` returns immediately when called next to the policy batch
+    sampling in ``train_ipmd``.
+
+    Args:
+        dataset (ShardedExpertDataset): the expert dataset
+        batch_size (int): expert minibatch size
+        device (torch.device): device of the returned batches
+        prefetch (int): number of batches prepared ahead
+        seed (int, optional): seed of the sampling generator
+    """
+
+    def __init__(
+        self,
+        dataset: ShardedExpertDataset,
+        batch_size: int,
+        device: Union[str, torch.device] = "cpu",
+        prefetch: int = 2,
+        seed: Optional[int] = None,
+    ):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.device = torch.device(device)
+        self.generator = torch.Generator()
+        if seed is not None:
+            self.generator.manual_seed(seed)
+        self._queue: "queue.Queue[Optional[TensorDict]]" = queue.Queue(maxsize=prefetch)
+        self._error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._worker_loop, name="expert-prefetch", daemon=True
+        )
+        self._thread.start()
+
+    def _put(self, item: Optional[TensorDict]):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+
+    def _worker_loop(self):
+        pin = self.device.type == "cuda"
+        try:
+            while not self._stop.is_set():
+                batch = self.dataset.sample(self.batch_size, generator=self.generator)
+                if pin:
+                    batch = batch.pin_memory()
+                # blocking copy: it only blocks this thread
+                self._put(batch.to(self.device))
+        except BaseException as e:  # surfaced on the training thread
+            self._error = e
+            self._put(None)
+
+    def next(self) -> TensorDict:
+        while True:
+            try:
+                batch = self._queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if not self._thread.is_alive() and self._queue.empty():
+                    raise RuntimeError(
+                        "Expert batch prefetcher is not running"
+                    ) from None
+        if batch is None:
+            error, self._error = self._error, None
+            raise RuntimeError("Expert batch prefetching failed") from error
+        return batch
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> TensorDict:
+        return self.next()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
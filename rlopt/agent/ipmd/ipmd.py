@@ -20,15 +20,22 @@ from torchrl.record.loggers import generate_exp_name, get_logger
 from tensordict.nn import InteractionType, TensorDictModule
 from tensordict.nn.distributions import NormalParamExtractor
 from torch import nn, optim
+from torch.optim.adam import adam
 from torchrl.collectors import SyncDataCollector
 from torchrl.data import TensorDictPrioritizedReplayBuffer, TensorDictReplayBuffer
 from torchrl.data.replay_buffers.storages import LazyMemmapStorage
 from torchrl.modules import MLP, ProbabilisticActor, ValueOperator
 from torchrl.modules.distributions import TanhNormal
-from torchrl.objectives import SoftUpdate
+from torchrl.objectives import SoftUpdate, group_optimizers
 from torchrl.objectives.sac import SACLoss
 
+from rlopt.common.profiling import TrainingProfiler, iter_phase, record_phase
+from rlopt.opt.torch_optim import make_torch_optimizer
 
+
+from async_eval import AsyncEvaluator
+from expert_data import ExpertBatchPrefetcher, ShardedExpertDataset
+from replay_prefetch import PrefetchReplaySampler
 from utils import (
     dump_video,
     log_metrics,
@@ -94,54 +101,6 @@ def make_replay_buffer(
     return replay_buffer
 
 
-####### Expert Buffer
-
-
-def load_expert_data(data_path, device="cpu", batch_size=None) -> TensorDict:
-    """
-    Load expert demonstrations from a file into a TensorDict.
-    """
-    expert_data = torch.load(data_path, map_location=device)
-
-    # Create Tensor Dict
-    if not isinstance(expert_data, TensorDict):
-        if isinstance(expert_data, dict):
-            expert_data = TensorDict(
-                expert_data, batch_size=[len(next(iter(expert_data.values())))]
-            )
-
-    if batch_size is not None:
-        expert_data = expert_data.reshape(-1)  #
-        if len(expert_data) < batch_size:
-            # Repeat data if needed
-            num_repeats = (batch_size + len(expert_data) - 1) // len(expert_data)
-            expert_data = expert_data.repeat(num_repeats)
-        expert_data = expert_data[:batch_size]  # Trim to exact batch size
-
-    return expert_data
-
-
-def create_expert_replay_buffer(
-    expert_data: TensorDict, buffer_size: int, batch_size: int, device
-) -> TensorDictReplayBuffer:
-    """
-    Create a replay buffer from expert demonstrations.
-
-    TensorDictReplayBuffer containing expert demonstrations
-    """
-    expert_buffer = TensorDictReplayBuffer(
-        storage=LazyMemmapStorage(
-            buffer_size,
-            device=device,
-        ),
-        batch_size=batch_size,
-    )
-
-    expert_buffer.extend(expert_data)
-
-    return expert_buffer
-
-
 class DeterministicRewardEstimator(TensorDictModule):
     """General class for value functions in RL.
 
@@ -284,8 +243,6 @@ def make_ipmd_agent(cfg, train_env, eval_env, device):
 # SAC Loss
 # ---------
 
-from utils import SACLossWithRewardEstimation
-
 
 def make_loss_module(cfg, model):
     """Make loss module and target network updater."""
@@ -326,33 +283,253 @@ def split_critic_params(critic_params):
 def make_ipmd_optimizer(cfg, loss_module):
     critic_params = list(loss_module.qvalue_network_params.flatten_keys().values())
     actor_params = list(loss_module.actor_network_params.flatten_keys().values())
-    reward_params = list(loss_module.reward_network_params.flatten_keys().values())
-
-    optimizer_actor = optim.Adam(
-        actor_params,
-        lr=cfg.optim.lr,
-        weight_decay=cfg.optim.weight_decay,
-        eps=cfg.optim.adam_eps,
+    reward_params = list(loss_module.reward_network.parameters())
+
+    # Adam unless `optim.name` selects an rlopt.opt method, alpha always uses Adam
+    name = cfg.optim.get("name", "adam")
+    kwargs = dict(cfg.optim.get("kwargs") or {})
+    adam_kwargs = {"weight_decay": cfg.optim.weight_decay, "eps": cfg.optim.adam_eps}
+    optimizer_actor = make_torch_optimizer(
+        name, actor_params, lr=cfg.optim.lr, adam_kwargs=adam_kwargs, **kwargs
     )
-    optimizer_critic = optim.Adam(
-        critic_params,
-        lr=cfg.optim.lr,
-        weight_decay=cfg.optim.weight_decay,
-        eps=cfg.optim.adam_eps,
+    optimizer_critic = make_torch_optimizer(
+        name, critic_params, lr=cfg.optim.lr, adam_kwargs=adam_kwargs, **kwargs
     )
     optimizer_alpha = optim.Adam(
         [loss_module.log_alpha],
         lr=3.0e-4,
     )
-    optimizer_reward = optim.Adam(
-        reward_params,
-        lr=cfg.optim.lr,
-        weight_decay=cfg.optim.weight_decay,
-        eps=cfg.optim.adam_eps,
+    optimizer_reward = make_torch_optimizer(
+        name, reward_params, lr=cfg.optim.lr, adam_kwargs=adam_kwargs, **kwargs
     )
     return optimizer_actor, optimizer_critic, optimizer_alpha, optimizer_reward
 
 
+IPMD_LOSS_KEYS = ("loss_actor", "loss_qvalue", "loss_alpha", "loss_reward")
+
+
+def make_ipmd_update(cfg, loss_module, target_net_updater, optimizers):
+    """Make the per-minibatch update function.
+
+    With ``cfg.optim.fused_update`` all losses are summed and back-propagated once,
+    followed by a single grouped optimizer step. The SAC losses already detach their
+    cross-terms (the actor loss uses detached Q-params, the Q-targets and the alpha
+    loss are computed without grad), so this gives the same gradients as one
+    backward per loss while traversing the shared graph only once.
+    """
+    (
+        optimizer_actor,
+        optimizer_critic,
+        optimizer_alpha,
+        optimizer_reward,
+    ) = optimizers
+
+    if cfg.optim.get("fused_update", False):
+        if len({type(optimizer) for optimizer in optimizers}) == 1:
+            grouped_optimizers = [group_optimizers(*optimizers)]
+        else:
+            # e.g. AC-FGD networks with an Adam temperature, cannot be grouped
+            grouped_optimizers = list(optimizers)
+
+        def update(sampled_tensordict, expert_tensordict=None):
+            with record_phase("forward"):
+                loss_td = loss_module(sampled_tensordict, expert_tensordict)
+                loss = sum(loss_td[key] for key in IPMD_LOSS_KEYS if key in loss_td)
+            with record_phase("backward"):
+                loss.backward()
+            with record_phase("optimizer_step"):
+                for optimizer in grouped_optimizers:
+                    optimizer.step()
+                    optimizer.zero_grad(set_to_none=True)
+            return loss_td.detach()
+
+        compile_cfg = cfg.get("compile", None)
+        if compile_cfg is not None and compile_cfg.compile:
+            update = torch.compile(update, mode=compile_cfg.compile_mode or None)
+
+    else:
+
+        def step(optimizer, loss):
+            optimizer.zero_grad()
+            with record_phase("backward"):
+                loss.backward()
+            with record_phase("optimizer_step"):
+                optimizer.step()
+
+        def update(sampled_tensordict, expert_tensordict=None):
+            with record_phase("forward"):
+                loss_td = loss_module(sampled_tensordict, expert_tensordict)
+
+            # Update actor, critic and alpha
+            step(optimizer_actor, loss_td["loss_actor"])
+            step(optimizer_critic, loss_td["loss_qvalue"])
+            step(optimizer_alpha, loss_td["loss_alpha"])
+
+            # Update reward
+            if "loss_reward" in loss_td:
+                step(optimizer_reward, loss_td["loss_reward"])
+            return loss_td.detach()
+
+    def update_and_target(sampled_tensordict, expert_tensordict=None):
+        loss_td = update(sampled_tensordict, expert_tensordict)
+        # Update qnet_target params
+        target_net_updater.step()
+        return loss_td
+
+    return update_and_target
+
+
+def init_adam_state(optimizer: optim.Adam):
+    """Create the state ``optimizer.step()`` would lazily create on its first call."""
+    for group in optimizer.param_groups:
+        for param in group["params"]:
+            state = optimizer.state[param]
+            if state:
+                continue
+            if group["capturable"] or group["fused"]:
+                state["step"] = torch.zeros((), device=param.device)
+            else:
+                state["step"] = torch.tensor(0.0)
+            state["exp_avg"] = torch.zeros_like(param)
+            state["exp_avg_sq"] = torch.zeros_like(param)
+            if group["amsgrad"]:
+                state["max_exp_avg_sq"] = torch.zeros_like(param)
+
+
+def adam_step(optimizer: optim.Adam, grads: Sequence[Optional[torch.Tensor]]):
+    """Adam step of ``optimizer`` with explicit gradients.
+
+    ``grads`` holds one gradient per parameter of ``optimizer.param_groups``, in order,
+    ``None`` skips the parameter. The functional ``torch.optim.adam.adam`` updates the
+    parameters and the optimizer state in place, so unlike ``optimizer.step()`` it can
+    be traced by ``torch.compile`` without a graph break.
+    """
+    grads = iter(grads)
+    for group in optimizer.param_groups:
+        params, param_grads, states = [], [], []
+        for param in group["params"]:
+            grad = next(grads)
+            if grad is not None:
+                params.append(param)
+                param_grads.append(grad)
+                states.append(optimizer.state[param])
+        if not params:
+            continue
+        beta1, beta2 = group["betas"]
+        adam(
+            params,
+            param_grads,
+            [state["exp_avg"] for state in states],
+            [state["exp_avg_sq"] for state in states],
+            [state["max_exp_avg_sq"] for state in states] if group["amsgrad"] else [],
+            [state["step"] for state in states],
+            foreach=group["foreach"],
+            capturable=group["capturable"],
+            fused=group["fused"],
+            decoupled_weight_decay=group["decoupled_weight_decay"],
+            amsgrad=group["amsgrad"],
+            beta1=beta1,
+            beta2=beta2,
+            lr=group["lr"],
+            weight_decay=group["weight_decay"],
+            eps=group["eps"],
+            maximize=group["maximize"],
+        )
+
+
+def make_ipmd_multi_update(cfg, loss_module, target_net_updater, optimizers):
+    """Make an update function that consumes several minibatches sampled at once.
+
+    ``sampled_tensordicts`` (and ``expert_tensordicts``) have shape
+    ``[num_minibatches, batch_size]``, i.e. a single replay buffer sample of
+    ``num_minibatches * batch_size`` transitions reshaped into minibatches. The
+    minibatches are consumed in order, each with a full IPMD update, so from a uniform
+    replay buffer the result matches sampling and updating one minibatch at a time.
+    With a prioritized buffer, all minibatches of a sample are drawn with the same
+    priorities. The losses of all minibatches are returned stacked.
+
+    With ``cfg.optim.fused_update`` and Adam optimizers, the fused update is written
+    functionally: the summed losses are differentiated with ``torch.autograd.grad``
+    over the explicit parameter list and each optimizer steps through
+    :func:`adam_step`. With ``cfg.compile.compile`` the whole loop, target network
+    updates included, is then compiled into one graph, which is unrolled and compiled
+    again for each number of minibatches. Otherwise the update of
+    :func:`make_ipmd_update` runs once per minibatch.
+    """
+    loss_keys = IPMD_LOSS_KEYS + ("alpha", "entropy")
+
+    if not cfg.optim.get("fused_update", False) or any(
+        type(optimizer) is not optim.Adam for optimizer in optimizers
+    ):
+        update = make_ipmd_update(cfg, loss_module, target_net_updater, optimizers)
+
+        def multi_update(sampled_tensordicts, expert_tensordicts=None):
+            sampled_list = sampled_tensordicts.unbind(0)
+            if expert_tensordicts is None:
+                expert_list = [None] * len(sampled_list)
+            else:
+                expert_list = expert_tensordicts.unbind(0)
+
+            losses = []
+            for sampled_tensordict, expert_tensordict in zip(
+                sampled_list, expert_list
+            ):
+                loss_td = update(sampled_tensordict, expert_tensordict)
+                losses.append(
+                    loss_td.select(*[key for key in loss_keys if key in loss_td])
+                )
+            return torch.stack(losses)
+
+        return multi_update
+
+    params = [
+        param
+        for optimizer in optimizers
+        for group in optimizer.param_groups
+        for param in group["params"]
+    ]
+    num_params = [
+        sum(len(group["params"]) for group in optimizer.param_groups)
+        for optimizer in optimizers
+    ]
+
+    def scan(sampled_tensordicts, expert_tensordicts=None):
+        losses = []
+        for i in range(sampled_tensordicts.shape[0]):
+            expert_tensordict = (
+                None if expert_tensordicts is None else expert_tensordicts[i]
+            )
+            loss_td = loss_module(sampled_tensordicts[i], expert_tensordict)
+            loss = sum(loss_td[key] for key in IPMD_LOSS_KEYS if key in loss_td)
+            grads = iter(torch.autograd.grad(loss, params, allow_unused=True))
+            with torch.no_grad():
+                for optimizer, n in zip(optimizers, num_params):
+                    adam_step(optimizer, [next(grads) for _ in range(n)])
+                target_net_updater.step()
+            losses.append(
+                loss_td.select(*[key for key in loss_keys if key in loss_td]).detach()
+            )
+        return torch.stack(losses)
+
+    compile_cfg = cfg.get("compile", None)
+    if compile_cfg is not None and compile_cfg.compile:
+        compiled_scan = torch.compile(scan, mode=compile_cfg.compile_mode or None)
+
+        def scan(sampled_tensordicts, expert_tensordicts=None):
+            # lets torch.compile trace the gradient computation instead of breaking
+            # the graph, which would make it fall back to eager for the whole loop
+            with torch._dynamo.config.patch(trace_autograd_ops=True):
+                return compiled_scan(sampled_tensordicts, expert_tensordicts)
+
+    def multi_update(sampled_tensordicts, expert_tensordicts=None):
+        for optimizer in optimizers:
+            # e.g. after loading an optimizer checkpoint without state
+            init_adam_state(optimizer)
+        return scan(sampled_tensordicts, expert_tensordicts)
+
+    return multi_update
+
+
 class SACLossWithRewardEstimation(SACLoss):
     """SAC loss module with IRL reward estimation and behavioral cloning."""
 
@@ -390,44 +567,43 @@ class SACLossWithRewardEstimation(SACLoss):
             tensordict (TensorDict): Current policy tensordict
             expert_tensordict (TensorDict, optional): Expert demonstrations tensordict
         """
-        # TODO: do th.no_grad() here for critic update
-        # Estimate rewards for current batch and use them directly
-
-        with torch.no_grad():
-            estimated_rewards = self.estimate_rewards(tensordict)
-            tensordict.set("reward", estimated_rewards)
+        batch_size = tensordict.shape[0]
+        if expert_tensordict is not None:
+            # Evaluate the reward network once on policy and expert data together
+            in_keys = self.reward_network.in_keys
+            all_rewards = self.estimate_rewards(
+                torch.cat(
+                    [tensordict.select(*in_keys), expert_tensordict.select(*in_keys)]
+                )
+            )
+            estimated_rewards = all_rewards[:batch_size]
+            expert_estimated_reward = all_rewards[batch_size:]
+        else:
+            with torch.no_grad():
+                estimated_rewards = self.estimate_rewards(tensordict)
 
         # Compute standard SAC loss with estimated rewards
+        tensordict.set(("next", self.tensor_keys.reward), estimated_rewards.detach())
         loss_dict = super().forward(tensordict)
 
         # If expert data is provided, compute reward estimation and BC losses
         if expert_tensordict is not None:
             # Compute reward estimation loss
-            expert_estimated_reward = self.estimate_rewards(expert_tensordict)
             reward_loss = self.compute_reward_loss(
                 estimated_rewards, expert_estimated_reward
             )
-            loss_dict["reward_estimation_loss"] = reward_loss  # Renamed for clarity
-
-            # Compute BC loss
-            expert_states = expert_tensordict.get("observation")
-            expert_actions = expert_tensordict.get("action")
+            loss_dict["loss_reward"] = reward_loss
 
-            # Get policy distribution for expert states
-            policy_dist = self.actor_network(expert_states)
-
-            # TODO: get rid of MSE
-            # Compute BC loss based on policy type
-            if hasattr(policy_dist, "log_prob"):
-                # For stochastic policies
-                bc_loss = -policy_dist.log_prob(expert_actions).mean()
-
-            loss_dict["bc_loss"] = bc_loss
+            # Compute BC loss: log-likelihood of the expert actions under the policy
+            with self.actor_network_params.to_module(self.actor_network):
+                policy_dist = self.actor_network.get_dist(
+                    expert_tensordict.select(*self.actor_network.in_keys)
+                )
+            bc_loss = -policy_dist.log_prob(expert_tensordict.get("action")).mean()
+            loss_dict["bc_loss"] = bc_loss.detach()
 
-            # Add both losses to total loss
-            loss_dict["loss"] = (
-                loss_dict["loss"] + reward_loss + self.bc_lambda * bc_loss
-            )
+            # BC only trains the actor
+            loss_dict["loss_actor"] = loss_dict["loss_actor"] + self.bc_lambda * bc_loss
 
         return loss_dict
 
@@ -441,14 +617,10 @@ class SACLossWithRewardEstimation(SACLoss):
         Returns:
             torch.Tensor: Estimated rewards from IRL
         """
-        states = tensordict.get("observation")
-        actions = tensordict.get("action")
-
-        # Concatenate states and actions
-        input_features = torch.cat([states, actions], dim=-1)
-
-        # Get reward estimates from IRL
-        estimated_rewards = self.reward_network(input_features)
+        # Get reward estimates from IRL, without writing into the input tensordict
+        estimated_rewards = self.reward_network(
+            tensordict.select(*self.reward_network.in_keys)
+        ).get("estimated_reward")
 
         return estimated_rewards
 
@@ -528,22 +700,47 @@ def train_ipmd(cfg: "DictConfig"):  # noqa: F821 # type: ignore
     # Create off-policy collector
     collector = make_collector(cfg, train_env, exploration_policy)
 
-    # Create replay buffer
+    # Create replay buffer, each sample holds several minibatches
+    num_minibatches = cfg.optim.get("minibatches_per_sample", 1)
     replay_buffer = make_replay_buffer(
-        batch_size=cfg.optim.batch_size,
+        batch_size=cfg.optim.batch_size * num_minibatches,
         prb=cfg.replay_buffer.prb,
         buffer_size=cfg.replay_buffer.size,
         scratch_dir=cfg.replay_buffer.scratch_dir,
         device="cpu",
     )
+    replay_sampler = None
+    if cfg.replay_buffer.prefetch:
+        replay_sampler = PrefetchReplaySampler(
+            replay_buffer, device=device, prefetch=cfg.replay_buffer.prefetch
+        )
+
+    # Create expert data loader
+    expert_loader = None
+    if cfg.expert.data_path:
+        expert_loader = ExpertBatchPrefetcher(
+            ShardedExpertDataset(cfg.expert.data_path),
+            batch_size=cfg.expert.batch_size * num_minibatches,
+            device=device,
+            prefetch=cfg.expert.prefetch,
+            seed=cfg.env.seed,
+        )
 
     # Create optimizers
-    (
-        optimizer_actor,
-        optimizer_critic,
-        optimizer_alpha,
-        optimizer_reward,
-    ) = make_ipmd_optimizer(cfg, loss_module)
+    optimizers = make_ipmd_optimizer(cfg, loss_module)
+    multi_update = make_ipmd_multi_update(
+        cfg, loss_module, target_net_updater, optimizers
+    )
+
+    # Create evaluation process
+    evaluator = None
+    if cfg.logger.async_eval:
+        evaluator = AsyncEvaluator(
+            cfg,
+            model[0],
+            num_episodes=cfg.logger.eval_episodes,
+            num_envs=cfg.logger.eval_envs,
+        )
 
     # Main loop
     start_time = time.time()
@@ -561,120 +758,133 @@ def train_ipmd(cfg: "DictConfig"):  # noqa: F821 # type: ignore
     frames_per_batch = cfg.collector.frames_per_batch
     eval_rollout_steps = cfg.env.max_episode_steps
 
-    sampling_start = time.time()
-    for i, tensordict in enumerate(collector):
-        sampling_time = time.time() - sampling_start
-
-        # Update weights of the inference policy
-        collector.update_policy_weights_()
-
-        pbar.update(tensordict.numel())
-
-        tensordict = tensordict.reshape(-1)
-        current_frames = tensordict.numel()
-        # Add to replay buffer
-        replay_buffer.extend(tensordict.cpu())
-
-        collected_frames += current_frames
-
-        # Optimization steps
-        training_start = time.time()
-        if collected_frames >= init_random_frames:
-            losses = TensorDict({}, batch_size=[num_updates])
-            for i in range(num_updates):
-                # Sample from replay buffer
-                sampled_tensordict = replay_buffer.sample()
-                if sampled_tensordict.device != device:
-                    sampled_tensordict = sampled_tensordict.to(
-                        device, non_blocking=True
-                    )
-                else:
-                    sampled_tensordict = sampled_tensordict.clone()
-
-                # Compute loss
-                loss_td = loss_module(sampled_tensordict)
-
-                actor_loss = loss_td["loss_actor"]
-                q_loss = loss_td["loss_qvalue"]
-                alpha_loss = loss_td["loss_alpha"]
-                reward_loss = loss_td["loss_reward"]
-
-                # Update actor
-                optimizer_actor.zero_grad()
-                actor_loss.backward()
-                optimizer_actor.step()
-
-                # Update critic
-                optimizer_critic.zero_grad()
-                q_loss.backward()
-                optimizer_critic.step()
-
-                # Update alpha
-                optimizer_alpha.zero_grad()
-                alpha_loss.backward()
-                optimizer_alpha.step()
-
-                # Update reward
-
-                optimizer_reward.zero_grad()
-                reward_loss.backward()
-                optimizer_reward.step()
-
-                losses[i] = loss_td.select(
-                    "loss_actor", "loss_qvalue", "loss_alpha", "loss_reward"
-                ).detach()
-
-                # Update qnet_target params
-                target_net_updater.step()
-
-        training_time = time.time() - training_start
-        episode_end = (
-            tensordict["next", "done"]
-            if tensordict["next", "done"].any()
-            else tensordict["next", "truncated"]
-        )
-        episode_rewards = tensordict["next", "episode_reward"][episode_end]
-
-        # Logging
-        metrics_to_log = {}
-        if len(episode_rewards) > 0:
-            episode_length = tensordict["next", "step_count"][episode_end]
-            metrics_to_log["train/reward"] = episode_rewards.mean().item()
-            metrics_to_log["train/episode_length"] = episode_length.sum().item() / len(
-                episode_length
-            )
-        if collected_frames >= init_random_frames:
-            metrics_to_log["train/q_loss"] = losses.get("loss_qvalue").mean().item()
-            metrics_to_log["train/actor_loss"] = losses.get("loss_actor").mean().item()
-            metrics_to_log["train/alpha_loss"] = losses.get("loss_alpha").mean().item()
-            metrics_to_log["train/reward_loss"] = (
-                losses.get("loss_reward").mean().item(),
+    profiler = TrainingProfiler.from_config(cfg.get("profile", None))
+    profiler.start()
+    try:
+        sampling_start = time.time()
+        for i, tensordict in enumerate(iter_phase("collection", collector)):
+            sampling_time = time.time() - sampling_start
+
+            # Update weights of the inference policy
+            collector.update_policy_weights_()
+
+            pbar.update(tensordict.numel())
+
+            tensordict = tensordict.reshape(-1)
+            current_frames = tensordict.numel()
+            # Add to replay buffer
+            replay_buffer.extend(tensordict.cpu())
+
+            collected_frames += current_frames
+
+            # Optimization steps
+            training_start = time.time()
+            if collected_frames >= init_random_frames:
+                losses = []
+                for start in range(0, num_updates, num_minibatches):
+                    # Sample num_minibatches minibatches from replay buffer at once, the
+                    # last sample only runs the remaining updates
+                    sample_updates = min(num_minibatches, num_updates - start)
+                    with record_phase("minibatch_sampling"):
+                        if replay_sampler is not None:
+                            sampled_tensordict = replay_sampler.next()
+                        else:
+                            sampled_tensordict = replay_buffer.sample()
+                            if sampled_tensordict.device != device:
+                                sampled_tensordict = sampled_tensordict.to(
+                                    device, non_blocking=True
+                                )
+                            else:
+                                sampled_tensordict = sampled_tensordict.clone()
+                        sampled_tensordict = sampled_tensordict.reshape(
+                            num_minibatches, -1
+                        )[:sample_updates]
+
+                        expert_tensordict = None
+                        if expert_loader is not None:
+                            expert_tensordict = expert_loader.next().reshape(
+                                num_minibatches, -1
+                            )[:sample_updates]
+
+                    # Compute losses and update the networks
+                    losses.append(multi_update(sampled_tensordict, expert_tensordict))
+                losses = torch.cat(losses)
+                loss_td = losses[-1]
+
+            training_time = time.time() - training_start
+            episode_end = (
+                tensordict["next", "done"]
+                if tensordict["next", "done"].any()
+                else tensordict["next", "truncated"]
             )
-            metrics_to_log["train/alpha"] = loss_td["alpha"].item()
-            metrics_to_log["train/entropy"] = loss_td["entropy"].item()
-            metrics_to_log["train/sampling_time"] = sampling_time
-            metrics_to_log["train/training_time"] = training_time
-
-        # Evaluation
-        if abs(collected_frames % eval_iter) < frames_per_batch:
-            with set_exploration_type(ExplorationType.DETERMINISTIC), torch.no_grad():  # type: ignore
-                eval_start = time.time()
-                eval_rollout = eval_env.rollout(
-                    eval_rollout_steps,
-                    model[0],
-                    auto_cast_to_device=True,
-                    break_when_any_done=True,
+            episode_rewards = tensordict["next", "episode_reward"][episode_end]
+
+            # Logging
+            metrics_to_log = {}
+            if len(episode_rewards) > 0:
+                episode_length = tensordict["next", "step_count"][episode_end]
+                metrics_to_log["train/reward"] = episode_rewards.mean().item()
+                metrics_to_log["train/episode_length"] = (
+                    episode_length.sum().item() / len(episode_length)
                 )
-                eval_env.apply(dump_video)
-                eval_time = time.time() - eval_start
-                eval_reward = eval_rollout["next", "reward"].sum(-2).mean().item()  # type: ignore
-                metrics_to_log["eval/reward"] = eval_reward
-                metrics_to_log["eval/time"] = eval_time
-        if logger is not None:
-            log_metrics(logger, metrics_to_log, collected_frames)
-        sampling_start = time.time()
+            if collected_frames >= init_random_frames:
+                metrics_to_log["train/q_loss"] = losses.get("loss_qvalue").mean().item()
+                metrics_to_log["train/actor_loss"] = (
+                    losses.get("loss_actor").mean().item()
+                )
+                metrics_to_log["train/alpha_loss"] = (
+                    losses.get("loss_alpha").mean().item()
+                )
+                if "loss_reward" in losses.keys():
+                    metrics_to_log["train/reward_loss"] = (
+                        losses.get("loss_reward").mean().item()
+                    )
+                metrics_to_log["train/alpha"] = loss_td["alpha"].item()
+                metrics_to_log["train/entropy"] = loss_td["entropy"].item()
+                metrics_to_log["train/sampling_time"] = sampling_time
+                metrics_to_log["train/training_time"] = training_time
+                if replay_sampler is not None:
+                    metrics_to_log["train/sample_wait_time"] = (
+                        replay_sampler.pop_wait_time()
+                    )
 
+            # Evaluation
+            if evaluator is not None:
+                if abs(collected_frames % eval_iter) < frames_per_batch:
+                    evaluator.submit(model[0], collected_frames)
+                for eval_step, eval_metrics in evaluator.poll():
+                    metrics_to_log.update(eval_metrics)
+                    metrics_to_log["eval/step"] = eval_step
+            elif abs(collected_frames % eval_iter) < frames_per_batch:
+                with set_exploration_type(ExplorationType.DETERMINISTIC), torch.no_grad():  # type: ignore
+                    eval_start = time.time()
+                    eval_rollout = eval_env.rollout(
+                        eval_rollout_steps,
+                        model[0],
+                        auto_cast_to_device=True,
+                        break_when_any_done=True,
+                    )
+                    eval_env.apply(dump_video)
+                    eval_time = time.time() - eval_start
+                    eval_reward = eval_rollout["next", "reward"].sum(-2).mean().item()  # type: ignore
+                    metrics_to_log["eval/reward"] = eval_reward
+                    metrics_to_log["eval/time"] = eval_time
+            if logger is not None:
+                log_metrics(logger, metrics_to_log, collected_frames)
+            profiler.step()
+            sampling_start = time.time()
+    finally:
+        profiler.stop()
     collector.shutdown()
+    if evaluator is not None:
+        for eval_step, eval_metrics in evaluator.close():
+            if logger is not None:
+                eval_metrics["eval/step"] = eval_step
+                log_metrics(logger, eval_metrics, collected_frames)
+    if replay_sampler is not None:
+        replay_sampler.close()
+    if expert_loader is not None:
+        expert_loader.close()
     if not eval_env.is_closed:
         eval_env.close()
     if not train_env.is_closed:
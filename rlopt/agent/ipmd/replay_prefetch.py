@@ -0,0 +1,143 @@
+"""Prefetching replay buffer sampler with a reusable ring of staging buffers.
+
+A worker thread draws the next ``prefetch`` batches from the replay buffer and copies
+them into a fixed ring of host TensorDicts (pinned when training on CUDA). The training
+loop then receives each batch either directly from the ring (CPU) or copied into a
+single preallocated device TensorDict with a non-blocking transfer (CUDA), so no
+tensors are allocated or cloned per update once the ring is warm.
+
+A batch returned by ``next()`` is only valid until the following call to ``next()``.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from typing import List, Optional, Union
+
+import torch
+from tensordict import TensorDict
+
+
+class PrefetchReplaySampler:
+    """Sample replay buffer batches ahead of time on a worker thread.
+
+    Args:
+        replay_buffer (ReplayBuffer): the buffer to sample from, its ``sample()`` must
+            return batches with a fixed set of keys and shapes
+        device (torch.device): device of the returned batches
+        prefetch (int): number of staged batches, i.e. size of the host ring
+    """
+
+    def __init__(
+        self,
+        replay_buffer,
+        device: Union[str, torch.device] = "cpu",
+        prefetch: int = 2,
+    ):
+        if prefetch < 1:
+            raise ValueError(f"prefetch must be at least 1, got {prefetch}")
+        self.replay_buffer = replay_buffer
+        self.device = torch.device(device)
+        self.prefetch = prefetch
+        self.pin_memory = self.device.type == "cuda"
+        self.wait_time = 0.0
+
+        self._ring: List[Optional[TensorDict]] = [None] * prefetch
+        self._copy_done: List[Optional[torch.cuda.Event]] = [None] * prefetch
+        self._device_batch: Optional[TensorDict] = None
+        self._free: "queue.Queue[int]" = queue.Queue()
+        self._ready: "queue.Queue[int]" = queue.Queue()
+        for slot in range(prefetch):
+            self._free.put(slot)
+        self._in_use: Optional[int] = None
+        self._error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _copy_into(target: Optional[TensorDict], batch: TensorDict, **kwargs) -> bool:
+        """Copy ``batch`` into the preallocated ``target``, return False if it does not fit."""
+        if target is None:
+            return False
+        try:
+            target.update_(batch, **kwargs)
+        except (KeyError, RuntimeError):
+            # keys or shapes changed
+            return False
+        return True
+
+    def _stage(self, slot: int, batch: TensorDict):
+        if not self._copy_into(self._ring[slot], batch):
+            staged = batch.clone()
+            self._ring[slot] = staged.pin_memory() if self.pin_memory else staged
+
+    def _worker_loop(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    slot = self._free.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if self._copy_done[slot] is not None:
+                    # the device copy out of this slot must finish before it is overwritten
+                    self._copy_done[slot].synchronize()  # type: ignore
+                self._stage(slot, self.replay_buffer.sample())
+                self._ready.put(slot)
+        except BaseException as e:  # surfaced on the training thread
+            self._error = e
+            self._ready.put(-1)
+
+    def start(self):
+        """Start the worker thread, the replay buffer must be able to sample."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._worker_loop, name="replay-prefetch", daemon=True
+            )
+            self._thread.start()
+
+    def next(self) -> TensorDict:
+        """Return the next batch, valid until the following call."""
+        self.start()
+        if self._in_use is not None:
+            if self.device.type != "cuda":
+                self._free.put(self._in_use)
+            self._in_use = None
+
+        wait_start = time.perf_counter()
+        slot = self._ready.get()
+        self.wait_time += time.perf_counter() - wait_start
+        if slot < 0:
+            error, self._error = self._error, None
+            raise RuntimeError("Replay buffer prefetching failed") from error
+
+        staged: TensorDict = self._ring[slot]  # type: ignore
+        if self.device.type != "cuda":
+            self._in_use = slot
+            return staged if self.device.type == "cpu" else staged.to(self.device)
+
+        if not self._copy_into(self._device_batch, staged, non_blocking=True):
+            self._device_batch = staged.to(self.device)
+        event = torch.cuda.Event()
+        event.record()
+        self._copy_done[slot] = event
+        self._free.put(slot)
+        return self._device_batch
+
+    def pop_wait_time(self) -> float:
+        """Return the time spent waiting for batches since the last call, in seconds."""
+        wait_time, self.wait_time = self.wait_time, 0.0
+        return wait_time
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> TensorDict:
+        return self.next()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
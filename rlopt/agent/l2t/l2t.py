@@ -43,6 +43,7 @@ from stable_baselines3.common.vec_env import (
 
 from rlopt.common.buffer import RolloutBuffer as RLOptRolloutBuffer
 from rlopt.common.buffer import DictRolloutBuffer as RLOptDictRolloutBuffer
+from rlopt.common.profiling import TrainingProfiler, iter_phase, record_phase
 from rlopt.common.utils import obs_as_tensor, explained_variance
 
 SelfL2T = TypeVar("SelfL2T", bound="L2T")
@@ -88,6 +89,8 @@ class L2T(OnPolicyAlgorithm):
         the reported success rate, mean episode length, and mean reward over
     :param tensorboard_log: the log location for tensorboard (if None, no logging)
     :param policy_kwargs: additional arguments to be passed to the policy on creation
+    :param profile: ``profile`` config section recording training iterations with
+        torch.profiler (see ``rlopt.common.profiling``), disabled if ``None``
     :param verbose: Verbosity level: 0 for no output, 1 for info messages (such as device or wrappers used), 2 for
         debug messages
     :param seed: Seed for the pseudo random generators
@@ -131,6 +134,7 @@ class L2T(OnPolicyAlgorithm):
         mixture_coeff: float = 0.0,
         policy_kwargs: Optional[Dict[str, Any]] = None,
         student_policy_kwargs: Optional[Dict[str, Any]] = None,
+        profile: Optional[Dict[str, Any]] = None,
         verbose: int = 0,
         seed: Optional[int] = None,
         device: Union[th.device, str] = "auto",
@@ -158,6 +162,7 @@ class L2T(OnPolicyAlgorithm):
         self.start_time = 0.0
         self.learning_rate = learning_rate
         self.tensorboard_log = tensorboard_log
+        self.profiler = TrainingProfiler.from_config(profile)
         self._last_obs = (  # type: ignore
             None
         )  # type: Optional[Union[np.ndarray, Dict[str, np.ndarray]]]
@@ -382,7 +387,9 @@ class L2T(OnPolicyAlgorithm):
         for epoch in range(self.n_epochs):
             approx_kl_divs = []
             # Do a complete pass on the rollout buffer
-            for rollout_data in self.rollout_buffer.get(self.batch_size):
+            for rollout_data in iter_phase(
+                "minibatch_sampling", self.rollout_buffer.get(self.batch_size)
+            ):
                 actions = rollout_data.actions
                 if isinstance(self.action_space, spaces.Discrete):
                     # Convert discrete action from float to long
@@ -392,9 +399,10 @@ class L2T(OnPolicyAlgorithm):
                 if self.use_sde:
                     self.policy.reset_noise(self.batch_size)
 
-                values, log_prob, entropy = self.policy.evaluate_actions(
-                    rollout_data.observations["teacher"], actions  # type: ignore
-                )
+                with record_phase("forward"):
+                    values, log_prob, entropy = self.policy.evaluate_actions(
+                        rollout_data.observations["teacher"], actions  # type: ignore
+                    )
                 values = values.flatten()
                 # Normalize advantage
                 advantages = rollout_data.advantages
@@ -448,9 +456,12 @@ class L2T(OnPolicyAlgorithm):
                 )
 
                 # Compute student agent loss
-                student_actions, student_values, student_log_prob = self.student_policy(
-                    rollout_data.observations["student"]  # type: ignore
-                )
+                with record_phase("forward"):
+                    student_actions, student_values, student_log_prob = (
+                        self.student_policy(
+                            rollout_data.observations["student"]  # type: ignore
+                        )
+                    )
 
                 student_loss = F.mse_loss(student_actions, actions.detach())
 
@@ -475,20 +486,24 @@ class L2T(OnPolicyAlgorithm):
 
                 # Optimization step
                 self.policy.optimizer.zero_grad()
-                loss.backward()
-                # Clip grad norm
-                th.nn.utils.clip_grad_norm_(
-                    self.policy.parameters(), self.max_grad_norm
-                )
-                self.policy.optimizer.step()
+                with record_phase("backward"):
+                    loss.backward()
+                with record_phase("optimizer_step"):
+                    # Clip grad norm
+                    th.nn.utils.clip_grad_norm_(
+                        self.policy.parameters(), self.max_grad_norm
+                    )
+                    self.policy.optimizer.step()
 
                 # Update student agent
                 self.student_policy.optimizer.zero_grad()
-                student_loss.backward()
-                th.nn.utils.clip_grad_norm_(
-                    self.student_policy.parameters(), self.max_grad_norm
-                )
-                self.student_policy.optimizer.step()
+                with record_phase("backward"):
+                    student_loss.backward()
+                with record_phase("optimizer_step"):
+                    th.nn.utils.clip_grad_norm_(
+                        self.student_policy.parameters(), self.max_grad_norm
+                    )
+                    self.student_policy.optimizer.step()
 
             self._n_updates += 1
             if not continue_training:
@@ -545,29 +560,39 @@ class L2T(OnPolicyAlgorithm):
 
         assert self.env is not None
 
-        while self.num_timesteps < total_timesteps:
-            collection_start = time.time_ns()
-            continue_training = self.collect_rollouts(
-                self.env, callback, self.rollout_buffer, n_rollout_steps=self.n_steps
-            )
-            collection_end = time.time_ns()
-            collection_time = (collection_end - collection_start) / 1e9
-
-            if not continue_training:
-                break
-
-            iteration += 1
-            self._update_current_progress_remaining(self.num_timesteps, total_timesteps)
-            training_start = time.time_ns()
-            self.train()
-            training_end = time.time_ns()
-            training_time = (training_end - training_start) / 1e9
+        self.profiler.start()
+        try:
+            while self.num_timesteps < total_timesteps:
+                collection_start = time.time_ns()
+                with record_phase("collection"):
+                    continue_training = self.collect_rollouts(
+                        self.env,
+                        callback,
+                        self.rollout_buffer,
+                        n_rollout_steps=self.n_steps,
+                    )
+                collection_end = time.time_ns()
+                collection_time = (collection_end - collection_start) / 1e9
 
-            # Display training infos
-            if log_interval is not None and iteration % log_interval == 0:
-                assert self.ep_info_buffer is not None
-                self._dump_logs(iteration, locals())
+                if not continue_training:
+                    break
 
+                iteration += 1
+                self._update_current_progress_remaining(
+                    self.num_timesteps, total_timesteps
+                )
+                training_start = time.time_ns()
+                self.train()
+                training_end = time.time_ns()
+                training_time = (training_end - training_start) / 1e9
+
+                # Display training infos
+                if log_interval is not None and iteration % log_interval == 0:
+                    assert self.ep_info_buffer is not None
+                    self._dump_logs(iteration, locals())
+                self.profiler.step()
+        finally:
+            self.profiler.stop()
         callback.on_training_end()
 
         return self
@@ -755,10 +780,10 @@ class L2T(OnPolicyAlgorithm):
             new_ids = (dones > 0).nonzero(as_tuple=False)
             # record reward and episode length
             self.rewbuffer.extend(
-                self.cur_reward_sum[new_ids][:, 0].cpu().numpy().tolist()
+                self.cur_reward_sum[new_ids][:, 0].tolist()
             )
             self.lenbuffer.extend(
-                self.cur_episode_length[new_ids][:, 0].cpu().numpy().tolist()
+                self.cur_episode_length[new_ids][:, 0].tolist()
             )
             self.cur_reward_sum[new_ids] = 0
             self.cur_episode_length[new_ids] = 0
@@ -797,7 +822,10 @@ class L2T(OnPolicyAlgorithm):
             # Compute value for the last timestep
             values = self.policy.predict_values(obs_as_tensor(new_obs["teacher"], self.device))  # type: ignore[arg-type]
 
-        rollout_buffer.compute_returns_and_advantage(last_values=values, dones=dones)
+        with record_phase("gae"):
+            rollout_buffer.compute_returns_and_advantage(
+                last_values=values, dones=dones
+            )
 
         callback.update_locals(locals())
 
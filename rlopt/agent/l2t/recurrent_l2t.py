@@ -52,6 +52,7 @@ from stable_baselines3.common.vec_env import (
 )
 
 from rlopt.common.buffer import RLOptDictRecurrentReplayBuffer
+from rlopt.common.profiling import TrainingProfiler, iter_phase, record_phase
 from rlopt.common.utils import (
     obs_as_tensor,
     unpad_trajectories,
@@ -110,6 +111,8 @@ class RecurrentL2T(OnPolicyAlgorithm):
         the reported success rate, mean episode length, and mean reward over
     :param tensorboard_log: the log location for tensorboard (if None, no logging)
     :param policy_kwargs: additional arguments to be passed to the policy on creation
+    :param profile: ``profile`` config section recording training iterations with
+        torch.profiler (see ``rlopt.common.profiling``), disabled if ``None``
     :param verbose: Verbosity level: 0 for no output, 1 for info messages (such as device or wrappers used), 2 for
         debug messages
     :param seed: Seed for the pseudo random generators
@@ -162,6 +165,7 @@ class RecurrentL2T(OnPolicyAlgorithm):
         mixture_coeff: float = 0.0,
         policy_kwargs: Optional[Dict[str, Any]] = None,
         student_policy_kwargs: Optional[Dict[str, Any]] = None,
+        profile: Optional[Dict[str, Any]] = None,
         verbose: int = 0,
         seed: Optional[int] = None,
         device: Union[th.device, str] = "auto",
@@ -188,6 +192,7 @@ class RecurrentL2T(OnPolicyAlgorithm):
         self.start_time = 0.0
         self.learning_rate = learning_rate
         self.tensorboard_log = tensorboard_log
+        self.profiler = TrainingProfiler.from_config(profile)
         self._last_obs = (  # type: ignore
             None
         )  # type: Optional[Union[np.ndarray, Dict[str, np.ndarray]]]
@@ -569,10 +574,10 @@ class RecurrentL2T(OnPolicyAlgorithm):
 
             # record reward and episode length
             self.rewbuffer.extend(
-                self.cur_reward_sum[new_ids][:, 0].cpu().numpy().tolist()
+                self.cur_reward_sum[new_ids][:, 0].tolist()
             )
             self.lenbuffer.extend(
-                self.cur_episode_length[new_ids][:, 0].cpu().numpy().tolist()
+                self.cur_episode_length[new_ids][:, 0].tolist()
             )
             self.cur_reward_sum[new_ids] = 0
             self.cur_episode_length[new_ids] = 1
@@ -581,7 +586,10 @@ class RecurrentL2T(OnPolicyAlgorithm):
             # Compute value for the last timestep
             values = self.compiled_policy.predict_values(obs_as_tensor(new_obs["teacher"], self.device))  # type: ignore[arg-type]
 
-        rollout_buffer.compute_returns_and_advantage(last_values=values, dones=dones)
+        with record_phase("gae"):
+            rollout_buffer.compute_returns_and_advantage(
+                last_values=values, dones=dones
+            )
 
         callback.update_locals(locals())
 
@@ -655,7 +663,7 @@ class RecurrentL2T(OnPolicyAlgorithm):
             old_actions_log_prob_batch,
             masks_batch,
             hidden_batch,
-        ) in generator:
+        ) in iter_phase("minibatch_sampling", generator):
             # Do a complete pass on the rollout buffer
 
             actions = actions_batch
@@ -675,9 +683,10 @@ class RecurrentL2T(OnPolicyAlgorithm):
                 observations = obs_batch["teacher"]
 
             # teacher is mlp so no funny business
-            values, log_prob, entropy = self.compiled_policy.evaluate_actions(
-                observations, actions  # type: ignore
-            )
+            with record_phase("forward"):
+                values, log_prob, entropy = self.compiled_policy.evaluate_actions(
+                    observations, actions  # type: ignore
+                )
             values = values.flatten()
 
             # Normalize advantage
@@ -729,18 +738,19 @@ class RecurrentL2T(OnPolicyAlgorithm):
 
             student_observations = obs_batch["student"]
             # student obs shape is (T, B, feature dim)
-            (
-                _,
-                student_action,
-                student_entropy,
-                student_log_prob,
-                mu,
-                sigma,
-            ) = self.compiled_student_policy.predict_whole_sequence(
-                obs=student_observations,
-                deterministic=False,
-                lstm_states=hidden_batch,
-            )
+            with record_phase("forward"):
+                (
+                    _,
+                    student_action,
+                    student_entropy,
+                    student_log_prob,
+                    mu,
+                    sigma,
+                ) = self.compiled_student_policy.predict_whole_sequence(
+                    obs=student_observations,
+                    deterministic=False,
+                    lstm_states=hidden_batch,
+                )
 
             # align dim with the teacher action
             student_action = BaseBuffer.swap_and_flatten(
@@ -792,20 +802,24 @@ class RecurrentL2T(OnPolicyAlgorithm):
 
             # Optimization step
             self.compiled_policy.optimizer.zero_grad()
-            loss.backward()
-            # Clip grad norm
-            th.nn.utils.clip_grad_norm_(
-                self.compiled_policy.parameters(), self.max_grad_norm
-            )
-            self.compiled_policy.optimizer.step()
+            with record_phase("backward"):
+                loss.backward()
+            with record_phase("optimizer_step"):
+                # Clip grad norm
+                th.nn.utils.clip_grad_norm_(
+                    self.compiled_policy.parameters(), self.max_grad_norm
+                )
+                self.compiled_policy.optimizer.step()
 
             # Update student agent
             self.compiled_student_policy.optimizer.zero_grad()
-            student_loss.backward()
-            th.nn.utils.clip_grad_norm_(
-                self.compiled_student_policy.parameters(), self.max_grad_norm
-            )
-            self.compiled_student_policy.optimizer.step()
+            with record_phase("backward"):
+                student_loss.backward()
+            with record_phase("optimizer_step"):
+                th.nn.utils.clip_grad_norm_(
+                    self.compiled_student_policy.parameters(), self.max_grad_norm
+                )
+                self.compiled_student_policy.optimizer.step()
 
             self._n_updates += 1
             if not continue_training:
@@ -855,29 +869,36 @@ class RecurrentL2T(OnPolicyAlgorithm):
 
         assert self.env is not None
 
-        while self.num_timesteps < total_timesteps:
-            collection_start = time.time_ns()
-            continue_training = self.collect_rollouts(
-                self.env, callback, self.rollout_buffer, n_rollout_steps=self.n_steps  # type: ignore
-            )
-            collection_end = time.time_ns()
-            collection_time = (collection_end - collection_start) / 1e9
-
-            if not continue_training:
-                break
-
-            iteration += 1
-            self._update_current_progress_remaining(self.num_timesteps, total_timesteps)
-            training_start = time.time_ns()
-            self.train()
-            training_end = time.time_ns()
-            training_time = (training_end - training_start) / 1e9
+        self.profiler.start()
+        try:
+            while self.num_timesteps < total_timesteps:
+                collection_start = time.time_ns()
+                with record_phase("collection"):
+                    continue_training = self.collect_rollouts(
+                        self.env, callback, self.rollout_buffer, n_rollout_steps=self.n_steps  # type: ignore
+                    )
+                collection_end = time.time_ns()
+                collection_time = (collection_end - collection_start) / 1e9
 
-            # Display training infos
-            if log_interval is not None and iteration % log_interval == 0:
-                assert self.ep_info_buffer is not None
-                self._dump_logs(iteration, locals())
+                if not continue_training:
+                    break
 
+                iteration += 1
+                self._update_current_progress_remaining(
+                    self.num_timesteps, total_timesteps
+                )
+                training_start = time.time_ns()
+                self.train()
+                training_end = time.time_ns()
+                training_time = (training_end - training_start) / 1e9
+
+                # Display training infos
+                if log_interval is not None and iteration % log_interval == 0:
+                    assert self.ep_info_buffer is not None
+                    self._dump_logs(iteration, locals())
+                self.profiler.step()
+        finally:
+            self.profiler.stop()
         callback.on_training_end()
 
         return self
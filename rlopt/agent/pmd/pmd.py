@@ -30,6 +30,8 @@ def main(cfg: "DictConfig"):  # noqa: F821
     from torchrl.record.loggers import generate_exp_name, get_logger
     from utils_mujoco import eval_model, make_env, make_ppo_models
 
+    from rlopt.common.profiling import TrainingProfiler, iter_phase, record_phase
+
     device = "cpu" if not torch.cuda.device_count() else "cuda"
     num_mini_batches = cfg.collector.frames_per_batch // cfg.loss.mini_batch_size
     total_network_updates = (
@@ -127,116 +129,126 @@ def main(cfg: "DictConfig"):  # noqa: F821
     cfg_logger_num_test_episodes = cfg.logger.num_test_episodes
     losses = TensorDict({}, batch_size=[cfg_loss_ppo_epochs, num_mini_batches])
 
-    for i, data in enumerate(collector):
-
-        log_info = {}
-        sampling_time = time.time() - sampling_start
-        frames_in_batch = data.numel()
-        collected_frames += frames_in_batch
-        pbar.update(data.numel())
-
-        # Get training rewards and episode lengths
-        episode_rewards = data["next", "episode_reward"][data["next", "done"]]
-        if len(episode_rewards) > 0:
-            episode_length = data["next", "step_count"][data["next", "done"]]
-            log_info.update(
-                {
-                    "train/reward": episode_rewards.mean().item(),
-                    "train/episode_length": episode_length.sum().item()
-                    / len(episode_length),
-                }
-            )
-
-        training_start = time.time()
-        for j in range(cfg_loss_ppo_epochs):
-
-            # Compute GAE
-            with torch.no_grad():
-                data = adv_module(data)
-            data_reshape = data.reshape(-1)
-
-            # Update the data buffer
-            data_buffer.extend(data_reshape)
-
-            for k, batch in enumerate(data_buffer):
-
-                # Get a data batch
-                batch = batch.to(device)
-
-                # Linearly decrease the learning rate and clip epsilon
-                alpha = 1.0
-                if cfg_optim_anneal_lr:
-                    alpha = 1 - (num_network_updates / total_network_updates)
-                    for group in actor_optim.param_groups:
-                        group["lr"] = cfg_optim_lr * alpha
-                    for group in critic_optim.param_groups:
-                        group["lr"] = cfg_optim_lr * alpha
-                if cfg_loss_anneal_clip_eps:
-                    loss_module.clip_epsilon.copy_(cfg_loss_clip_epsilon * alpha)
-                num_network_updates += 1
-
-                # Forward pass PPO loss
-                loss = loss_module(batch)
-                losses[j, k] = loss.select(
-                    "loss_critic", "loss_entropy", "loss_objective"
-                ).detach()
-                critic_loss = loss["loss_critic"]
-                actor_loss = loss["loss_objective"] + loss["loss_entropy"]
-
-                # Backward pass
-                actor_loss.backward()
-                critic_loss.backward()
-
-                # Update the networks
-                actor_optim.step()
-                critic_optim.step()
-                actor_optim.zero_grad()
-                critic_optim.zero_grad()
-
-        # Get training losses and times
-        training_time = time.time() - training_start
-        losses_mean = losses.apply(lambda x: x.float().mean(), batch_size=[])
-        for key, value in losses_mean.items():
-            log_info.update({f"train/{key}": value.item()})
-        log_info.update(
-            {
-                "train/lr": alpha * cfg_optim_lr,
-                "train/sampling_time": sampling_time,
-                "train/training_time": training_time,
-                "train/clip_epsilon": (
-                    alpha * cfg_loss_clip_epsilon
-                    if cfg_loss_anneal_clip_eps
-                    else cfg_loss_clip_epsilon
-                ),
-            }
-        )
-
-        # Get test rewards
-        with torch.no_grad(), set_exploration_type(ExplorationType.DETERMINISTIC):
-            if ((i - 1) * frames_in_batch) // cfg_logger_test_interval < (
-                i * frames_in_batch
-            ) // cfg_logger_test_interval:
-                actor.eval()
-                eval_start = time.time()
-                test_rewards = eval_model(
-                    actor, test_env, num_episodes=cfg_logger_num_test_episodes
-                )
-                eval_time = time.time() - eval_start
+    profiler = TrainingProfiler.from_config(cfg.get("profile", None))
+    profiler.start()
+    try:
+        for i, data in enumerate(iter_phase("collection", collector)):
+
+            log_info = {}
+            sampling_time = time.time() - sampling_start
+            frames_in_batch = data.numel()
+            collected_frames += frames_in_batch
+            pbar.update(data.numel())
+
+            # Get training rewards and episode lengths
+            episode_rewards = data["next", "episode_reward"][data["next", "done"]]
+            if len(episode_rewards) > 0:
+                episode_length = data["next", "step_count"][data["next", "done"]]
                 log_info.update(
                     {
-                        "eval/reward": test_rewards.mean(),
-                        "eval/time": eval_time,
+                        "train/reward": episode_rewards.mean().item(),
+                        "train/episode_length": episode_length.sum().item()
+                        / len(episode_length),
                     }
                 )
-                actor.train()
-
-        if logger:
-            for key, value in log_info.items():
-                logger.log_scalar(key, value, collected_frames)
 
-        collector.update_policy_weights_()
-        sampling_start = time.time()
+            training_start = time.time()
+            for j in range(cfg_loss_ppo_epochs):
+
+                # Compute GAE
+                with torch.no_grad(), record_phase("gae"):
+                    data = adv_module(data)
+                data_reshape = data.reshape(-1)
+
+                # Update the data buffer
+                data_buffer.extend(data_reshape)
+
+                for k, batch in enumerate(
+                    iter_phase("minibatch_sampling", data_buffer)
+                ):
+
+                    # Get a data batch
+                    batch = batch.to(device)
+
+                    # Linearly decrease the learning rate and clip epsilon
+                    alpha = 1.0
+                    if cfg_optim_anneal_lr:
+                        alpha = 1 - (num_network_updates / total_network_updates)
+                        for group in actor_optim.param_groups:
+                            group["lr"] = cfg_optim_lr * alpha
+                        for group in critic_optim.param_groups:
+                            group["lr"] = cfg_optim_lr * alpha
+                    if cfg_loss_anneal_clip_eps:
+                        loss_module.clip_epsilon.copy_(cfg_loss_clip_epsilon * alpha)
+                    num_network_updates += 1
+
+                    # Forward pass PPO loss
+                    with record_phase("forward"):
+                        loss = loss_module(batch)
+                    losses[j, k] = loss.select(
+                        "loss_critic", "loss_entropy", "loss_objective"
+                    ).detach()
+                    critic_loss = loss["loss_critic"]
+                    actor_loss = loss["loss_objective"] + loss["loss_entropy"]
+
+                    # Backward pass
+                    with record_phase("backward"):
+                        actor_loss.backward()
+                        critic_loss.backward()
+
+                    # Update the networks
+                    with record_phase("optimizer_step"):
+                        actor_optim.step()
+                        critic_optim.step()
+                        actor_optim.zero_grad()
+                        critic_optim.zero_grad()
+
+            # Get training losses and times
+            training_time = time.time() - training_start
+            losses_mean = losses.apply(lambda x: x.float().mean(), batch_size=[])
+            for key, value in losses_mean.items():
+                log_info.update({f"train/{key}": value.item()})
+            log_info.update(
+                {
+                    "train/lr": alpha * cfg_optim_lr,
+                    "train/sampling_time": sampling_time,
+                    "train/training_time": training_time,
+                    "train/clip_epsilon": (
+                        alpha * cfg_loss_clip_epsilon
+                        if cfg_loss_anneal_clip_eps
+                        else cfg_loss_clip_epsilon
+                    ),
+                }
+            )
 
+            # Get test rewards
+            with torch.no_grad(), set_exploration_type(ExplorationType.DETERMINISTIC):
+                if ((i - 1) * frames_in_batch) // cfg_logger_test_interval < (
+                    i * frames_in_batch
+                ) // cfg_logger_test_interval:
+                    actor.eval()
+                    eval_start = time.time()
+                    test_rewards = eval_model(
+                        actor, test_env, num_episodes=cfg_logger_num_test_episodes
+                    )
+                    eval_time = time.time() - eval_start
+                    log_info.update(
+                        {
+                            "eval/reward": test_rewards.mean(),
+                            "eval/time": eval_time,
+                        }
+                    )
+                    actor.train()
+
+            if logger:
+                for key, value in log_info.items():
+                    logger.log_scalar(key, value, collected_frames)
+
+            collector.update_policy_weights_()
+            profiler.step()
+            sampling_start = time.time()
+    finally:
+        profiler.stop()
     collector.shutdown()
     if not test_env.is_closed:
         test_env.close()
@@ -32,6 +32,8 @@ from torchrl._utils import timeit, compile_with_warmup
 
 from omegaconf import DictConfig
 from rlopt.common.base_class import BaseAlgorithm
+from rlopt.common.profiling import iter_phase, record_phase
+from rlopt.opt.torch_optim import make_torch_optimizer
 
 set_composite_lp_aggregate(True).set()
 
@@ -170,16 +172,22 @@ class PPO(BaseAlgorithm):
         return loss_module
 
     def _configure_optimizers(self) -> torch.optim.Optimizer:
-        # Create optimizers
-        actor_optim = torch.optim.Adam(
+        # Create optimizers, Adam unless `optim.name` selects an rlopt.opt method
+        name = self.config.optim.get("name", "adam")
+        kwargs = dict(self.config.optim.get("kwargs") or {})
+        actor_optim = make_torch_optimizer(
+            name,
             self.policy.parameters(),
             lr=torch.tensor(self.config.optim.lr, device=self.device),
-            eps=1e-5,
+            adam_kwargs={"eps": 1e-5},
+            **kwargs,
         )
-        critic_optim = torch.optim.Adam(
+        critic_optim = make_torch_optimizer(
+            name,
             self.value_net.parameters(),
             lr=torch.tensor(self.config.optim.lr, device=self.device),
-            eps=1e-5,
+            adam_kwargs={"eps": 1e-5},
+            **kwargs,
         )
         optim = group_optimizers(actor_optim, critic_optim)
         del actor_optim, critic_optim
@@ -246,28 +254,42 @@ class PPO(BaseAlgorithm):
         num_network_updates = num_network_updates + 1
 
         # Forward pass PPO loss
-        loss = self.loss_module(batch)
-        critic_loss = loss["loss_critic"]
-        actor_loss = loss["loss_objective"] + loss["loss_entropy"]
-        total_loss = critic_loss + actor_loss
+        with record_phase("forward"):
+            loss = self.loss_module(batch)
+            critic_loss = loss["loss_critic"]
+            actor_loss = loss["loss_objective"] + loss["loss_entropy"]
+            total_loss = critic_loss + actor_loss
 
         # Backward pass
-        total_loss.backward()
+        with record_phase("backward"):
+            total_loss.backward()
 
         # Update the networks
-        self.optim.step()
+        with record_phase("optimizer_step"):
+            self.optim.step()
         return loss.detach().set("alpha", alpha), num_network_updates
 
     def predict(self, obs: Union[torch.Tensor, np.ndarray]) -> torch.Tensor:
-        """Predict action and value given observation"""
+        """Predict action given a single observation or a batch of observations"""
         self.policy: ProbabilisticActor
         self.value_net: ValueOperator
-        obs = torch.as_tensor([obs], device=self.device)
+        obs_spec = self.env.observation_spec_unbatched["observation"]
+        obs = torch.as_tensor(obs, dtype=obs_spec.dtype, device=self.device)
+        # leading dimensions beyond the observation shape are batch dimensions
+        batch_dims = obs.dim() - len(obs_spec.shape)
+        if obs.shape[batch_dims:] != obs_spec.shape:
+            raise ValueError(
+                f"Expected observations ending with shape {tuple(obs_spec.shape)}, "
+                f"got {tuple(obs.shape)}"
+            )
+        if batch_dims == 0:
+            # single observation
+            obs = obs.unsqueeze(0)
         self.policy.eval()
         with torch.inference_mode():
             td = TensorDict(
                 {"observation": obs},
-                batch_size=[1],
+                batch_size=obs.shape[: obs.dim() - len(obs_spec.shape)],
                 device=self.policy.device,
             )
             output = self.policy(td).get("action")
@@ -302,105 +324,111 @@ class PPO(BaseAlgorithm):
         collector_iter = iter(self.collector)
         total_iter = len(self.collector)
         # print("total_iter:", total_iter)
-        for i in range(total_iter):
-            # timeit.printevery(1000, total_iter, erase=True)  # type: ignore
-
-            with timeit("collecting"):
-                data = next(collector_iter)
-            # print("data:", data)
-
-            metrics_to_log = {}
-            frames_in_batch = data.numel()
-            collected_frames += frames_in_batch
-            pbar.update(frames_in_batch)
-
-            # # Get training rewards and episode lengths
-            episode_rewards = data["next", "episode_reward"][data["next", "done"]]
-            if len(episode_rewards) > 0:
-                episode_length = data["next", "step_count"][data["next", "done"]]
+        self.profiler.start()
+        try:
+            for i in range(total_iter):
+                # timeit.printevery(1000, total_iter, erase=True)  # type: ignore
+
+                with timeit("collecting"), record_phase("collection"):
+                    data = next(collector_iter)
+                # print("data:", data)
+
+                metrics_to_log = {}
+                frames_in_batch = data.numel()
+                collected_frames += frames_in_batch
+                pbar.update(frames_in_batch)
+
+                # # Get training rewards and episode lengths
+                episode_rewards = data["next", "episode_reward"][data["next", "done"]]
+                if len(episode_rewards) > 0:
+                    episode_length = data["next", "step_count"][data["next", "done"]]
+                    metrics_to_log.update(
+                        {
+                            "train/reward": episode_rewards.mean().item(),
+                            "train/episode_length": episode_length.sum().item()
+                            / len(episode_length),
+                        }
+                    )
+                env_extras = getattr(self.env.unwrapped, "extras", {})
+                metrics_to_log.update(env_extras["log"])
+
+                with timeit("training"):
+                    for j in range(cfg_loss_ppo_epochs):
+
+                        # Compute GAE
+                        with torch.no_grad(), timeit("adv"), record_phase("gae"):
+                            torch.compiler.cudagraph_mark_step_begin()
+                            data = self.adv_module(data)
+                            if self.config.compile.compile_mode:
+                                data = data.clone()
+
+                        with timeit("rb - extend"):
+                            # Update the data buffer
+                            data_reshape = data.reshape(-1)
+                            self.data_buffer.extend(data_reshape)
+
+                        # print("data_buffer:", self.data_buffer)
+
+                        for k, batch in enumerate(
+                            iter_phase("minibatch_sampling", self.data_buffer)
+                        ):
+                            # print("k, batch", k, batch)
+                            with timeit("update"):
+                                torch.compiler.cudagraph_mark_step_begin()
+                                loss, num_network_updates = self.update(
+                                    batch, num_network_updates=num_network_updates
+                                )
+                                loss = loss.clone()
+                            num_network_updates = num_network_updates.clone()  # type: ignore
+                            losses[j, k] = loss.select(
+                                "loss_critic", "loss_entropy", "loss_objective"
+                            )
+
+                # Get training losses and times
+                losses_mean = losses.apply(lambda x: x.float().mean(), batch_size=[])
+                for key, value in losses_mean.items():  # type: ignore
+                    metrics_to_log.update({f"train/{key}": value.item()})
                 metrics_to_log.update(
                     {
-                        "train/reward": episode_rewards.mean().item(),
-                        "train/episode_length": episode_length.sum().item()
-                        / len(episode_length),
+                        "train/lr": loss["alpha"] * cfg_optim_lr,
+                        "train/clip_epsilon": (
+                            loss["alpha"] * cfg_loss_clip_epsilon
+                            if cfg_loss_anneal_clip_eps
+                            else cfg_loss_clip_epsilon
+                        ),
                     }
                 )
-            env_extras = getattr(self.env.unwrapped, "extras", {})
-            metrics_to_log.update(env_extras["log"])
-
-            with timeit("training"):
-                for j in range(cfg_loss_ppo_epochs):
-
-                    # Compute GAE
-                    with torch.no_grad(), timeit("adv"):
-                        torch.compiler.cudagraph_mark_step_begin()
-                        data = self.adv_module(data)
-                        if self.config.compile.compile_mode:
-                            data = data.clone()
-
-                    with timeit("rb - extend"):
-                        # Update the data buffer
-                        data_reshape = data.reshape(-1)
-                        self.data_buffer.extend(data_reshape)
-
-                    # print("data_buffer:", self.data_buffer)
-
-                    for k, batch in enumerate(self.data_buffer):
-                        # print("k, batch", k, batch)
-                        with timeit("update"):
-                            torch.compiler.cudagraph_mark_step_begin()
-                            loss, num_network_updates = self.update(
-                                batch, num_network_updates=num_network_updates
-                            )
-                            loss = loss.clone()
-                        num_network_updates = num_network_updates.clone()  # type: ignore
-                        losses[j, k] = loss.select(
-                            "loss_critic", "loss_entropy", "loss_objective"
-                        )
-
-            # Get training losses and times
-            losses_mean = losses.apply(lambda x: x.float().mean(), batch_size=[])
-            for key, value in losses_mean.items():  # type: ignore
-                metrics_to_log.update({f"train/{key}": value.item()})
-            metrics_to_log.update(
-                {
-                    "train/lr": loss["alpha"] * cfg_optim_lr,
-                    "train/clip_epsilon": (
-                        loss["alpha"] * cfg_loss_clip_epsilon
-                        if cfg_loss_anneal_clip_eps
-                        else cfg_loss_clip_epsilon
-                    ),
-                }
-            )
-
-            # fy: no testing, need to implement for specific envs
-            # # Get test rewards
-            # with (
-            #     torch.no_grad(),
-            #     set_exploration_type(ExplorationType.DETERMINISTIC),
-            #     timeit("eval"),
-            # ):
-            #     if ((i - 1) * frames_in_batch) // cfg_logger_test_interval < (
-            #         i * frames_in_batch
-            #     ) // cfg_logger_test_interval:
-            #         actor.eval()
-            #         test_rewards = eval_model(
-            #             actor, test_env, num_episodes=cfg_logger_num_test_episodes
-            #         )
-            #         metrics_to_log.update(
-            #             {
-            #                 "eval/reward": test_rewards.mean(),
-            #             }
-            #         )
-            #         actor.train()
-
-            self.logger: Logger | None
-            if self.logger:
-                metrics_to_log.update(timeit.todict(prefix="time"))  # type: ignore
-                metrics_to_log["time/speed"] = pbar.format_dict["rate"]
-                for key, value in metrics_to_log.items():
-                    self.logger.log_scalar(key, value, collected_frames)
-
-            self.collector.update_policy_weights_()
 
+                # fy: no testing, need to implement for specific envs
+                # # Get test rewards
+                # with (
+                #     torch.no_grad(),
+                #     set_exploration_type(ExplorationType.DETERMINISTIC),
+                #     timeit("eval"),
+                # ):
+                #     if ((i - 1) * frames_in_batch) // cfg_logger_test_interval < (
+                #         i * frames_in_batch
+                #     ) // cfg_logger_test_interval:
+                #         actor.eval()
+                #         test_rewards = eval_model(
+                #             actor, test_env, num_episodes=cfg_logger_num_test_episodes
+                #         )
+                #         metrics_to_log.update(
+                #             {
+                #                 "eval/reward": test_rewards.mean(),
+                #             }
+                #         )
+                #         actor.train()
+
+                self.logger: Logger | None
+                if self.logger:
+                    metrics_to_log.update(timeit.todict(prefix="time"))  # type: ignore
+                    metrics_to_log["time/speed"] = pbar.format_dict["rate"]
+                    for key, value in metrics_to_log.items():
+                        self.logger.log_scalar(key, value, collected_frames)
+
+                self.collector.update_policy_weights_()
+                self.profiler.step()
+        finally:
+            self.profiler.stop()
         self.collector.shutdown()
@@ -1,6 +1,21 @@
-from .buffer import (
-    RLOptDictRecurrentReplayBuffer,
-    RolloutBuffer,
-    DictRolloutBuffer,
-    RecurrentRolloutBuffer,
+from typing import TYPE_CHECKING
+
+from rlopt._lazy import lazy_getattr
+
+if TYPE_CHECKING:
+    from .buffer import (
+        RLOptDictRecurrentReplayBuffer,
+        RolloutBuffer,
+        DictRolloutBuffer,
+        RecurrentRolloutBuffer,
+    )
+
+__getattr__, __dir__ = lazy_getattr(
+    __name__,
+    {
+        "RLOptDictRecurrentReplayBuffer": ".buffer",
+        "RolloutBuffer": ".buffer",
+        "DictRolloutBuffer": ".buffer",
+        "RecurrentRolloutBuffer": ".buffer",
+    },
 )
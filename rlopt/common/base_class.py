@@ -1,38 +1,33 @@
-from typing import Any, Callable, Dict, Optional, Type, Union, List
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, List
 from abc import ABC, abstractmethod
-import os
 import time
-from collections import defaultdict
-from dataclasses import dataclass
 
 import numpy as np
-import multiprocessing
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from torch import Tensor
 
-from torchrl.envs.utils import ExplorationType
-from torchrl.modules import MLP, Actor, ProbabilisticActor, ValueOperator
 from torchrl.data import ReplayBuffer
 from torchrl.envs import EnvBase
-from torchrl.record import CSVLogger, TensorboardLogger, WandbLogger
+from torchrl.record import TensorboardLogger
 from torchrl.record.loggers.common import Logger
 from torchrl.collectors import SyncDataCollector, MultiaSyncDataCollector
-from torchrl.data.replay_buffers import LazyMemmapStorage, ReplayBuffer
 from torchrl.objectives import ClipPPOLoss
 from torchrl.record.loggers import generate_exp_name, get_logger
-from torchrl.trainers import Trainer
 
 from tensordict import TensorDict
 from tensordict.nn import TensorDictModule
 
 from omegaconf import OmegaConf, DictConfig
-import hydra
-from hydra.core.config_store import ConfigStore
 
-from rlopt.envs import make_mujoco_env
+from rlopt.common.checkpoint import AsyncCheckpointer, load_checkpoint
+from rlopt.common.profiling import TrainingProfiler
+from rlopt.envs.transforms import FusedObservationNorm
+
+if TYPE_CHECKING:
+    from torchrl.trainers import Trainer
 
 
 class BaseAlgorithm(ABC):
@@ -109,6 +104,12 @@ class BaseAlgorithm(ABC):
         self.step_count = 0
         self.start_time = time.time()
 
+        # created lazily by save_checkpoint
+        self.checkpointer: Optional[AsyncCheckpointer] = None
+
+        # records the iterations chosen in the profile config section
+        self.profiler = TrainingProfiler.from_config(config.get("profile", None))
+
         # build collector
         self.collector = self._construct_collector(self.env)
 
@@ -391,7 +392,10 @@ class BaseAlgorithm(ABC):
 
         return metrics
 
-    def _construct_trainer(self) -> Trainer:
+    def _construct_trainer(self) -> "Trainer":
+        # torchrl.trainers is slow to import and only needed here
+        from torchrl.trainers import Trainer
+
         return Trainer(
             collector=self.collector,
             total_frames=self.config.collector.total_frames,
@@ -410,26 +414,70 @@ class BaseAlgorithm(ABC):
         """Predict action given observation."""
         pass
 
-    def save_checkpoint(self, path: str):
-        """Save complete training state."""
+    def _checkpoint_modules(self) -> Dict[str, Optional[nn.Module]]:
+        return {
+            "policy": self.policy,
+            "value_net": self.value_net,
+            "q_net": self.q_net,
+            "target_value_net": self.target_value_net,
+            "target_q_net": self.target_q_net,
+            "reward_estimator": self.reward_estimator,
+        }
+
+    def _obs_norm_transform(self) -> Optional[FusedObservationNorm]:
+        """The observation normalization of the training env, saved with checkpoints."""
+        transform = getattr(self.env, "transform", None)
+        for t in getattr(transform, "transforms", [transform]):
+            if isinstance(t, FusedObservationNorm):
+                return t
+        return None
+
+    def _checkpoint_components(self) -> Dict[str, Any]:
+        """Collect the state dicts that make up a checkpoint."""
         checkpoint = {
-            "policy": self.policy.state_dict() if self.policy else None,
-            "value_net": self.value_net.state_dict() if self.value_net else None,
-            "q_net": self.q_net.state_dict() if self.q_net else None,
-            "target_value_net": (
-                self.target_value_net.state_dict() if self.target_value_net else None
-            ),
-            "target_q_net": (
-                self.target_q_net.state_dict() if self.target_q_net else None
-            ),
-            "reward_estimator": (
-                self.reward_estimator.state_dict() if self.reward_estimator else None
-            ),
-            "optimizers": {k: v.state_dict() for k, v in self.optimizers.items()},
+            k: v.state_dict()
+            for k, v in self._checkpoint_modules().items()
+            if v is not None
+        }
+        checkpoint["optimizers"] = {
+            k: v.state_dict() for k, v in self.optimizers.items()
+        }
+        checkpoint["meta"] = {
             "step_count": self.step_count,
             "config": OmegaConf.to_container(self.config),
         }
-        torch.save(checkpoint, path)
+        obs_norm = self._obs_norm_transform()
+        if obs_norm is not None:
+            # merged statistics of all collectors when they are shared
+            checkpoint["obs_norm"] = obs_norm.export_stats()
+        return checkpoint
+
+    def _get_checkpointer(self) -> AsyncCheckpointer:
+        if self.checkpointer is None:
+            checkpoint_config = self.config.get("checkpoint", None) or {}
+            self.checkpointer = AsyncCheckpointer(
+                keep_last=checkpoint_config.get("keep_last", None),
+                max_pending=checkpoint_config.get("max_pending", 2),
+            )
+        return self.checkpointer
+
+    def save_checkpoint(self, path: str, blocking: bool = True) -> float:
+        """
+        Save complete training state as a checkpoint directory.
+
+        The state is snapshotted to CPU on the calling thread and written by a
+        background thread with an atomic rename. With ``blocking=False`` training
+        continues while the checkpoint is written.
+
+        Returns the time training was stalled, in seconds.
+        """
+        checkpointer = self._get_checkpointer()
+        stall_time = checkpointer.save_state(
+            path, self._checkpoint_components(), key="checkpoint"
+        )
+        if blocking:
+            checkpointer.wait()
+        return stall_time
 
     def export_onnx_policy_to(self, path: str):
         """Export policy network to ONNX format."""
@@ -439,24 +487,40 @@ class BaseAlgorithm(ABC):
                 self.policy,
                 dummy_input,  # type: ignore
                 path,
-                verbose=True,
+                verbose=False,
                 input_names=["observation"],
                 output_names=["action"],
+                dynamic_axes={
+                    "observation": {0: "batch_size"},
+                    "action": {0: "batch_size"},
+                },
             )
 
-    def load_from(self, path: str):
-        """Load training state from a checkpoint."""
-        checkpoint = torch.load(path, map_location=self.device)
-        self.policy.load_state_dict(checkpoint["policy"])
-        if self.value_net:
-            self.value_net.load_state_dict(checkpoint["value_net"])
-        if self.q_net:
-            self.q_net.load_state_dict(checkpoint["q_net"])
-        if self.target_value_net:
-            self.target_value_net.load_state_dict(checkpoint["target_value_net"])
-        if self.target_q_net:
-            self.target_q_net.load_state_dict(checkpoint["target_q_net"])
-        if self.reward_estimator:
-            self.reward_estimator.load_state_dict(checkpoint["reward_estimator"])
-        for k, v in self.optimizers.items():
-            v.load_state_dict(checkpoint["optimizers"][k])
+    def load_from(self, path: str, components: Optional[List[str]] = None):
+        """
+        Load training state from a checkpoint.
+
+        Only the requested components are read (memory-mapped), e.g.
+        ``components=["policy"]`` for inference. ``None`` loads everything.
+        """
+        if components is None:
+            components = [
+                k for k, v in self._checkpoint_modules().items() if v is not None
+            ] + ["optimizers"]
+            if self._obs_norm_transform() is not None:
+                components.append("obs_norm")
+        if self.checkpointer is not None:
+            # make sure pending writes are on disk
+            self.checkpointer.wait()
+        checkpoint = load_checkpoint(
+            path, components=components, map_location=self.device
+        )
+        for name, module in self._checkpoint_modules().items():
+            if name in checkpoint and module is not None:
+                module.load_state_dict(checkpoint[name])
+        if "optimizers" in checkpoint:
+            for k, v in self.optimizers.items():
+                v.load_state_dict(checkpoint["optimizers"][k])
+        obs_norm = self._obs_norm_transform()
+        if "obs_norm" in checkpoint and obs_norm is not None:
+            obs_norm.load_stats(checkpoint["obs_norm"])
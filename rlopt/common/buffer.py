@@ -1,4 +1,6 @@
 # The implementation is borrowed from Stable Baselines 3 [https://github.com/DLR-RM/stable-baselines3/blob/master/stable_baselines3/common/buffers.py]
+import json
+import os
 import warnings
 from functools import partial
 from abc import ABC, abstractmethod
@@ -27,6 +29,7 @@ from rlopt.common.type_aliases import (
 )
 
 from rlopt.common.utils import split_and_pad_trajectories, unpad_trajectories
+from rlopt.common.checkpoint import buffer_chunk_path, write_buffer_snapshot
 
 try:
     # Check memory used by replay buffer when possible
@@ -75,6 +78,9 @@ class BaseBuffer(ABC):
         self.full = False
         self.device = get_device(device)
         self.n_envs = n_envs
+        # total number of `add` calls, used for incremental snapshots
+        self.n_added = 0
+        self._snapshot_state: Optional[Tuple[str, int]] = None
 
     @staticmethod
     def swap_and_flatten(
@@ -120,6 +126,7 @@ class BaseBuffer(ABC):
         """
         self.pos = 0
         self.full = False
+        self._snapshot_state = None
 
     def sample(self, batch_size: int, env: Optional[VecNormalize] = None):
         """
@@ -318,6 +325,7 @@ class ReplayBuffer(BaseBuffer):
                 [info.get("TimeLimit.truncated", False) for info in infos]
             )
 
+        self.n_added += 1
         self.pos += 1
         if self.pos == self.buffer_size:
             self.full = True
@@ -382,6 +390,155 @@ class ReplayBuffer(BaseBuffer):
         )
         return ReplayBufferSamples(*tuple(map(self.to_torch, data)))  # type: ignore
 
+    def _snapshot_tensors(self) -> Dict[str, th.Tensor]:
+        """
+        :return: Flat mapping from field name to the (buffer_size, n_envs, ...) storage
+        """
+        tensors = {}
+        observations = {"observations": self.observations}
+        if not self.optimize_memory_usage:
+            observations["next_observations"] = self.next_observations
+        for name, value in observations.items():
+            if isinstance(value, dict):
+                for key, tensor in value.items():
+                    tensors[f"{name}.{key}"] = tensor
+            else:
+                tensors[name] = value
+        tensors["actions"] = self.actions
+        tensors["rewards"] = self.rewards
+        tensors["dones"] = self.dones
+        tensors["timeouts"] = self.timeouts
+        return tensors
+
+    def _dirty_chunks(self, path: str, chunk_size: int) -> List[int]:
+        """
+        :return: Indices of the chunks written since the last snapshot to ``path``
+        """
+        n_chunks = (self.size() + chunk_size - 1) // chunk_size
+        if self._snapshot_state is None or self._snapshot_state[0] != path:
+            return list(range(n_chunks))
+        n_new = self.n_added - self._snapshot_state[1]
+        if n_new >= self.buffer_size:
+            return list(range(n_chunks))
+        # the rows written since the last snapshot form the ring segment ending at `pos`,
+        # `add` also writes the next observation at `pos` when optimizing memory
+        n_rows = n_new + int(self.optimize_memory_usage and n_new > 0)
+        start = (self.pos - n_new) % self.buffer_size
+        segments = [(start, min(start + n_rows, self.buffer_size))]
+        if start + n_rows > self.buffer_size:
+            segments.append((0, start + n_rows - self.buffer_size))
+        dirty = set()
+        for begin, end in segments:
+            if end > begin:
+                dirty.update(range(begin // chunk_size, (end - 1) // chunk_size + 1))
+        return sorted(dirty)
+
+    def save_snapshot(self, path: str, chunk_size: int = 65536) -> Dict[str, Any]:
+        """
+        Save the buffer to a chunked on-disk format.
+
+        The ring buffer is split into chunks of ``chunk_size`` rows, stored as one
+        ``.npy`` file per field and chunk. Saving again to the same ``path`` only
+        rewrites the chunks that were written since the previous snapshot, so periodic
+        checkpoints of a large buffer are cheap. The metadata (``pos``/``full``) is
+        replaced last, an interrupted save leaves the previous snapshot readable (see
+        ``write_buffer_snapshot``).
+
+        :param path: Snapshot directory
+        :param chunk_size: Number of rows of each chunk
+        :return: The snapshot metadata, with the number of chunks written this time
+        """
+        meta, chunks = self.snapshot_chunks(path, chunk_size)
+        meta = write_buffer_snapshot(path, meta, chunks)
+        self.commit_snapshot(path, meta)
+        return meta
+
+    def snapshot_chunks(
+        self, path: str, chunk_size: int = 65536
+    ) -> Tuple[Dict[str, Any], Dict[Tuple[str, int], np.ndarray]]:
+        """
+        Copy the chunks written since the last snapshot to ``path`` to CPU memory.
+
+        This is the part of ``save_snapshot`` that has to run on the training thread,
+        ``write_buffer_snapshot`` can run in the background. Pass the written metadata
+        to ``commit_snapshot`` once the write succeeded: until then, the next snapshot
+        to ``path`` also includes these chunks.
+
+        :param path: Snapshot directory
+        :param chunk_size: Number of rows of each chunk
+        :return: Metadata and a mapping from (field, chunk index) to the chunk data
+        """
+        if (
+            self._snapshot_state is not None
+            and self._snapshot_state[0] == path
+            and os.path.exists(os.path.join(path, "meta.json"))
+        ):
+            with open(os.path.join(path, "meta.json")) as f:
+                if json.load(f)["chunk_size"] != chunk_size:
+                    self._snapshot_state = None
+
+        tensors = self._snapshot_tensors()
+        dirty = self._dirty_chunks(path, chunk_size)
+        chunks = {}
+        for name, tensor in tensors.items():
+            for index in dirty:
+                start = index * chunk_size
+                chunks[(name, index)] = (
+                    tensor[start : start + chunk_size].detach().cpu().numpy().copy()
+                )
+        meta = {
+            "pos": self.pos,
+            "full": self.full,
+            "n_added": self.n_added,
+            "buffer_size": self.buffer_size,
+            "n_envs": self.n_envs,
+            "chunk_size": chunk_size,
+            "fields": {name: list(tensor.shape) for name, tensor in tensors.items()},
+            "n_chunks_written": len(dirty),
+        }
+        return meta, chunks
+
+    def commit_snapshot(self, path: str, meta: Dict[str, Any]) -> None:
+        """
+        Record that the snapshot described by ``meta`` is on disk at ``path``, the next
+        snapshot to ``path`` only writes the chunks changed since then.
+
+        :param path: Snapshot directory
+        :param meta: Metadata returned by ``write_buffer_snapshot``
+        """
+        self._snapshot_state = (path, meta["n_added"])
+
+    def load_snapshot(self, path: str, mmap: bool = True) -> None:
+        """
+        Restore the buffer from a snapshot written by ``save_snapshot``.
+
+        :param path: Snapshot directory
+        :param mmap: Memory-map the chunk files instead of reading them into memory first
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        tensors = self._snapshot_tensors()
+        if meta["fields"] != {name: list(t.shape) for name, t in tensors.items()}:
+            raise ValueError(
+                f"Snapshot fields {meta['fields']} do not match the buffer layout"
+            )
+        chunk_size = meta["chunk_size"]
+        size = meta["buffer_size"] if meta["full"] else meta["pos"]
+        n_chunks = (size + chunk_size - 1) // chunk_size
+        for name, tensor in tensors.items():
+            for index in range(n_chunks):
+                filename = buffer_chunk_path(
+                    path, name, index, meta["chunk_generations"][index]
+                )
+                chunk = np.load(filename, mmap_mode="r" if mmap else None)
+                start = index * chunk_size
+                tensor[start : start + len(chunk)] = th.from_numpy(np.array(chunk))
+
+        self.pos = meta["pos"]
+        self.full = meta["full"]
+        self.n_added = meta["n_added"]
+        self._snapshot_state = (path, self.n_added)
+
     @staticmethod
     def _maybe_cast_dtype(dtype: np.typing.DTypeLike) -> np.typing.DTypeLike:  # type: ignore
         """
@@ -760,6 +917,7 @@ class DictReplayBuffer(ReplayBuffer):
                 device=self.device,
             )
 
+        self.n_added += 1
         self.pos += 1
         if self.pos == self.buffer_size:
             self.full = True
@@ -1206,16 +1364,16 @@ class RecurrentRolloutBuffer(RolloutBuffer):
     def reset(self):
         super().reset()
         self.hidden_states_pi = th.zeros(
-            self.hidden_state_shape, dtype=np.float32, device=self.device
+            self.hidden_state_shape, dtype=th.float32, device=self.device
         )
         self.cell_states_pi = th.zeros(
-            self.hidden_state_shape, dtype=np.float32, device=self.device
+            self.hidden_state_shape, dtype=th.float32, device=self.device
         )
         self.hidden_states_vf = th.zeros(
-            self.hidden_state_shape, dtype=np.float32, device=self.device
+            self.hidden_state_shape, dtype=th.float32, device=self.device
         )
         self.cell_states_vf = th.zeros(
-            self.hidden_state_shape, dtype=np.float32, device=self.device
+            self.hidden_state_shape, dtype=th.float32, device=self.device
         )
 
     def add(self, *args, lstm_states: RNNStates, **kwargs) -> None:
@@ -1273,7 +1431,7 @@ class RecurrentRolloutBuffer(RolloutBuffer):
         # more complexity and use of padding
         # Trick to shuffle a bit: keep the sequence order
         # but split the indices in two
-        split_index = th.randint(self.buffer_size * self.n_envs, device=self.device)
+        split_index = int(th.randint(self.buffer_size * self.n_envs, ()))
         indices = th.arange(self.buffer_size * self.n_envs, device=self.device)
         indices = th.cat((indices[split_index:], indices[:split_index]))
 
@@ -1694,8 +1852,8 @@ class RecurrentSequenceDictRolloutBuffer(RecurrentDictRolloutBuffer):
         # Prepare the data
         if not self.generator_ready:
             self.episode_starts[0, :] = 1
-            for key, obs in self.observations.items():
-                self.observations[key] = self.swap_and_flatten(obs)
+            # flatten the batch dimensions of the tensordict, keep the feature ones
+            self.observations = self.observations.transpose(0, 1).reshape(-1)
 
             for tensor in [
                 "actions",
@@ -1723,8 +1881,8 @@ class RecurrentSequenceDictRolloutBuffer(RecurrentDictRolloutBuffer):
         # yields batches of whole sequences, shape: (sequence_length, batch_size=n_seq, features_size)
         for indices in batch_sampler:
             obs_batch = {}
-            for key in self.observations:
-                obs_batch[key] = create_minibatch(self.observations[key], indices)
+            for key, obs in self.observations.items():
+                obs_batch[key] = create_minibatch(obs, indices)
             returns_batch = create_minibatch(self.returns, indices)
             masks_batch = pad_sequence(
                 [th.ones_like(returns) for returns in th.swapaxes(returns_batch, 0, 1)]
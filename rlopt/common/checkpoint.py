@@ -0,0 +1,355 @@
+"""
+Asynchronous checkpointing with atomic writes, last-K rotation and lazy loading.
+
+A checkpoint written by ``AsyncCheckpointer.save_state`` is a directory holding one
+``<component>.pt`` file per component (``policy``, ``value_net``, ``optimizers``, ...).
+Each file uses the zipfile serialization of ``torch.save``, so ``load_checkpoint`` can
+memory-map it and only touch the components that are requested, e.g. the policy alone
+for inference.
+
+The training thread only pays for a CPU snapshot of the state (the *stall time*);
+serialization to disk happens in a background thread, into a temporary path that is
+atomically renamed into place once complete.
+"""
+
+import io
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import torch as th
+
+
+def snapshot_to_cpu(obj: Any) -> Any:
+    """
+    Recursively copy every tensor of a (nested) state dict to CPU memory.
+
+    Device tensors are copied with ``non_blocking`` into pinned memory and synchronized
+    once at the end, CPU tensors are cloned so that later in-place updates by the
+    optimizer do not leak into the snapshot.
+
+    :param obj: State dict, or nested dicts/lists/tuples of tensors and python objects
+    :return: The same structure with CPU tensors
+    """
+    needs_sync = False
+
+    def _copy(value: Any) -> Any:
+        nonlocal needs_sync
+        if isinstance(value, th.Tensor):
+            value = value.detach()
+            if value.device.type == "cpu":
+                return value.clone()
+            needs_sync = True
+            out = th.empty(value.shape, dtype=value.dtype, pin_memory=True)
+            out.copy_(value, non_blocking=True)
+            return out
+        if isinstance(value, dict):
+            return type(value)((k, _copy(v)) for k, v in value.items())
+        if isinstance(value, (list, tuple)):
+            return type(value)(_copy(v) for v in value)
+        return value
+
+    snapshot = _copy(obj)
+    if needs_sync and th.cuda.is_available():
+        th.cuda.synchronize()
+    return snapshot
+
+
+def write_state_dir(path: str, components: Dict[str, Any]) -> None:
+    """
+    Write each component to ``<path>/<component>.pt``.
+
+    :param path: Checkpoint directory, created if needed
+    :param components: Mapping from component name to a CPU state
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, state in components.items():
+        th.save(state, os.path.join(path, f"{name}.pt"))
+
+
+def load_checkpoint(
+    path: str,
+    components: Optional[Iterable[str]] = None,
+    map_location: Union[str, th.device] = "cpu",
+    mmap: bool = True,
+) -> Dict[str, Any]:
+    """
+    Load (a subset of) the components of a checkpoint.
+
+    Directory checkpoints only open the requested component files. Single-file
+    checkpoints written by an older ``BaseAlgorithm.save_checkpoint`` are loaded
+    whole and filtered.
+
+    :param path: Checkpoint directory or legacy checkpoint file
+    :param components: Names of the components to load, ``None`` loads all of them
+    :param map_location: Where to map the loaded tensors
+    :param mmap: Memory-map the files instead of reading them into memory
+    :return: Mapping from component name to its state
+    """
+    components = None if components is None else list(components)
+    if os.path.isdir(path):
+        if components is None:
+            components = sorted(
+                name[: -len(".pt")] for name in os.listdir(path) if name.endswith(".pt")
+            )
+        loaded = {}
+        for name in components:
+            filename = os.path.join(path, f"{name}.pt")
+            if not os.path.exists(filename):
+                raise KeyError(f"Component '{name}' not found in checkpoint {path}")
+            loaded[name] = th.load(
+                filename, map_location=map_location, mmap=mmap, weights_only=False
+            )
+        return loaded
+
+    checkpoint = th.load(path, map_location=map_location, mmap=mmap, weights_only=False)
+    if components is None:
+        return checkpoint
+    return {name: checkpoint[name] for name in components}
+
+
+def buffer_chunk_path(path: str, name: str, index: int, generation: int) -> str:
+    return os.path.join(path, name, f"chunk_{index:05d}_{generation}.npy")
+
+
+def write_buffer_snapshot(
+    path: str,
+    meta: Dict[str, Any],
+    chunks: Dict[Tuple[str, int], np.ndarray],
+) -> Dict[str, Any]:
+    """
+    Write the chunks and metadata produced by ``ReplayBuffer.snapshot_chunks``.
+
+    Chunk files are never overwritten: every write is a new generation and the
+    metadata records the generation of each chunk. The metadata is atomically
+    replaced once all the chunks are written, and the files it no longer references
+    are deleted afterwards, so an interrupted write leaves the previous snapshot
+    readable.
+
+    :param path: Snapshot directory
+    :param meta: Snapshot metadata
+    :param chunks: Mapping from (field, chunk index) to the chunk data
+    :return: The metadata written, with the generations of the chunks
+    """
+    meta_path = os.path.join(path, "meta.json")
+    generation, generations = 0, []
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            previous = json.load(f)
+        generation = previous["generation"] + 1
+        if previous["chunk_size"] == meta["chunk_size"]:
+            generations = previous["chunk_generations"]
+    size = meta["buffer_size"] if meta["full"] else meta["pos"]
+    n_chunks = (size + meta["chunk_size"] - 1) // meta["chunk_size"]
+    generations = (generations + [None] * n_chunks)[:n_chunks]
+
+    for (name, index), chunk in chunks.items():
+        filename = buffer_chunk_path(path, name, index, generation)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "wb") as f:
+            np.save(f, chunk)
+        generations[index] = generation
+    if None in generations:
+        raise ValueError(f"Chunks {generations} missing from the snapshot {path}")
+    meta = {**meta, "generation": generation, "chunk_generations": generations}
+    os.makedirs(path, exist_ok=True)
+    with open(f"{meta_path}.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+    # superseded generations and leftovers of interrupted writes
+    for name in meta["fields"]:
+        referenced = {
+            os.path.basename(buffer_chunk_path(path, name, index, chunk_generation))
+            for index, chunk_generation in enumerate(generations)
+        }
+        directory = os.path.join(path, name)
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                if filename not in referenced:
+                    os.remove(os.path.join(directory, filename))
+    return meta
+
+
+class AsyncCheckpointer:
+    """
+    Write checkpoints from a background thread.
+
+    Every write goes to ``<path>.tmp`` first and is renamed to ``<path>`` once complete,
+    so a crash never leaves a half-written checkpoint behind. For each rotation key only
+    the ``keep_last`` most recent checkpoints are kept.
+
+    :param keep_last: Number of checkpoints to keep per rotation key, ``None`` keeps all
+    :param max_pending: Number of writes that may be queued before ``submit`` blocks
+    """
+
+    def __init__(self, keep_last: Optional[int] = None, max_pending: int = 2):
+        self.keep_last = keep_last
+        self.stall_times: List[float] = []
+        self.write_times: List[float] = []
+        self._history: Dict[str, Deque[str]] = defaultdict(deque)
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_pending)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(
+            target=self._worker_loop, name="rlopt-checkpointer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self,
+        path: str,
+        write_fn: Callable[[str], None],
+        key: str = "default",
+        stall_start: Optional[float] = None,
+        atomic: bool = True,
+    ) -> float:
+        """
+        Queue ``write_fn(tmp_path)`` and return the time the caller was blocked.
+
+        :param path: Final path of the checkpoint (file or directory)
+        :param write_fn: Writes the checkpoint to the path it is given
+        :param key: Rotation key, checkpoints sharing a key are rotated together
+        :param stall_start: Start of the stall period, defaults to now
+        :param atomic: Write to a temporary path and rename it. Writers that update
+            ``path`` in place and handle consistency themselves (e.g. incremental
+            replay buffer snapshots) pass ``False``; such paths are not rotated.
+        :return: Stall time in seconds
+        """
+        stall_start = time.perf_counter() if stall_start is None else stall_start
+        self._raise_error()
+        self._queue.put((path, write_fn, key, atomic))
+        stall_time = time.perf_counter() - stall_start
+        self.stall_times.append(stall_time)
+        return stall_time
+
+    def save_state(
+        self, path: str, components: Dict[str, Any], key: str = "default"
+    ) -> float:
+        """
+        Snapshot ``components`` to CPU and write them as a checkpoint directory.
+
+        :return: Stall time in seconds
+        """
+        stall_start = time.perf_counter()
+        snapshot = snapshot_to_cpu(components)
+        return self.submit(
+            path,
+            lambda tmp_path: write_state_dir(tmp_path, snapshot),
+            key=key,
+            stall_start=stall_start,
+        )
+
+    def save_serialized(
+        self,
+        path: str,
+        serialize_fn: Callable[[io.BytesIO], None],
+        key: str = "default",
+    ) -> float:
+        """
+        Serialize into memory on the calling thread and write the bytes in the background.
+
+        Useful for savers that need a consistent view of live objects, such as
+        Stable-Baselines3's ``save``.
+
+        :return: Stall time in seconds
+        """
+        stall_start = time.perf_counter()
+        buffer = io.BytesIO()
+        serialize_fn(buffer)
+        data = buffer.getbuffer()
+
+        def _write(tmp_path: str) -> None:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+
+        return self.submit(path, _write, key=key, stall_start=stall_start)
+
+    def wait(self) -> None:
+        """Block until every queued checkpoint is on disk."""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """Flush pending checkpoints and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Mean/max stall time and mean write time in milliseconds."""
+        stall = np.array(self.stall_times or [0.0]) * 1e3
+        write = np.array(self.write_times or [0.0]) * 1e3
+        return {
+            "n_checkpoints": len(self.stall_times),
+            "mean_stall_ms": float(stall.mean()),
+            "max_stall_ms": float(stall.max()),
+            "mean_write_ms": float(write.mean()),
+        }
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Asynchronous checkpoint write failed") from error
+
+    def _worker_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                path, write_fn, key, atomic = item
+                start = time.perf_counter()
+                if atomic:
+                    self._write_atomic(path, write_fn)
+                else:
+                    write_fn(path)
+                self.write_times.append(time.perf_counter() - start)
+                if atomic:
+                    self._rotate(path, key)
+            except BaseException as e:  # surfaced on the training thread
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _write_atomic(path: str, write_fn: Callable[[str], None]) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        _remove(tmp_path)
+        write_fn(tmp_path)
+        if os.path.isdir(tmp_path) and os.path.exists(path):
+            # directories cannot be replaced atomically, move the old one out first
+            old_path = f"{path}.old"
+            _remove(old_path)
+            os.replace(path, old_path)
+            os.replace(tmp_path, path)
+            _remove(old_path)
+        else:
+            os.replace(tmp_path, path)
+
+    def _rotate(self, path: str, key: str) -> None:
+        history = self._history[key]
+        if path in history:
+            history.remove(path)
+        history.append(path)
+        if self.keep_last is None:
+            return
+        while len(history) > self.keep_last:
+            _remove(history.popleft())
+
+
+def _remove(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
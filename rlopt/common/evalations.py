@@ -14,11 +14,12 @@ from stable_baselines3.common.vec_env import (
     SubprocVecEnv,
     DummyVecEnv,
     VecEnv,
-    sync_envs_normalization,
     is_vecenv_wrapped,
 )
 import wandb
 
+from rlopt.common.utils import sync_normalization_stats
+
 
 class EvalStudentCallback(EventCallback):
     """
@@ -139,7 +140,7 @@ class EvalStudentCallback(EventCallback):
             # Sync training and eval env if there is VecNormalize
             if self.model.get_vec_normalize_env() is not None:
                 try:
-                    sync_envs_normalization(self.training_env, self.eval_env)
+                    sync_normalization_stats(self.training_env, self.eval_env)
                 except AttributeError as e:
                     raise AssertionError(
                         "Training and eval env are not wrapped the same way, "
@@ -502,7 +503,7 @@ class EvalTeacherCallback(EventCallback):
             # Sync training and eval env if there is VecNormalize
             if self.model.get_vec_normalize_env() is not None:
                 try:
-                    sync_envs_normalization(self.training_env, self.eval_env)
+                    sync_normalization_stats(self.training_env, self.eval_env)
                 except AttributeError as e:
                     raise AssertionError(
                         "Training and eval env are not wrapped the same way, "
@@ -0,0 +1,233 @@
+"""
+``torch.profiler`` integration of the training loops.
+
+Configured by a ``profile`` section of the config (a Hydra config group for the
+torchrl agents and scripts, the ``profile`` argument of the stable-baselines3-style
+agents)::
+
+    profile:
+      enabled: True
+      iterations: [2, 3] # training iterations to record
+      activities: [cpu, cuda]
+
+The loops call ``TrainingProfiler.step()`` once per training iteration, consecutive
+recorded iterations are exported together as a Chrome trace
+(``trace_<first>-<last>.json``, open in ``chrome://tracing`` or Perfetto) and a table
+of the top ops (``top_ops_<first>-<last>.txt``), in ``output_dir`` (by default
+``profile/`` in the Hydra run directory, or in the working directory outside of
+Hydra).
+
+Phases of an iteration are labelled with ``record_phase``/``iter_phase`` (see
+``PHASES``), which do nothing unless a profiler is running.
+"""
+
+import contextlib
+import os
+import warnings
+from typing import Any, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import torch
+from torch.profiler import ProfilerAction, ProfilerActivity, profile, record_function
+
+PHASES = (
+    "collection",
+    "gae",
+    "minibatch_sampling",
+    "forward",
+    "backward",
+    "optimizer_step",
+)
+
+# number of running profilers, the phase labels are only recorded when positive
+_num_active = 0
+
+
+def record_phase(name: str):
+    """Label a phase of the training iteration in the profiler trace."""
+    if _num_active:
+        return record_function(name)
+    return contextlib.nullcontext()
+
+
+def iter_phase(name: str, iterable: Iterable) -> Iterator:
+    """Iterate over ``iterable``, labelling each ``next`` call (e.g. minibatches)."""
+    if not _num_active:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        with record_function(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def default_output_dir() -> str:
+    try:
+        from hydra.core.hydra_config import HydraConfig
+
+        if HydraConfig.initialized():
+            return os.path.join(HydraConfig.get().runtime.output_dir, "profile")
+    except ImportError:
+        pass
+    return os.path.join(os.getcwd(), "profile")
+
+
+class TrainingProfiler:
+    """
+    Records chosen training iterations with ``torch.profiler``. A disabled profiler
+    is free, so the training loops always drive one.
+
+    :param enabled: Whether to profile
+    :param iterations: Indices of the training iterations to record (counted by
+        ``step``), consecutive ones are exported in the same trace
+    :param activities: Profiled activities, ``"cpu"`` and/or ``"cuda"``
+    :param output_dir: Directory of the traces and tables, see ``default_output_dir``
+    :param row_limit: Number of ops in the summary tables
+    :param record_shapes: Record the input shapes of the ops
+    :param profile_memory: Record the tensor allocations
+    :param with_stack: Record the python stacks of the ops
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        iterations: Sequence[int] = (2, 3),
+        activities: Sequence[str] = ("cpu",),
+        output_dir: Optional[str] = None,
+        row_limit: int = 20,
+        record_shapes: bool = False,
+        profile_memory: bool = False,
+        with_stack: bool = False,
+    ):
+        self.enabled = enabled
+        self.iterations = sorted(set(iterations))
+        self.activities = [getattr(ProfilerActivity, a.upper()) for a in activities]
+        self.output_dir = output_dir
+        self.row_limit = row_limit
+        self.record_shapes = record_shapes
+        self.profile_memory = profile_memory
+        self.with_stack = with_stack
+        self.exported: List[str] = []
+        self._windows: List[Tuple[int, int]] = []
+        self._tag: Optional[str] = None
+        self._profiler: Optional[profile] = None
+
+    @classmethod
+    def from_config(cls, cfg: Optional[Mapping[str, Any]]) -> "TrainingProfiler":
+        """Build from a ``profile`` config section, disabled if ``None``."""
+        if not cfg or not cfg.get("enabled", False):
+            return cls()
+        kwargs = {key: cfg[key] for key in cfg if key != "enabled"}
+        if isinstance(kwargs.get("iterations", None), int):
+            kwargs["iterations"] = [kwargs["iterations"]]
+        return cls(enabled=True, **kwargs)
+
+    @property
+    def running(self) -> bool:
+        return self._profiler is not None
+
+    def _schedule(self, step: int) -> ProfilerAction:
+        if step in self.iterations:
+            if step + 1 in self.iterations:
+                return ProfilerAction.RECORD
+            return ProfilerAction.RECORD_AND_SAVE
+        if step + 1 in self.iterations:
+            return ProfilerAction.WARMUP
+        return ProfilerAction.NONE
+
+    def _export(self, prof: profile) -> None:
+        first, last = self._windows.pop(0)
+        # a window cut short by ``stop`` ends at the current iteration
+        last = min(last, prof.step_num)
+        name = f"{first}-{last}"
+        if self._tag:
+            name = f"{self._tag}_{name}"
+        os.makedirs(self.output_dir, exist_ok=True)
+        trace_path = os.path.join(self.output_dir, f"trace_{name}.json")
+        prof.export_chrome_trace(trace_path)
+        sort_by = (
+            "self_device_time_total"
+            if ProfilerActivity.CUDA in self.activities
+            else "self_cpu_time_total"
+        )
+        table_path = os.path.join(self.output_dir, f"top_ops_{name}.txt")
+        with open(table_path, "w") as f:
+            f.write(
+                prof.key_averages().table(sort_by=sort_by, row_limit=self.row_limit)
+            )
+        self.exported += [trace_path, table_path]
+
+    def start(self, tag: Optional[str] = None) -> None:
+        """
+        Start counting training iterations, ``tag`` prefixes the names of the
+        exported files (e.g. for the successive training phases of an agent).
+        """
+        global _num_active
+        if not self.enabled or self.running:
+            return
+        self._tag = tag
+        if self.output_dir is None:
+            self.output_dir = default_output_dir()
+        # consecutive iterations are recorded in one window
+        self._windows = []
+        for step in self.iterations:
+            if self._windows and self._windows[-1][1] == step - 1:
+                self._windows[-1] = (self._windows[-1][0], step)
+            else:
+                self._windows.append((step, step))
+        self._profiler = profile(
+            activities=self.activities,
+            schedule=self._schedule,
+            on_trace_ready=self._export,
+            record_shapes=self.record_shapes,
+            profile_memory=self.profile_memory,
+            with_stack=self.with_stack,
+        )
+        self._profiler.start()
+        _num_active += 1
+
+    def step(self) -> None:
+        """Mark the end of a training iteration."""
+        if self._profiler is None:
+            return
+        with warnings.catch_warnings():
+            # every window is exported on its own, its events are cleared on purpose
+            warnings.filterwarnings(
+                "ignore", "Warning: Profiler clears events at the end of each cycle"
+            )
+            self._profiler.step()
+        if self._profiler.step_num > self.iterations[-1]:
+            # nothing left to record
+            self.stop()
+
+    def stop(self) -> None:
+        """
+        Stop profiling. A window that is being recorded is exported up to the
+        current iteration, the later ones are not recorded. The training loops call
+        it in a ``finally`` block so that the phase labels are switched off when
+        training fails.
+        """
+        global _num_active
+        if self._profiler is None:
+            return
+        if torch.cuda.is_available() and ProfilerActivity.CUDA in self.activities:
+            torch.cuda.synchronize()
+        self._profiler.stop()
+        self._profiler = None
+        _num_active -= 1
+
+    def __enter__(self) -> "TrainingProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def __getstate__(self):
+        # saved with the agents, a running profiler is not picklable
+        state = self.__dict__.copy()
+        state["_profiler"] = None
+        return state
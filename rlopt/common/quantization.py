@@ -0,0 +1,230 @@
+"""
+Post-training optimization of recurrent student policies for CPU deployment.
+
+The pipeline is: optional magnitude pruning of the actor MLP head, dynamic int8
+quantization of ``nn.LSTM`` / ``nn.Linear`` layers, then an action-parity check
+against the fp32 policy on rollouts stored in a recurrent rollout buffer and a
+CPU latency benchmark.
+"""
+
+import copy
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple, Type, Union
+
+import numpy as np
+import torch as th
+from stable_baselines3.common.policies import BasePolicy
+from tensordict import TensorDict
+from torch import nn
+from torch.nn.utils import prune
+
+
+def quantize_policy(
+    policy: BasePolicy,
+    dtype: th.dtype = th.qint8,
+    modules: Iterable[Type[nn.Module]] = (nn.LSTM, nn.Linear),
+) -> BasePolicy:
+    """
+    Return a dynamically quantized CPU copy of ``policy``.
+
+    Weights of the given module types are stored in int8 and activations are
+    quantized on the fly, so no calibration data is needed. The original policy
+    is left untouched.
+
+    :param policy: The fp32 policy (e.g. a ``RecurrentActorCriticPolicy``)
+    :param dtype: Quantized weight dtype, ``th.qint8`` or ``th.float16``
+    :param modules: Module types to quantize
+    :return: The quantized policy, on CPU and in eval mode
+    """
+    model = copy.deepcopy(policy).to("cpu")
+    model.set_training_mode(False)
+    return th.ao.quantization.quantize_dynamic(model, set(modules), dtype=dtype)
+
+
+def prune_policy_heads(
+    policy: BasePolicy,
+    amount: float = 0.3,
+    module_names: Tuple[str, ...] = ("mlp_extractor.policy_net", "action_net"),
+) -> Dict[str, float]:
+    """
+    Apply L1 magnitude pruning to the linear layers of the actor head, in place.
+
+    The pruning masks are folded into the weights, so the pruned policy is a plain
+    module that can be saved, quantized or exported as usual.
+
+    :param policy: The policy to prune
+    :param amount: Fraction of weights to zero in each linear layer
+    :param module_names: Dotted names of the sub-modules to prune
+    :return: Sparsity of each pruned layer
+    """
+    sparsity = {}
+    for module_name in module_names:
+        root = policy.get_submodule(module_name)
+        for name, module in root.named_modules():
+            if not isinstance(module, nn.Linear):
+                continue
+            prune.l1_unstructured(module, name="weight", amount=amount)
+            prune.remove(module, "weight")
+            full_name = f"{module_name}.{name}" if name else module_name
+            sparsity[full_name] = float((module.weight == 0).float().mean())
+    return sparsity
+
+
+def rollout_action_parity(
+    reference: BasePolicy,
+    candidate: BasePolicy,
+    observations: th.Tensor,
+    episode_starts: th.Tensor,
+) -> Dict[str, float]:
+    """
+    Replay a stored rollout through two recurrent policies and compare their
+    deterministic actions step by step. Each policy carries its own LSTM state.
+
+    :param reference: Reference (fp32) policy
+    :param candidate: Optimized policy
+    :param observations: Observations of shape (n_steps, n_envs, *obs_shape)
+    :param episode_starts: Episode starts of shape (n_steps, n_envs)
+    :return: Max and mean absolute action difference
+    """
+    observations = observations.to("cpu", th.float32)
+    episode_starts = episode_starts.to("cpu", th.float32)
+    device = reference.device
+    reference.to("cpu")
+
+    reference_state, candidate_state = None, None
+    max_diff, sum_diff, n_actions = 0.0, 0.0, 0
+    for obs, episode_start in zip(observations, episode_starts):
+        reference_action, reference_state = reference.predict_and_return_tensor(
+            obs, reference_state, episode_start, deterministic=True
+        )
+        candidate_action, candidate_state = candidate.predict_and_return_tensor(
+            obs, candidate_state, episode_start, deterministic=True
+        )
+        diff = (reference_action - candidate_action).abs()
+        max_diff = max(max_diff, float(diff.max()))
+        sum_diff += float(diff.sum())
+        n_actions += diff.numel()
+    reference.to(device)
+
+    return {
+        "max_action_diff": max_diff,
+        "mean_action_diff": sum_diff / max(n_actions, 1),
+    }
+
+
+def buffer_action_parity(
+    reference: BasePolicy,
+    candidate: BasePolicy,
+    rollout_buffer: Any,
+    obs_key: Optional[str] = "student",
+) -> Dict[str, float]:
+    """
+    Run ``rollout_action_parity`` on the transitions stored in a recurrent rollout
+    buffer (e.g. ``RLOptDictRecurrentReplayBuffer``) before it is flattened by ``get``.
+
+    :param reference: Reference (fp32) policy
+    :param candidate: Optimized policy
+    :param rollout_buffer: Buffer holding ``observations`` (n_steps, n_envs, ...)
+        and ``episode_starts`` (n_steps, n_envs)
+    :param obs_key: Observation key fed to the policy when the buffer stores dict observations
+    :return: See ``rollout_action_parity``
+    """
+    n_steps = rollout_buffer.buffer_size if rollout_buffer.full else rollout_buffer.pos
+    if n_steps == 0:
+        raise ValueError("The rollout buffer is empty")
+    observations = rollout_buffer.observations
+    if isinstance(observations, (dict, TensorDict)):
+        observations = observations[obs_key]
+    return rollout_action_parity(
+        reference,
+        candidate,
+        th.as_tensor(observations[:n_steps]),
+        th.as_tensor(rollout_buffer.episode_starts[:n_steps]),
+    )
+
+
+def benchmark_policy_latency(
+    policy: BasePolicy,
+    n_envs: int = 1,
+    n_steps: int = 1000,
+    n_warmup: int = 50,
+    num_threads: Optional[int] = 1,
+) -> Dict[str, float]:
+    """
+    Measure the per-step CPU latency of ``predict_and_return_tensor`` on random observations.
+
+    :param policy: The policy to benchmark (moved to CPU)
+    :param n_envs: Batch size of each step
+    :param n_steps: Number of timed steps
+    :param n_warmup: Number of untimed warm-up steps
+    :param num_threads: Number of intra-op threads, ``None`` keeps the current setting
+    :return: p50/p99/mean latency in milliseconds
+    """
+    previous_threads = th.get_num_threads()
+    if num_threads is not None:
+        th.set_num_threads(num_threads)
+    device = policy.device
+    policy.to("cpu")
+
+    observations = th.randn(
+        n_warmup + n_steps, n_envs, *policy.observation_space.shape
+    )
+    episode_start = th.zeros(n_envs)
+    state = None
+    latencies = []
+    for step, obs in enumerate(observations):
+        start = time.perf_counter()
+        _, state = policy.predict_and_return_tensor(
+            obs, state, episode_start, deterministic=True
+        )
+        if step >= n_warmup:
+            latencies.append(time.perf_counter() - start)
+
+    policy.to(device)
+    th.set_num_threads(previous_threads)
+    latencies = np.array(latencies) * 1e3
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+    }
+
+
+def optimize_student_policy(
+    policy: BasePolicy,
+    rollout_buffer: Optional[Any] = None,
+    prune_amount: float = 0.0,
+    dtype: th.dtype = th.qint8,
+    obs_key: Optional[str] = "student",
+    n_envs: int = 1,
+    n_steps: int = 1000,
+) -> Tuple[BasePolicy, Dict[str, Union[float, Dict[str, float]]]]:
+    """
+    Prune and quantize a trained student policy and report parity and latency.
+
+    :param policy: The trained fp32 student policy, left untouched
+    :param rollout_buffer: Optional recurrent rollout buffer used for the parity check
+    :param prune_amount: Fraction of actor head weights to prune, 0 disables pruning
+    :param dtype: Quantized weight dtype
+    :param obs_key: Observation key of the student in dict buffers
+    :param n_envs: Batch size of the latency benchmark
+    :param n_steps: Number of steps of the latency benchmark
+    :return: The optimized policy and a report
+    """
+    candidate = copy.deepcopy(policy).to("cpu")
+    report: Dict[str, Union[float, Dict[str, float]]] = {}
+    if prune_amount > 0:
+        report["sparsity"] = prune_policy_heads(candidate, amount=prune_amount)
+    candidate = quantize_policy(candidate, dtype=dtype)
+
+    if rollout_buffer is not None:
+        report["parity"] = buffer_action_parity(
+            policy, candidate, rollout_buffer, obs_key=obs_key
+        )
+    report["fp32_latency"] = benchmark_policy_latency(
+        policy, n_envs=n_envs, n_steps=n_steps
+    )
+    report["optimized_latency"] = benchmark_policy_latency(
+        candidate, n_envs=n_envs, n_steps=n_steps
+    )
+    return candidate, report
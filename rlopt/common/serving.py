@@ -0,0 +1,432 @@
+"""
+In-process inference server for deployed policies.
+
+Many clients each send a single observation; the server coalesces the
+requests into batches (bounded by ``max_batch_size`` and a ``max_latency_ms``
+deadline measured from the oldest pending request), runs one forward pass on a
+worker thread and resolves the asyncio futures of every client in the batch.
+
+Recurrent policies (``RecurrentActorCriticPolicy``) keep one LSTM hidden/cell
+state per client session in a device-resident slot table, so the state never
+leaves the policy device between requests. Idle sessions are evicted.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+import torch as th
+
+
+@dataclass
+class _Request:
+    client_id: Hashable
+    observation: th.Tensor
+    episode_start: bool
+    future: asyncio.Future
+    loop: asyncio.AbstractEventLoop
+    enqueue_time: float = field(default_factory=time.perf_counter)
+
+
+class HiddenStateSlotTable:
+    """
+    Device-resident table of LSTM hidden and cell states, one slot per client session.
+
+    :param num_slots: Maximum number of concurrent sessions
+    :param n_layers: Number of LSTM layers
+    :param hidden_size: Number of hidden units of each LSTM layer
+    :param device: Device on which the states are stored (the policy device)
+    :param idle_timeout: Sessions not seen for ``idle_timeout`` seconds are evicted
+        by ``evict_idle``.
+    """
+
+    def __init__(
+        self,
+        num_slots: int,
+        n_layers: int,
+        hidden_size: int,
+        device: Union[th.device, str] = "cpu",
+        idle_timeout: float = 300.0,
+    ):
+        self.num_slots = num_slots
+        self.idle_timeout = idle_timeout
+        self.device = th.device(device)
+        # (n_layers, num_slots, hidden_size), same layout as the LSTM states
+        self.hidden_states = th.zeros(
+            (n_layers, num_slots, hidden_size), dtype=th.float32, device=self.device
+        )
+        self.cell_states = th.zeros_like(self.hidden_states)
+        # client id -> slot, ordered from least to most recently used
+        self._slots: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._last_seen: Dict[Hashable, float] = {}
+        self._free: Deque[int] = deque(range(num_slots))
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, client_id: Hashable) -> bool:
+        return client_id in self._slots
+
+    def acquire(self, client_id: Hashable) -> Tuple[int, bool]:
+        """
+        Return the slot of a client, allocating one if needed.
+        When the table is full, the least recently used session is evicted.
+
+        :param client_id: Session identifier
+        :return: slot index and whether the slot was freshly allocated
+            (in that case, the LSTM states must be reset)
+        """
+        now = time.monotonic()
+        self._last_seen[client_id] = now
+        if client_id in self._slots:
+            self._slots.move_to_end(client_id)
+            return self._slots[client_id], False
+
+        if not self._free:
+            lru_client = next(iter(self._slots))
+            self.release(lru_client)
+        slot = self._free.popleft()
+        self._slots[client_id] = slot
+        return slot, True
+
+    def release(self, client_id: Hashable) -> None:
+        """
+        Free the slot of a client (no-op if the client has no slot).
+        """
+        slot = self._slots.pop(client_id, None)
+        self._last_seen.pop(client_id, None)
+        if slot is not None:
+            self._free.append(slot)
+
+    def evict_idle(self, now: Optional[float] = None) -> List[Hashable]:
+        """
+        Release every session that has not been seen for ``idle_timeout`` seconds.
+
+        :return: the evicted client ids
+        """
+        now = time.monotonic() if now is None else now
+        evicted = [
+            client_id
+            for client_id, last_seen in self._last_seen.items()
+            if now - last_seen > self.idle_timeout
+        ]
+        for client_id in evicted:
+            self.release(client_id)
+        return evicted
+
+    def gather(self, slots: th.Tensor) -> Tuple[th.Tensor, th.Tensor]:
+        """
+        :param slots: slot indices of the batch (on ``self.device``)
+        :return: hidden and cell states of shape (n_layers, batch_size, hidden_size)
+        """
+        return (
+            self.hidden_states.index_select(1, slots),
+            self.cell_states.index_select(1, slots),
+        )
+
+    def scatter(
+        self, slots: th.Tensor, states: Tuple[th.Tensor, th.Tensor]
+    ) -> None:
+        """
+        Write back the updated LSTM states of a batch.
+        """
+        self.hidden_states.index_copy_(1, slots, states[0])
+        self.cell_states.index_copy_(1, slots, states[1])
+
+
+class InferenceServer:
+    """
+    Dynamic micro-batching inference server with an asyncio front end and a worker thread.
+
+    ``policy`` is either a ``RecurrentActorCriticPolicy`` (detected through its
+    ``lstm_actor``), in which case ``predict_and_return_tensor`` is used and the LSTM states
+    are kept per client, or any callable mapping a batch of observations
+    of shape (batch_size, *obs_shape) to a batch of actions, e.g. ``PPO.predict``.
+
+    Example::
+
+        server = InferenceServer(model.student_policy, max_batch_size=64, max_latency_ms=2)
+        with server:
+            action = await server.act("robot-0", obs)
+
+    :param policy: Recurrent policy or batched predict function
+    :param max_batch_size: Maximum number of requests coalesced in a single forward pass
+    :param max_latency_ms: Maximum time the oldest request of a batch waits
+        for other requests before the batch is dispatched
+    :param num_slots: Capacity of the hidden state slot table (recurrent policies only),
+        at least ``max_batch_size``
+    :param idle_timeout: Sessions idle for more than ``idle_timeout`` seconds are evicted
+    :param deterministic: Whether to return deterministic actions
+    :param device: Device of the policy, inferred from the policy when possible
+    """
+
+    def __init__(
+        self,
+        policy: Union[th.nn.Module, Callable[[th.Tensor], th.Tensor]],
+        max_batch_size: int = 64,
+        max_latency_ms: float = 2.0,
+        num_slots: int = 1024,
+        idle_timeout: float = 300.0,
+        deterministic: bool = True,
+        device: Optional[Union[th.device, str]] = None,
+    ):
+        assert max_batch_size > 0, "`max_batch_size` must be positive"
+        self.policy = policy
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1e3
+        self.deterministic = deterministic
+        self.recurrent = hasattr(policy, "lstm_actor")
+        # every request of a batch needs its own slot, evicting one would share it
+        assert (
+            not self.recurrent or num_slots >= max_batch_size
+        ), "`num_slots` must be at least `max_batch_size`"
+
+        if device is None:
+            device = getattr(policy, "device", None)
+        if device is None:
+            device = getattr(getattr(policy, "__self__", None), "device", "cpu")
+        self.device = th.device(device)
+
+        self.slot_table: Optional[HiddenStateSlotTable] = None
+        if self.recurrent:
+            lstm = policy.lstm_actor  # type: ignore[union-attr]
+            self.slot_table = HiddenStateSlotTable(
+                num_slots,
+                lstm.num_layers,
+                lstm.hidden_size,
+                device=self.device,
+                idle_timeout=idle_timeout,
+            )
+
+        self._queue: "queue.SimpleQueue[Optional[_Request]]" = queue.SimpleQueue()
+        # requests pushed back because their client already had a request in the batch
+        self._deferred: Deque[_Request] = deque()
+        self._worker: Optional[threading.Thread] = None
+        self._running = threading.Event()
+        # guards the slot table, shared by the worker and ``end_session``
+        self._lock = threading.Lock()
+        self._last_eviction = time.monotonic()
+
+        # statistics
+        self.n_requests = 0
+        self.n_batches = 0
+
+    # ------------------------------------------------------------------
+    # Life cycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> "InferenceServer":
+        if self._worker is not None:
+            return self
+        self._running.set()
+        self._worker = threading.Thread(
+            target=self._worker_loop, name="rlopt-inference-server", daemon=True
+        )
+        self._worker.start()
+        return self
+
+    def stop(self) -> None:
+        if self._worker is None:
+            return
+        self._running.clear()
+        # wake up the worker
+        self._queue.put(None)
+        self._worker.join()
+        self._worker = None
+
+    def __enter__(self) -> "InferenceServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.n_requests / max(self.n_batches, 1)
+
+    # ------------------------------------------------------------------
+    # Front end
+    # ------------------------------------------------------------------
+
+    async def act(
+        self,
+        client_id: Hashable,
+        observation: Union[np.ndarray, th.Tensor],
+        episode_start: bool = False,
+    ) -> th.Tensor:
+        """
+        Get the action of a single client.
+
+        :param client_id: Session identifier, used to look up the LSTM states
+        :param observation: A single (unbatched) observation
+        :param episode_start: Whether the observation starts a new episode,
+            in that case the LSTM states of the session are reset
+        :return: the action (on CPU)
+        """
+        if self._worker is None:
+            raise RuntimeError("The inference server is not running, call `start()`")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put(
+            _Request(
+                client_id,
+                th.as_tensor(observation, dtype=th.float32),
+                episode_start,
+                future,
+                loop,
+            )
+        )
+        return await future
+
+    def end_session(self, client_id: Hashable) -> None:
+        """
+        Release the LSTM states of a client. Waits for the batch being processed,
+        if any, so that its slot is not reallocated while in use.
+        """
+        if self.slot_table is not None:
+            with self._lock:
+                self.slot_table.release(client_id)
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+
+    def _next_request(self, timeout: Optional[float]) -> Optional[_Request]:
+        if self._deferred:
+            return self._deferred.popleft()
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _collect_batch(self) -> List[_Request]:
+        first = self._next_request(timeout=0.1)
+        if first is None:
+            return []
+        batch = [first]
+        clients = {first.client_id}
+        deferred: List[_Request] = []
+        deadline = first.enqueue_time + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            request = self._next_request(timeout=remaining)
+            if request is None:
+                # either timeout or stop signal
+                if not self._running.is_set():
+                    break
+                continue
+            if self.recurrent and request.client_id in clients:
+                # the LSTM states must be updated sequentially for a given client
+                deferred.append(request)
+                continue
+            batch.append(request)
+            clients.add(request.client_id)
+        self._deferred.extend(deferred)
+        return batch
+
+    def _worker_loop(self) -> None:
+        while self._running.is_set() or self._deferred:
+            batch = self._collect_batch()
+            if batch:
+                try:
+                    actions = self._run_batch(batch)
+                except Exception as e:  # noqa: BLE001
+                    for request in batch:
+                        request.loop.call_soon_threadsafe(
+                            _set_exception, request.future, e
+                        )
+                else:
+                    for request, action in zip(batch, actions):
+                        request.loop.call_soon_threadsafe(
+                            _set_result, request.future, action
+                        )
+                self.n_requests += len(batch)
+                self.n_batches += 1
+
+            if self.slot_table is not None:
+                now = time.monotonic()
+                if now - self._last_eviction > self.slot_table.idle_timeout / 10:
+                    with self._lock:
+                        self.slot_table.evict_idle(now)
+                    self._last_eviction = now
+
+        # fail pending requests on shutdown
+        while True:
+            request = self._next_request(timeout=0.0)
+            if request is None:
+                break
+            request.loop.call_soon_threadsafe(
+                _set_exception,
+                request.future,
+                RuntimeError("The inference server was stopped"),
+            )
+
+    def _run_batch(self, batch: List[_Request]) -> th.Tensor:
+        observations = th.stack([request.observation for request in batch]).to(
+            self.device, non_blocking=True
+        )
+        if not self.recurrent:
+            with th.no_grad():
+                actions = self.policy(observations)  # type: ignore[operator]
+            return th.as_tensor(actions).reshape(len(batch), -1).cpu()
+
+        assert self.slot_table is not None
+        with self._lock:
+            return self._run_recurrent_batch(batch, observations)
+
+    def _run_recurrent_batch(
+        self, batch: List[_Request], observations: th.Tensor
+    ) -> th.Tensor:
+        assert self.slot_table is not None
+        slots, episode_starts = [], []
+        for request in batch:
+            slot, is_new = self.slot_table.acquire(request.client_id)
+            slots.append(slot)
+            episode_starts.append(float(request.episode_start or is_new))
+        slots_tensor = th.tensor(slots, dtype=th.long, device=self.device)
+        states = self.slot_table.gather(slots_tensor)
+
+        actions, states = self.policy.predict_and_return_tensor(  # type: ignore[union-attr]
+            observations,
+            state=states,
+            episode_start=th.tensor(episode_starts, device=self.device),
+            deterministic=self.deterministic,
+        )
+        # reset masking is applied inside the LSTM forward pass,
+        # so the returned states already start from zero for new episodes
+        self.slot_table.scatter(slots_tensor, states)
+        return actions.reshape(len(batch), -1).cpu()
+
+
+def _set_result(future: asyncio.Future, result: Any) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, exception: BaseException) -> None:
+    if not future.done():
+        future.set_exception(exception)
+
+
+def latency_percentiles(latencies: List[float]) -> Dict[str, float]:
+    """
+    Summary statistics of request latencies, in milliseconds.
+
+    :param latencies: request latencies in seconds
+    """
+    if len(latencies) == 0:
+        return {"p50_ms": float("nan"), "p99_ms": float("nan"), "mean_ms": float("nan")}
+    arr = np.asarray(latencies) * 1e3
+    return {
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "mean_ms": float(arr.mean()),
+    }
+
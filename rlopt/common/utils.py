@@ -1,12 +1,14 @@
 from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, Union, Callable
 import os
+import pickle
+import time
 import warnings
 
 import numpy as np
 import torch as th
 import gymnasium as gym
 from stable_baselines3.common.type_aliases import TensorDict
-from stable_baselines3.common.policies import BasePolicy
+from stable_baselines3.common.policies import BaseModel, BasePolicy
 from stable_baselines3.common.callbacks import BaseCallback, EventCallback
 from stable_baselines3.common.vec_env import (
     VecMonitor,
@@ -14,9 +16,11 @@ from stable_baselines3.common.vec_env import (
     SubprocVecEnv,
     DummyVecEnv,
     VecEnv,
+    VecNormalize,
     sync_envs_normalization,
     is_vecenv_wrapped,
 )
+from stable_baselines3.common.running_mean_std import RunningMeanStd
 
 from torch import nn
 
@@ -26,6 +30,9 @@ from stable_baselines3.common.utils import get_device
 from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
 from stable_baselines3.common.callbacks import CheckpointCallback
 
+from rlopt.common.checkpoint import AsyncCheckpointer, write_buffer_snapshot
+from rlopt.runtime.policy import postprocess_actions, reset_lstm_states
+
 
 def obs_as_tensor(
     obs: Union[th.Tensor, np.ndarray, Dict[str, np.ndarray], Any], device: th.device
@@ -169,6 +176,38 @@ def swap_and_flatten(arr: th.Tensor) -> th.Tensor:
     return arr.reshape(shape[0] * shape[1], -1)
 
 
+def _copy_running_mean_std(
+    src: Union[RunningMeanStd, Dict[str, RunningMeanStd]],
+    dst: Union[RunningMeanStd, Dict[str, RunningMeanStd]],
+) -> None:
+    if isinstance(src, dict):
+        for key, rms in src.items():
+            _copy_running_mean_std(rms, dst[key])
+        return
+    np.copyto(dst.mean, src.mean)
+    np.copyto(dst.var, src.var)
+    dst.count = src.count
+
+
+def sync_normalization_stats(env: VecEnv, eval_env: VecEnv) -> None:
+    """
+    Same as ``sync_envs_normalization``, but the ``VecNormalize`` statistics of
+    ``eval_env`` are overwritten in place instead of being replaced with deep copies
+    at every evaluation.
+
+    :param env: Training environment
+    :param eval_env: Environment wrapped the same way as ``env``
+    """
+    env_tmp, eval_env_tmp = env, eval_env
+    while isinstance(env_tmp, VecEnvWrapper):
+        if isinstance(env_tmp, VecNormalize):
+            if hasattr(env_tmp, "obs_rms"):
+                _copy_running_mean_std(env_tmp.obs_rms, eval_env_tmp.obs_rms)
+            _copy_running_mean_std(env_tmp.ret_rms, eval_env_tmp.ret_rms)
+        env_tmp = env_tmp.venv
+        eval_env_tmp = eval_env_tmp.venv
+
+
 class ParallelEnvFlattenExtractor(BaseFeaturesExtractor):
     """
     Feature extract that flatten the input.
@@ -259,21 +298,279 @@ def export_to_onnx(
         print(f"Model exported in {onnx_filename}")
 
 
+class OnnxableRecurrentPolicy(th.nn.Module):
+    """
+    Wrap the actor branch of a ``RecurrentActorCriticPolicy`` so that it can be
+    exported to ONNX with explicit hidden-state inputs and outputs.
+
+    The exported graph maps ``(observation, hidden_state, cell_state, episode_start)``
+    to ``(action, hidden_state, cell_state)``. Hidden states are reset where
+    ``episode_start`` is 1, and the deterministic action is post-processed
+    (unscaled or clipped) the same way as ``predict_and_return_tensor``.
+    """
+
+    def __init__(self, policy: BasePolicy):
+        super().__init__()
+        self.policy = policy
+        self.squash_output = policy.squash_output
+        self.is_box = isinstance(policy.action_space, gym.spaces.Box)
+        if self.is_box:
+            self.register_buffer(
+                "action_low", th.as_tensor(policy.action_space.low, dtype=th.float32)
+            )
+            self.register_buffer(
+                "action_high", th.as_tensor(policy.action_space.high, dtype=th.float32)
+            )
+
+    def forward(
+        self,
+        observation: th.Tensor,
+        hidden_state: th.Tensor,
+        cell_state: th.Tensor,
+        episode_start: th.Tensor,
+    ) -> Tuple[th.Tensor, th.Tensor, th.Tensor]:
+        lstm_states = reset_lstm_states(hidden_state, cell_state, episode_start)
+
+        features = BaseModel.extract_features(
+            self.policy, observation, self.policy.pi_features_extractor
+        )
+        # single step: (1, batch, features_dim)
+        latent_pi, (hidden_state, cell_state) = self.policy.lstm_actor(
+            features.unsqueeze(0), lstm_states
+        )
+        latent_pi = self.policy.mlp_extractor.forward_actor(latent_pi.squeeze(0))
+        actions = postprocess_actions(
+            self.policy.action_net(latent_pi),
+            self.action_low if self.is_box else None,
+            self.action_high if self.is_box else None,
+            self.squash_output,
+        )
+        return actions, hidden_state, cell_state
+
+
+def export_recurrent_to_onnx(
+    policy: BasePolicy,
+    onnx_filename: str,
+    opset_version: int = 17,
+    verbose: int = 0,
+) -> None:
+    """
+    Export the actor of a recurrent policy to ONNX with explicit LSTM states.
+
+    Inputs are ``observation`` (batch, obs_dim), ``hidden_state`` and ``cell_state``
+    (n_layers, batch, hidden_size) and ``episode_start`` (batch,). Outputs are
+    ``action``, ``hidden_state_out`` and ``cell_state_out``. All batch axes are dynamic.
+
+    :param policy: A ``RecurrentActorCriticPolicy``
+    :param onnx_filename: The name of the output onnx file
+    :param opset_version: ONNX opset version
+    :param verbose: The verbosity level
+    """
+    if not hasattr(policy, "lstm_actor"):
+        raise ValueError("policy must be a recurrent policy with an `lstm_actor`")
+
+    device = policy.device
+    model = OnnxableRecurrentPolicy(policy).to("cpu").eval()
+    # use a batch of 2 so that the batch dimension is not specialized during tracing
+    batch_size = 2
+    n_layers, _, hidden_size = policy.lstm_hidden_state_shape
+    observation = th.zeros(
+        batch_size, *policy.observation_space.shape, dtype=th.float32
+    )
+    hidden_state = th.zeros(n_layers, batch_size, hidden_size)
+    cell_state = th.zeros(n_layers, batch_size, hidden_size)
+    episode_start = th.zeros(batch_size)
+
+    with warnings.catch_warnings():
+        # the LSTM states as explicit inputs need the TorchScript exporter, which is
+        # deprecated and warns while tracing the LSTM; the traced graph is still
+        # valid for any batch size (checked by compare_recurrent_onnx)
+        warnings.filterwarnings(
+            "ignore",
+            message="You are using the legacy TorchScript-based ONNX export",
+            category=DeprecationWarning,
+        )
+        warnings.filterwarnings(
+            "ignore",
+            message="The feature will be removed",
+            category=DeprecationWarning,
+            module="torch.onnx",
+        )
+        warnings.filterwarnings(
+            "ignore",
+            message="Converting a tensor to a Python boolean",
+            category=th.jit.TracerWarning,
+        )
+        warnings.filterwarnings(
+            "ignore",
+            message="Exporting a model to ONNX with a batch_size other than 1",
+            category=UserWarning,
+        )
+        th.onnx.export(
+            model,
+            (observation, hidden_state, cell_state, episode_start),
+            f=onnx_filename,
+            export_params=True,
+            verbose=False,
+            opset_version=opset_version,
+            do_constant_folding=True,
+            input_names=["observation", "hidden_state", "cell_state", "episode_start"],
+            output_names=["action", "hidden_state_out", "cell_state_out"],
+            dynamic_axes={
+                "observation": {0: "batch_size"},
+                "hidden_state": {1: "batch_size"},
+                "cell_state": {1: "batch_size"},
+                "episode_start": {0: "batch_size"},
+                "action": {0: "batch_size"},
+                "hidden_state_out": {1: "batch_size"},
+                "cell_state_out": {1: "batch_size"},
+            },
+            dynamo=False,
+        )
+    policy.to(device)
+
+    if verbose > 0:
+        print(f"Recurrent model exported in {onnx_filename}")
+
+
+def compare_recurrent_onnx(
+    policy: BasePolicy,
+    onnx_filename: str,
+    n_steps: int = 200,
+    batch_size: int = 1,
+    reset_prob: float = 0.05,
+    atol: float = 1e-5,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Roll out a recurrent policy in PyTorch and in ONNX Runtime on CPU with the same
+    random observations and episode resets, and report action parity and per-step latency.
+
+    Requires ``onnxruntime``.
+
+    :param policy: The ``RecurrentActorCriticPolicy`` that was exported
+    :param onnx_filename: Path to the file written by ``export_recurrent_to_onnx``
+    :param n_steps: Number of control steps to roll out
+    :param batch_size: Number of parallel streams
+    :param reset_prob: Probability of an episode start at each step
+    :param atol: Absolute tolerance used for ``parity``
+    :param seed: Seed of the random observations
+    :return: Max absolute action/state differences, parity flag and latency statistics in ms
+    """
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise ImportError(
+            "onnxruntime is required to compare ONNX exports, "
+            "install it with `pip install onnxruntime`"
+        ) from e
+
+    session_options = ort.SessionOptions()
+    session_options.intra_op_num_threads = 1
+    session = ort.InferenceSession(
+        onnx_filename, session_options, providers=["CPUExecutionProvider"]
+    )
+
+    device = policy.device
+    model = OnnxableRecurrentPolicy(policy).to("cpu").eval()
+    generator = th.Generator().manual_seed(seed)
+    n_layers, _, hidden_size = policy.lstm_hidden_state_shape
+    th_states = (
+        th.zeros(n_layers, batch_size, hidden_size),
+        th.zeros(n_layers, batch_size, hidden_size),
+    )
+    ort_states = (th_states[0].numpy(), th_states[1].numpy())
+
+    max_action_diff, max_state_diff = 0.0, 0.0
+    th_latencies, ort_latencies = [], []
+    for step in range(n_steps):
+        observation = th.randn(
+            batch_size, *policy.observation_space.shape, generator=generator
+        )
+        if step == 0:
+            episode_start = th.ones(batch_size)
+        else:
+            episode_start = (
+                th.rand(batch_size, generator=generator) < reset_prob
+            ).float()
+
+        start = time.perf_counter()
+        with th.no_grad():
+            th_action, *th_states = model(observation, *th_states, episode_start)
+        th_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        ort_action, *ort_states = session.run(
+            None,
+            {
+                "observation": observation.numpy(),
+                "hidden_state": ort_states[0],
+                "cell_state": ort_states[1],
+                "episode_start": episode_start.numpy(),
+            },
+        )
+        ort_latencies.append(time.perf_counter() - start)
+
+        max_action_diff = max(
+            max_action_diff, float(np.abs(th_action.numpy() - ort_action).max())
+        )
+        max_state_diff = max(
+            max_state_diff,
+            float(np.abs(th_states[0].numpy() - ort_states[0]).max()),
+            float(np.abs(th_states[1].numpy() - ort_states[1]).max()),
+        )
+    policy.to(device)
+
+    th_latencies = np.array(th_latencies) * 1e3
+    ort_latencies = np.array(ort_latencies) * 1e3
+    return {
+        "max_action_diff": max_action_diff,
+        "max_state_diff": max_state_diff,
+        "parity": max_action_diff <= atol and max_state_diff <= atol,
+        "torch_p50_ms": float(np.percentile(th_latencies, 50)),
+        "torch_p99_ms": float(np.percentile(th_latencies, 99)),
+        "onnx_p50_ms": float(np.percentile(ort_latencies, 50)),
+        "onnx_p99_ms": float(np.percentile(ort_latencies, 99)),
+    }
+
+
 class OnnxCheckpointCallback(CheckpointCallback):
     """Overwrite CheckpointCallback to export the model to ONNX format.
 
+    Every artifact is serialized in memory on the training thread and written to
+    disk by an ``AsyncCheckpointer`` (atomic rename, last-K rotation per artifact).
+
     Args:
-        CheckpointCallback (_type_): _description_
+        async_save (bool): Do not wait for the writes to finish before resuming training
+        keep_last (Optional[int]): Number of checkpoints to keep, ``None`` keeps all
     """
 
+    def __init__(
+        self,
+        *args,
+        async_save: bool = False,
+        keep_last: Optional[int] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.async_save = async_save
+        self.checkpointer = AsyncCheckpointer(keep_last=keep_last)
+
     def _on_step(self) -> bool:
         if self.n_calls % self.save_freq == 0:
+            stall_time = 0.0
             model_path = self._checkpoint_path(extension="zip")
-            self.model.save(model_path)
+            stall_time += self.checkpointer.save_serialized(
+                model_path, self.model.save, key="model"
+            )
 
             # Export the model to ONNX
             onnx_filename = self._checkpoint_path(extension="onnx")
-            self.model.export_onnx_policy(path=onnx_filename)
+            stall_time += self.checkpointer.save_serialized(
+                onnx_filename,
+                lambda f: self.model.export_onnx_policy(path=f),
+                key="onnx",
+            )
             if self.verbose >= 2:
                 print(f"Saving model checkpoint to {model_path}")
 
@@ -283,10 +580,36 @@ class OnnxCheckpointCallback(CheckpointCallback):
                 and self.model.replay_buffer is not None
             ):
                 # If model has a replay buffer, save it too
-                replay_buffer_path = self._checkpoint_path(
-                    "replay_buffer_", extension="pkl"
-                )
-                self.model.save_replay_buffer(replay_buffer_path)  # type: ignore[attr-defined]
+                replay_buffer = self.model.replay_buffer  # type: ignore[attr-defined]
+                if hasattr(replay_buffer, "snapshot_chunks"):
+                    # incremental snapshot: only the chunks written since the last one
+                    replay_buffer_path = os.path.join(
+                        self.save_path, f"{self.name_prefix}_replay_buffer"
+                    )
+                    stall_start = time.perf_counter()
+                    meta, chunks = replay_buffer.snapshot_chunks(replay_buffer_path)
+
+                    def write_snapshot(path: str) -> None:
+                        # a failed write is rewritten by the next snapshot
+                        written = write_buffer_snapshot(path, meta, chunks)
+                        replay_buffer.commit_snapshot(path, written)
+
+                    stall_time += self.checkpointer.submit(
+                        replay_buffer_path,
+                        write_snapshot,
+                        key="replay_buffer",
+                        stall_start=stall_start,
+                        atomic=False,
+                    )
+                else:
+                    replay_buffer_path = self._checkpoint_path(
+                        "replay_buffer_", extension="pkl"
+                    )
+                    stall_time += self.checkpointer.save_serialized(
+                        replay_buffer_path,
+                        self.model.save_replay_buffer,  # type: ignore[attr-defined]
+                        key="replay_buffer",
+                    )
                 if self.verbose > 1:
                     print(
                         f"Saving model replay buffer checkpoint to {replay_buffer_path}"
@@ -300,8 +623,20 @@ class OnnxCheckpointCallback(CheckpointCallback):
                 vec_normalize_path = self._checkpoint_path(
                     "vecnormalize_", extension="pkl"
                 )
-                self.model.get_vec_normalize_env().save(vec_normalize_path)  # type: ignore[union-attr]
+                vec_normalize = self.model.get_vec_normalize_env()
+                stall_time += self.checkpointer.save_serialized(
+                    vec_normalize_path,
+                    lambda f: pickle.dump(vec_normalize, f),
+                    key="vecnormalize",
+                )
                 if self.verbose >= 2:
                     print(f"Saving model VecNormalize to {vec_normalize_path}")
 
+            if not self.async_save:
+                self.checkpointer.wait()
+            self.logger.record("checkpoint/stall_ms", stall_time * 1e3)
+
         return True
+
+    def _on_training_end(self) -> None:
+        self.checkpointer.close()
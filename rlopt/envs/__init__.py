@@ -1 +1,38 @@
-from .gymlike import make_mujoco_env
+from typing import TYPE_CHECKING
+
+from rlopt._lazy import lazy_getattr
+
+if TYPE_CHECKING:
+    from .gymlike import make_mujoco_env
+    from .mock_sim import MockBatchedSim
+    from .norm_stats import SharedRunningStats
+    from .pool import EnvPool
+    from .pool_env import EnvPoolEnv
+    from .pool_vec_env import SharedMemoryVecEnv
+    from .tensor_vec_env import TensorVecEnv
+    from .transforms import FusedObservationNorm
+
+__getattr__, __dir__ = lazy_getattr(
+    __name__,
+    {
+        "make_mujoco_env": ".gymlike",
+        "MockBatchedSim": ".mock_sim",
+        "SharedRunningStats": ".norm_stats",
+        "EnvPool": ".pool",
+        "EnvPoolEnv": ".pool_env",
+        "SharedMemoryVecEnv": ".pool_vec_env",
+        "TensorVecEnv": ".tensor_vec_env",
+        "FusedObservationNorm": ".transforms",
+    },
+)
+
+__all__ = [
+    "make_mujoco_env",
+    "MockBatchedSim",
+    "SharedRunningStats",
+    "EnvPool",
+    "EnvPoolEnv",
+    "SharedMemoryVecEnv",
+    "TensorVecEnv",
+    "FusedObservationNorm",
+]
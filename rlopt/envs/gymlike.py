@@ -1,10 +1,8 @@
 from __future__ import annotations
 
-import torch.nn
-import torch.optim
-import os
-import uuid
-from torch import multiprocessing
+from functools import partial
+
+import gymnasium as gym
 
 # try:
 #     multiprocessing.set_start_method("fork")
@@ -17,62 +15,52 @@ from torch import multiprocessing
 
 mp_context = "fork"
 
-import torch
-from torch import nn
-from torchrl.collectors import MultiaSyncDataCollector, SyncDataCollector
-from torchrl.data import LazyMemmapStorage, MultiStep, TensorDictReplayBuffer
-from torchrl.envs import (
-    EnvCreator,
-    ExplorationType,
-    ParallelEnv,
-    RewardScaling,
-    StepCounter,
-)
-from torchrl.envs.libs.gym import GymEnv
-from torchrl.envs.transforms import (
-    CatFrames,
-    Compose,
-    GrayScale,
-    ObservationNorm,
-    Resize,
-    ToTensorImage,
-    TransformedEnv,
-)
-from torchrl.modules import DuelingCnnDQNet, EGreedyModule, QValueActor
-
-from torchrl.objectives import DQNLoss, SoftUpdate
-from torchrl.record.loggers.csv import CSVLogger
-from torchrl.trainers import (
-    LogReward,
-    Recorder,
-    ReplayBufferTrainer,
-    Trainer,
-    UpdateWeights,
-)
-
-from tensordict.nn import AddStateIndependentNormalScale, TensorDictModule
 from torchrl.envs import (
     ClipTransform,
+    Compose,
     DoubleToFloat,
-    ExplorationType,
+    EnvBase,
+    EnvCreator,
+    ParallelEnv,
     RewardSum,
     StepCounter,
     TransformedEnv,
     VecNorm,
 )
 from torchrl.envs.libs.gym import GymEnv, GymWrapper
-from torchrl.envs import EnvBase
-from torchrl.envs.gym_like import default_info_dict_reader
-from torchrl.modules import MLP, ProbabilisticActor, TanhNormal, ValueOperator
-from torchrl.record import VideoRecorder
 
-from omegaconf import DictConfig
+from rlopt.envs.norm_stats import SharedRunningStats
+from rlopt.envs.pool_env import EnvPoolEnv
+from rlopt.envs.transforms import FusedObservationNorm
+
+
+def _fused_transform(
+    norm_stats: SharedRunningStats | None, sync_interval: int
+) -> FusedObservationNorm:
+    return FusedObservationNorm(
+        eps=1e-2, clip=10.0, shared_stats=norm_stats, sync_interval=sync_interval
+    )
 
 
 def make_mujoco_env(
-    env_name="HalfCheetah-v4", device="cpu", from_pixels: bool = False
+    env_name="HalfCheetah-v4",
+    device="cpu",
+    from_pixels: bool = False,
+    fused_transforms: bool = False,
+    norm_stats: SharedRunningStats | None = None,
+    norm_sync_interval: int = 1,
 ) -> EnvBase:
+    """
+    :param fused_transforms: Replace the normalization, clipping, reward sum, step
+        counter and dtype cast transforms with a single ``FusedObservationNorm``
+    :param norm_stats: With ``fused_transforms``, statistics shared with the
+        environments of other collectors or of evaluation
+    :param norm_sync_interval: Updates between two merges into ``norm_stats``
+    """
     env = GymEnv(env_name, device=device, from_pixels=from_pixels, pixels_only=False)
+    if fused_transforms:
+        return TransformedEnv(env, _fused_transform(norm_stats, norm_sync_interval))
+    assert norm_stats is None, "Shared statistics require fused_transforms=True"
     env = TransformedEnv(env)
     env.append_transform(VecNorm(in_keys=["observation"], decay=0.99999, eps=1e-2))
     env.append_transform(ClipTransform(in_keys=["observation"], low=-10, high=10))
@@ -117,10 +105,36 @@ def make_gym_env(
     from_pixels: bool = False,
     pixels_only=True,
     convert_actions_to_numpy=True,
+    shared_memory: bool = False,
+    envs_per_worker: int = 1,
+    cpu_affinity=None,
+    fused_transforms: bool = False,
+    norm_stats: SharedRunningStats | None = None,
+    norm_sync_interval: int = 1,
 ):
+    """
+    :param shared_memory: With ``parallel``, step the ``num_workers`` environments in
+        an ``EnvPoolEnv`` (``envs_per_worker`` environments per process, shared-memory
+        transport) instead of a ``ParallelEnv`` with one process per environment
+    :param envs_per_worker: Environments per process of the ``EnvPoolEnv``
+    :param cpu_affinity: CPU affinity of the ``EnvPoolEnv`` workers, see ``EnvPool``
+    :param fused_transforms: Replace the normalization, clipping, reward sum, step
+        counter and dtype cast transforms with a single ``FusedObservationNorm``
+    :param norm_stats: With ``fused_transforms``, statistics shared with the
+        environments of other collectors or of evaluation
+    :param norm_sync_interval: Updates between two merges into ``norm_stats``
+    """
     if obs_norm_sd is None:
         obs_norm_sd = {"standard_normal": True}
-    if parallel:
+    if parallel and shared_memory:
+        assert not from_pixels, "The shared-memory env pool only supports states"
+        base_env = EnvPoolEnv(
+            [partial(gym.make, env_name) for _ in range(num_workers)],
+            envs_per_worker=envs_per_worker,
+            cpu_affinity=cpu_affinity,
+            device=device,
+        )
+    elif parallel:
 
         def maker():
             return GymEnv(
@@ -147,6 +161,12 @@ def make_gym_env(
             convert_actions_to_numpy=convert_actions_to_numpy,
         )
 
+    if fused_transforms:
+        return TransformedEnv(
+            base_env, _fused_transform(norm_stats, norm_sync_interval)
+        )
+    assert norm_stats is None, "Shared statistics require fused_transforms=True"
+
     env = TransformedEnv(
         base_env,
         Compose(
@@ -0,0 +1,109 @@
+import time
+from typing import Dict, Optional, Tuple, Union
+
+import gymnasium as gym
+import numpy as np
+import torch
+
+
+class MockBatchedSim:
+    """
+    Stand-in for an IsaacLab ``ManagerBasedRLEnv``/``DirectRLEnv`` used by tests and
+    benchmarks: ``num_envs`` environments stepped as one batch of torch tensors, with
+    observation groups, automatic resets and randomized initial episode lengths.
+
+    The dynamics are linear, ``state <- decay * state + action @ B + noise``, every
+    observation group is a fixed projection of the state, the reward is the negative
+    mean squared state and an environment terminates when its state leaves
+    ``[-bound, bound]``. ``step_cost`` emulates the time a real simulator spends in
+    physics by busy-waiting at each step.
+
+    :param num_envs: Number of environments
+    :param group_dims: Dimension of each observation group
+    :param action_dim: Action dimension
+    :param max_episode_length: Episodes are truncated after this many steps
+    :param device: Device of the tensors
+    :param seed: Seed of the simulator generator
+    :param bound: Absolute value of the state at which an environment terminates
+    :param step_cost: Seconds spent busy-waiting at each step
+    """
+
+    def __init__(
+        self,
+        num_envs: int = 4096,
+        group_dims: Optional[Dict[str, int]] = None,
+        action_dim: int = 12,
+        max_episode_length: int = 1000,
+        device: Union[torch.device, str] = "cpu",
+        seed: int = 0,
+        bound: float = 10.0,
+        step_cost: float = 0.0,
+    ):
+        if group_dims is None:
+            group_dims = {"policy": 48, "student": 30}
+        self.num_envs = num_envs
+        self.device = torch.device(device)
+        self.render_mode = None
+        self.max_episode_length = max_episode_length
+        self.bound = bound
+        self.step_cost = step_cost
+        self.generator = torch.Generator(device=self.device).manual_seed(seed)
+        state_dim = max(group_dims.values())
+        self.decay = 0.99
+        self.action_matrix = self._randn(action_dim, state_dim) / action_dim**0.5
+        self.projections = {
+            name: self._randn(state_dim, dim) / state_dim**0.5
+            for name, dim in group_dims.items()
+        }
+        self.state = torch.zeros(num_envs, state_dim, device=self.device)
+        self.episode_length_buf = torch.zeros(
+            num_envs, dtype=torch.long, device=self.device
+        )
+
+        self.single_observation_space = gym.spaces.Dict(
+            {
+                name: gym.spaces.Box(-np.inf, np.inf, shape=(dim,), dtype=np.float32)
+                for name, dim in group_dims.items()
+            }
+        )
+        self.single_action_space = gym.spaces.Box(
+            -1.0, 1.0, shape=(action_dim,), dtype=np.float32
+        )
+
+    def _randn(self, *shape: int) -> torch.Tensor:
+        return torch.randn(*shape, generator=self.generator, device=self.device)
+
+    def _observations(self) -> Dict[str, torch.Tensor]:
+        return {name: self.state @ p for name, p in self.projections.items()}
+
+    def _reset_idx(self, env_ids: torch.Tensor) -> None:
+        self.state[env_ids] = 0.1 * self._randn(len(env_ids), self.state.shape[1])
+        self.episode_length_buf[env_ids] = 0
+
+    def reset(self) -> Tuple[Dict[str, torch.Tensor], dict]:
+        self._reset_idx(torch.arange(self.num_envs, device=self.device))
+        # like IsaacLab's random episode length init, so that resets are spread out
+        self.episode_length_buf.random_(
+            0, self.max_episode_length, generator=self.generator
+        )
+        return self._observations(), {}
+
+    def step(self, actions: torch.Tensor):
+        if self.step_cost > 0:
+            deadline = time.perf_counter() + self.step_cost
+            while time.perf_counter() < deadline:
+                pass
+        noise = 0.1 * self._randn(*self.state.shape)
+        self.state.mul_(self.decay).add_(actions @ self.action_matrix).add_(noise)
+        self.episode_length_buf += 1
+
+        reward = -self.state.pow(2).mean(-1)
+        terminated = self.state.abs().amax(-1) > self.bound
+        truncated = self.episode_length_buf >= self.max_episode_length
+        env_ids = (terminated | truncated).nonzero(as_tuple=False).squeeze(-1)
+        if len(env_ids) > 0:
+            self._reset_idx(env_ids)
+        return self._observations(), reward, terminated, truncated, {}
+
+    def close(self) -> None:
+        pass
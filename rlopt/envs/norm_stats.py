@@ -0,0 +1,88 @@
+"""
+Running observation statistics shared between processes.
+
+Each ``FusedObservationNorm`` accumulates the moments (count, mean, sum of squared
+deviations) of the observations it sees since its last synchronization and merges
+them into the ``SharedRunningStats`` master copy, which lives in shared memory, with
+the parallel Welford formula. Collectors in other processes therefore normalize with
+the same statistics. Evaluation environments only read snapshots of the master copy.
+"""
+
+import multiprocessing as mp
+from typing import Dict, Optional, Sequence, Tuple
+
+import torch
+
+Moments = Tuple[torch.Tensor, torch.Tensor, torch.Tensor]
+
+
+def merge_moments(a: Moments, b: Moments) -> Moments:
+    """
+    Merge two sets of (count, mean, m2) moments (Chan et al. parallel algorithm).
+
+    ``m2`` is the sum of squared deviations from the mean, the variance is
+    ``m2 / count``.
+    """
+    count_a, mean_a, m2_a = a
+    count_b, mean_b, m2_b = b
+    count = count_a + count_b
+    # no branch on the count, it may live on an accelerator
+    weight_b = count_b / count.clamp_min(1.0)
+    delta = mean_b - mean_a
+    mean = mean_a + delta * weight_b
+    m2 = m2_a + m2_b + delta.pow(2) * (count_a * weight_b)
+    return count, mean, m2
+
+
+class SharedRunningStats:
+    """
+    Master copy of running observation statistics in shared memory.
+
+    Create it in the main process and pass it to the environment factories of the
+    collectors (it is picklable when starting worker processes). Workers merge
+    their partial moments with ``push`` and evaluation environments read them with
+    ``snapshot``; both hold a process-shared lock for the few microseconds of the
+    copy, so readers never see half-written statistics.
+
+    :param shape: Shape of one observation
+    :param start_method: Multiprocessing context of the lock, must match the one of
+        the worker processes
+    """
+
+    def __init__(self, shape: Sequence[int], start_method: Optional[str] = None):
+        self.count = torch.zeros((), dtype=torch.float64).share_memory_()
+        self.mean = torch.zeros(tuple(shape), dtype=torch.float64).share_memory_()
+        self.m2 = torch.zeros(tuple(shape), dtype=torch.float64).share_memory_()
+        self.lock = mp.get_context(start_method).Lock()
+
+    @property
+    def shape(self) -> torch.Size:
+        return self.mean.shape
+
+    def push(self, moments: Moments) -> Moments:
+        """Merge partial moments into the master copy and return the merged copy."""
+        count, mean, m2 = (t.to("cpu", torch.float64) for t in moments)
+        with self.lock:
+            merged = merge_moments((self.count, self.mean, self.m2), (count, mean, m2))
+            self.count.copy_(merged[0])
+            self.mean.copy_(merged[1])
+            self.m2.copy_(merged[2])
+        return merged
+
+    def snapshot(self) -> Moments:
+        """Read-only copy of the master statistics."""
+        with self.lock:
+            return self.count.clone(), self.mean.clone(), self.m2.clone()
+
+    def load(self, moments: Moments) -> None:
+        """Overwrite the master statistics, e.g. when resuming from a checkpoint."""
+        with self.lock:
+            for dst, src in zip((self.count, self.mean, self.m2), moments):
+                dst.copy_(src)
+
+    def state_dict(self) -> Dict[str, torch.Tensor]:
+        count, mean, m2 = self.snapshot()
+        return {"count": count, "mean": mean, "m2": m2}
+
+    def load_state_dict(self, state_dict: Dict[str, torch.Tensor]) -> None:
+        self.load((state_dict["count"], state_dict["mean"], state_dict["m2"]))
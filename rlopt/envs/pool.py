@@ -0,0 +1,359 @@
+"""
+Pool of environment worker processes with shared-memory transport.
+
+Each worker process steps a contiguous block of ``envs_per_worker`` gymnasium
+environments. Actions, observations, rewards and termination flags live in slabs of
+shared memory (``torch`` tensors in shared memory, one row per environment): the
+learner writes the actions of all environments, wakes the workers up with a short
+message on their pipe, and reads the results in place once every worker has
+acknowledged the step. Only commands and, optionally, ``info`` dicts go through the
+pipes. ``Dict`` observation spaces (e.g. teacher/student observation groups) get one
+slab per key.
+
+``EnvPool`` is the backend of ``SharedMemoryVecEnv`` (stable-baselines3 ``VecEnv``) and
+``EnvPoolEnv`` (torchrl ``EnvBase``).
+"""
+
+import os
+import traceback
+import warnings
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import cloudpickle
+import gymnasium as gym
+import numpy as np
+import torch as th
+import torch.multiprocessing as mp
+
+EnvFn = Callable[[], gym.Env]
+
+
+def _numpy_to_torch_dtype(dtype) -> th.dtype:
+    return th.from_numpy(np.zeros(0, dtype=dtype)).dtype
+
+
+def _write_observation(
+    views: Dict[str, np.ndarray],
+    name: str,
+    i: int,
+    obs,
+    keys: Optional[List[str]],
+) -> None:
+    if keys is None:
+        views[name][i] = obs
+    else:
+        for key in keys:
+            views[f"{name}/{key}"][i] = obs[key]
+
+
+def _worker(
+    worker_index: int,
+    env_fns_bytes: bytes,
+    start: int,
+    slabs: Dict[str, th.Tensor],
+    observation_keys: Optional[List[str]],
+    pipe,
+    cpus: Optional[Sequence[int]],
+    auto_reset: bool,
+    return_infos: str,
+) -> None:
+    if cpus is not None:
+        os.sched_setaffinity(0, cpus)
+    # the environments are stepped sequentially, avoid oversubscribing the cores
+    th.set_num_threads(1)
+    envs: List[gym.Env] = [env_fn() for env_fn in cloudpickle.loads(env_fns_bytes)]
+    end = start + len(envs)
+    # numpy views of this worker's rows, written in place
+    views = {name: slab[start:end].numpy() for name, slab in slabs.items()}
+    actions = views["actions"]
+
+    while True:
+        try:
+            command, data = pipe.recv()
+            if command == "step":
+                infos = []
+                for i, env in enumerate(envs):
+                    obs, reward, terminated, truncated, info = env.step(actions[i])
+                    done = terminated or truncated
+                    if auto_reset and done:
+                        _write_observation(
+                            views, "final_observations", i, obs, observation_keys
+                        )
+                        obs, reset_info = env.reset()
+                        info = {**info, "reset_info": reset_info}
+                    _write_observation(views, "observations", i, obs, observation_keys)
+                    views["rewards"][i] = reward
+                    views["terminated"][i] = terminated
+                    views["truncated"][i] = truncated
+                    if return_infos == "all" or (return_infos == "done" and done):
+                        infos.append((start + i, info))
+                pipe.send(("ok", infos))
+            elif command == "reset":
+                seeds, options, mask = data
+                infos = []
+                for i, env in enumerate(envs):
+                    if mask is not None and not mask[start + i]:
+                        continue
+                    obs, info = env.reset(seed=seeds[start + i], options=options)
+                    _write_observation(views, "observations", i, obs, observation_keys)
+                    infos.append((start + i, info))
+                pipe.send(("ok", infos))
+            elif command == "apply":
+                fn, indices = cloudpickle.loads(data)
+                results = [
+                    (start + i, fn(env))
+                    for i, env in enumerate(envs)
+                    if start + i in indices
+                ]
+                pipe.send(("ok", results))
+            elif command == "close":
+                for env in envs:
+                    env.close()
+                pipe.send(("ok", None))
+                break
+            else:
+                raise NotImplementedError(f"Unknown command {command}")
+        except (KeyboardInterrupt, EOFError):
+            break
+        except Exception:
+            pipe.send(("error", f"worker {worker_index}: {traceback.format_exc()}"))
+
+
+class EnvPool:
+    """
+    Step ``len(env_fns)`` environments in worker processes, ``envs_per_worker`` per
+    process, with observations, rewards and flags exchanged through shared memory.
+
+    The slabs are tensors of ``slabs`` (``actions``, ``observations``, ``rewards``,
+    ``terminated``, ``truncated`` and ``final_observations``). With a ``Dict``
+    observation space, each key has its own ``observations/<key>`` and
+    ``final_observations/<key>`` slabs, see ``observations()``. Results are
+    overwritten by the next step: consumers that keep them must copy them.
+
+    :param env_fns: Functions creating the environments
+    :param envs_per_worker: Number of environments stepped by each worker
+    :param cpu_affinity: ``None`` (no pinning), ``"auto"`` (worker ``i`` is pinned to
+        core ``i`` modulo the number of cores) or one list of cores per worker
+    :param auto_reset: Reset finished environments at the end of ``step``, the last
+        observation of the episode is then written to ``final_observations``
+    :param return_infos: Which ``info`` dicts are sent back by ``step``: ``"all"``,
+        ``"done"`` (finished episodes only, e.g. the ``Monitor`` episode statistics)
+        or ``"none"``
+    :param start_method: Multiprocessing start method, defaults to ``"forkserver"``
+        when available and ``"spawn"`` otherwise
+    """
+
+    def __init__(
+        self,
+        env_fns: List[EnvFn],
+        envs_per_worker: int = 1,
+        cpu_affinity: Union[None, str, Sequence[Sequence[int]]] = None,
+        auto_reset: bool = True,
+        return_infos: str = "done",
+        start_method: Optional[str] = None,
+    ):
+        assert envs_per_worker > 0, "`envs_per_worker` must be positive"
+        assert return_infos in ("all", "done", "none")
+        self.num_envs = len(env_fns)
+        self.envs_per_worker = envs_per_worker
+        self.auto_reset = auto_reset
+
+        # spaces are read from a probe environment of the learner process
+        probe = env_fns[0]()
+        self.observation_space = probe.observation_space
+        self.action_space = probe.action_space
+        probe.close()
+
+        def slab(shape, dtype) -> th.Tensor:
+            return th.zeros(
+                (self.num_envs, *shape), dtype=_numpy_to_torch_dtype(dtype)
+            ).share_memory_()
+
+        if isinstance(self.observation_space, gym.spaces.Dict):
+            self.observation_keys: Optional[List[str]] = list(
+                self.observation_space.spaces
+            )
+            obs_spaces = {
+                f"/{key}": space for key, space in self.observation_space.spaces.items()
+            }
+        else:
+            self.observation_keys = None
+            obs_spaces = {"": self.observation_space}
+        for space in obs_spaces.values():
+            if space.shape is None:
+                raise ValueError(
+                    f"Unsupported observation space {self.observation_space}"
+                )
+
+        self.slabs = {
+            "actions": slab(self.action_space.shape, self.action_space.dtype),
+            "rewards": slab((), np.float32),
+            "terminated": slab((), np.bool_),
+            "truncated": slab((), np.bool_),
+        }
+        for name in ("observations", "final_observations"):
+            for suffix, space in obs_spaces.items():
+                self.slabs[name + suffix] = slab(space.shape, space.dtype)
+
+        if start_method is None:
+            forkserver = "forkserver" in mp.get_all_start_methods()
+            start_method = "forkserver" if forkserver else "spawn"
+        ctx = mp.get_context(start_method)
+
+        blocks = [
+            (start, env_fns[start : start + envs_per_worker])
+            for start in range(0, self.num_envs, envs_per_worker)
+        ]
+        self.num_workers = len(blocks)
+        if cpu_affinity == "auto":
+            n_cpus = os.cpu_count() or 1
+            cpu_affinity = [[i % n_cpus] for i in range(self.num_workers)]
+        elif cpu_affinity is not None:
+            assert len(cpu_affinity) == self.num_workers, (
+                f"`cpu_affinity` has {len(cpu_affinity)} entries "
+                f"for {self.num_workers} workers"
+            )
+
+        self.pipes = []
+        self.processes = []
+        for worker_index, (start, fns) in enumerate(blocks):
+            parent_pipe, child_pipe = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker,
+                args=(
+                    worker_index,
+                    cloudpickle.dumps(fns),
+                    start,
+                    self.slabs,
+                    self.observation_keys,
+                    child_pipe,
+                    None if cpu_affinity is None else list(cpu_affinity[worker_index]),
+                    auto_reset,
+                    return_infos,
+                ),
+                daemon=True,
+            )
+            process.start()
+            child_pipe.close()
+            self.pipes.append(parent_pipe)
+            self.processes.append(process)
+        self.waiting = False
+        self.closed = False
+
+    def observations(
+        self, final: bool = False
+    ) -> Union[th.Tensor, Dict[str, th.Tensor]]:
+        """
+        The ``observations`` slab, or ``final_observations`` when ``final``. With a
+        ``Dict`` observation space, a dict of the slabs of each key.
+        """
+        name = "final_observations" if final else "observations"
+        if self.observation_keys is None:
+            return self.slabs[name]
+        return {key: self.slabs[f"{name}/{key}"] for key in self.observation_keys}
+
+    def _gather(self) -> List[Any]:
+        results, errors = [], []
+        # read every reply before raising, otherwise later commands get stale replies
+        for pipe in self.pipes:
+            status, payload = pipe.recv()
+            if status == "error":
+                errors.append(payload)
+            else:
+                results.append(payload)
+        if errors:
+            raise RuntimeError("\n".join(errors))
+        return results
+
+    def _gather_indexed(self) -> Dict[int, Any]:
+        return {index: value for result in self._gather() for index, value in result}
+
+    def reset(
+        self,
+        seed: Union[None, int, Sequence[Optional[int]]] = None,
+        options: Optional[dict] = None,
+        mask: Optional[Union[np.ndarray, th.Tensor]] = None,
+    ) -> Dict[int, dict]:
+        """
+        Reset the environments, or those where ``mask`` is true. The observations are
+        written to ``observations``.
+
+        :param seed: Seed of the first environment (environment ``i`` gets
+            ``seed + i``), or one seed per environment
+        :param options: Reset options passed to every environment
+        :param mask: Boolean array of shape (num_envs,) selecting environments
+        :return: Reset ``info`` of each reset environment
+        """
+        if seed is None or isinstance(seed, int):
+            seeds = [None if seed is None else seed + i for i in range(self.num_envs)]
+        else:
+            seeds = list(seed)
+        if mask is not None:
+            mask = np.asarray(mask, dtype=bool).reshape(self.num_envs)
+        for pipe in self.pipes:
+            pipe.send(("reset", (seeds, options, mask)))
+        return self._gather_indexed()
+
+    def step_async(self, actions: Union[np.ndarray, th.Tensor]) -> None:
+        self.slabs["actions"].copy_(
+            th.as_tensor(actions).reshape(self.slabs["actions"].shape)
+        )
+        for pipe in self.pipes:
+            pipe.send(("step", None))
+        self.waiting = True
+
+    def step_wait(self) -> Dict[int, dict]:
+        """
+        Wait for the step started by ``step_async``. The results are in the
+        ``observations``, ``rewards``, ``terminated``, ``truncated`` (and
+        ``final_observations``) slabs.
+
+        :return: ``info`` dicts selected by ``return_infos``, by environment index
+        """
+        self.waiting = False
+        return self._gather_indexed()
+
+    def step(self, actions: Union[np.ndarray, th.Tensor]) -> Dict[int, dict]:
+        self.step_async(actions)
+        return self.step_wait()
+
+    def apply(
+        self, fn: Callable[[gym.Env], Any], indices: Optional[Sequence[int]] = None
+    ) -> List[Any]:
+        """
+        Call ``fn(env)`` in the workers.
+
+        :param fn: Function of an environment, pickled with cloudpickle
+        :param indices: Environments to call it on, all of them by default
+        :return: Results in the order of ``indices``
+        """
+        indices = list(range(self.num_envs)) if indices is None else list(indices)
+        payload = cloudpickle.dumps((fn, set(indices)))
+        for pipe in self.pipes:
+            pipe.send(("apply", payload))
+        results = self._gather_indexed()
+        return [results[i] for i in indices]
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self.waiting:
+            self._gather()
+        for pipe in self.pipes:
+            pipe.send(("close", None))
+        self._gather()
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def __del__(self):
+        if not self.__dict__.get("closed", True):
+            try:
+                self.close()
+            except (OSError, EOFError, RuntimeError) as e:
+                # e.g. workers already gone at interpreter shutdown
+                warnings.warn(
+                    f"Could not close the environment pool: {e}",
+                    ResourceWarning,
+                    stacklevel=2,
+                )
@@ -0,0 +1,141 @@
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import gymnasium as gym
+import numpy as np
+import torch
+from tensordict import TensorDict, TensorDictBase
+from torchrl.data import Bounded, Categorical, Composite, Unbounded
+from torchrl.envs import EnvBase
+
+from rlopt.envs.pool import EnvPool, _numpy_to_torch_dtype
+
+
+def _space_to_spec(space: gym.Space, num_envs: int, device):
+    dtype = _numpy_to_torch_dtype(space.dtype)
+    if isinstance(space, gym.spaces.Discrete):
+        return Categorical(space.n, shape=(num_envs,), dtype=dtype, device=device)
+    shape = (num_envs, *space.shape)
+    if np.all(np.isfinite(space.low)) and np.all(np.isfinite(space.high)):
+        return Bounded(
+            torch.as_tensor(space.low, dtype=dtype).expand(shape),
+            torch.as_tensor(space.high, dtype=dtype).expand(shape),
+            shape=shape,
+            dtype=dtype,
+            device=device,
+        )
+    return Unbounded(shape=shape, dtype=dtype, device=device)
+
+
+class EnvPoolEnv(EnvBase):
+    """
+    torchrl batched environment backed by an ``EnvPool``, a drop-in replacement for a
+    ``ParallelEnv`` of gymnasium environments with ``envs_per_worker`` environments per
+    process and shared-memory transport.
+
+    Partial resets (``"_reset"`` masks) are forwarded to the workers, so the pool does
+    not reset environments on its own. With a ``Dict`` observation space, each key is
+    an entry of the observation spec instead of ``"observation"``.
+
+    :param env_fns: Functions creating the environments
+    :param envs_per_worker: Number of environments stepped by each worker process
+    :param cpu_affinity: See ``EnvPool``
+    :param device: Device of the output tensordicts
+    :param start_method: Multiprocessing start method
+    """
+
+    def __init__(
+        self,
+        env_fns: List[Callable[[], gym.Env]],
+        envs_per_worker: int = 1,
+        cpu_affinity: Union[None, str, Sequence[Sequence[int]]] = None,
+        device: Union[torch.device, str] = "cpu",
+        start_method: Optional[str] = None,
+    ):
+        self.pool = EnvPool(
+            env_fns,
+            envs_per_worker=envs_per_worker,
+            cpu_affinity=cpu_affinity,
+            auto_reset=False,
+            return_infos="none",
+            start_method=start_method,
+        )
+        num_envs = self.pool.num_envs
+        super().__init__(device=device, batch_size=torch.Size([num_envs]))
+        self._seed: Optional[int] = None
+
+        observation_space = self.pool.observation_space
+        if isinstance(observation_space, gym.spaces.Dict):
+            # one entry per key, like torchrl's GymEnv
+            observation_spaces = dict(observation_space.spaces)
+        else:
+            observation_spaces = {"observation": observation_space}
+        self.observation_spec = Composite(
+            {
+                key: _space_to_spec(space, num_envs, self.device)
+                for key, space in observation_spaces.items()
+            },
+            shape=(num_envs,),
+        )
+        self.action_spec = _space_to_spec(self.pool.action_space, num_envs, self.device)
+        self.reward_spec = Unbounded(shape=(num_envs, 1), device=self.device)
+        done = Categorical(2, shape=(num_envs, 1), dtype=torch.bool, device=self.device)
+        self.full_done_spec = Composite(
+            done=done.clone(),
+            terminated=done.clone(),
+            truncated=done.clone(),
+            shape=(num_envs,),
+        )
+
+    def _observation(self) -> Dict[str, torch.Tensor]:
+        # the slabs are overwritten by the next step, hand out copies
+        observations = self.pool.observations()
+        if not isinstance(observations, dict):
+            observations = {"observation": observations}
+        return {
+            key: value.to(self.device, copy=True) for key, value in observations.items()
+        }
+
+    def _reset(self, tensordict: Optional[TensorDictBase] = None, **kwargs):
+        mask = None
+        if tensordict is not None and "_reset" in tensordict.keys():
+            mask = tensordict.get("_reset").reshape(self.batch_size).cpu().numpy()
+        self.pool.reset(seed=self._seed, mask=mask)
+        # seeds are only used for the first reset
+        self._seed = None
+        done = torch.zeros((*self.batch_size, 1), dtype=torch.bool, device=self.device)
+        return TensorDict(
+            {
+                **self._observation(),
+                "done": done,
+                "terminated": done.clone(),
+                "truncated": done.clone(),
+            },
+            self.batch_size,
+            device=self.device,
+        )
+
+    def _step(self, tensordict: TensorDictBase) -> TensorDictBase:
+        self.pool.step(tensordict.get("action").cpu())
+        slabs = self.pool.slabs
+        terminated = slabs["terminated"].unsqueeze(-1).to(self.device, copy=True)
+        truncated = slabs["truncated"].unsqueeze(-1).to(self.device, copy=True)
+        return TensorDict(
+            {
+                **self._observation(),
+                "reward": slabs["rewards"].unsqueeze(-1).to(self.device, copy=True),
+                "done": terminated | truncated,
+                "terminated": terminated,
+                "truncated": truncated,
+            },
+            self.batch_size,
+            device=self.device,
+        )
+
+    def _set_seed(self, seed: Optional[int]) -> Optional[int]:
+        # environment i is seeded with seed + i at the next reset
+        self._seed = seed
+        return seed
+
+    def close(self, **kwargs) -> None:
+        self.pool.close()
+        super().close(**kwargs)
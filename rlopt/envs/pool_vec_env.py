@@ -0,0 +1,139 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Type, Union
+
+import gymnasium as gym
+import numpy as np
+import torch as th
+from stable_baselines3.common.env_util import is_wrapped
+from stable_baselines3.common.vec_env.base_vec_env import (
+    VecEnv,
+    VecEnvIndices,
+    VecEnvObs,
+    VecEnvStepReturn,
+)
+
+from rlopt.envs.pool import EnvPool
+
+
+def _copy_observations(
+    observations: Union[th.Tensor, Dict[str, th.Tensor]], index: Any = slice(None)
+) -> Union[np.ndarray, Dict[str, np.ndarray]]:
+    # copies, the slabs are overwritten by the next step
+    if isinstance(observations, dict):
+        return {key: value[index].numpy().copy() for key, value in observations.items()}
+    return observations[index].numpy().copy()
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    stable-baselines3 ``VecEnv`` backed by an ``EnvPool``: like ``SubprocVecEnv``, but
+    each process steps ``envs_per_worker`` environments and observations, rewards and
+    dones are read from shared memory instead of being pickled through pipes.
+
+    Finished environments are reset automatically, with the last observation in the
+    ``terminal_observation`` info. Only the infos of finished episodes are transferred
+    (``return_infos="done"``), which is what ``Monitor`` episode statistics need;
+    pass ``return_infos="all"`` for the infos of every step.
+
+    :param env_fns: Functions creating the environments
+    :param envs_per_worker: Number of environments stepped by each worker process
+    :param cpu_affinity: See ``EnvPool``
+    :param return_infos: See ``EnvPool``
+    :param start_method: Multiprocessing start method
+    """
+
+    def __init__(
+        self,
+        env_fns: List[Callable[[], gym.Env]],
+        envs_per_worker: int = 1,
+        cpu_affinity: Union[None, str, Sequence[Sequence[int]]] = None,
+        return_infos: str = "done",
+        start_method: Optional[str] = None,
+    ):
+        self.pool = EnvPool(
+            env_fns,
+            envs_per_worker=envs_per_worker,
+            cpu_affinity=cpu_affinity,
+            auto_reset=True,
+            return_infos=return_infos,
+            start_method=start_method,
+        )
+        super().__init__(
+            len(env_fns), self.pool.observation_space, self.pool.action_space
+        )
+
+    def reset(self) -> VecEnvObs:
+        infos = {}
+        # environments sharing the same options are reset together
+        for options in {repr(o): o for o in self._options}.values():
+            mask = np.array([o == options for o in self._options])
+            infos.update(self.pool.reset(self._seeds, options, mask))
+        self.reset_infos = [infos.get(i, {}) for i in range(self.num_envs)]
+        # seeds and options are only used once
+        self._reset_seeds()
+        self._reset_options()
+        return _copy_observations(self.pool.observations())
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self.pool.step_async(actions)
+
+    def step_wait(self) -> VecEnvStepReturn:
+        step_infos = self.pool.step_wait()
+        slabs = self.pool.slabs
+        terminated = slabs["terminated"].numpy()
+        truncated = slabs["truncated"].numpy()
+        dones = terminated | truncated
+
+        infos: List[dict] = [step_infos.get(i, {}) for i in range(self.num_envs)]
+        for i in np.flatnonzero(dones):
+            infos[i] = dict(infos[i])
+            infos[i]["terminal_observation"] = _copy_observations(
+                self.pool.observations(final=True), i
+            )
+            infos[i]["TimeLimit.truncated"] = bool(truncated[i] and not terminated[i])
+            self.reset_infos[i] = infos[i].pop("reset_info", {})
+        # copies, the slabs are overwritten by the next step
+        return (
+            _copy_observations(self.pool.observations()),
+            slabs["rewards"].numpy().copy(),
+            dones,
+            infos,
+        )
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
+        return self.pool.apply(
+            lambda env: env.get_wrapper_attr(attr_name), self._get_indices(indices)
+        )
+
+    def set_attr(
+        self, attr_name: str, value: Any, indices: VecEnvIndices = None
+    ) -> None:
+        self.pool.apply(
+            lambda env: setattr(env, attr_name, value), self._get_indices(indices)
+        )
+
+    def env_method(
+        self,
+        method_name: str,
+        *method_args,
+        indices: VecEnvIndices = None,
+        **method_kwargs,
+    ) -> List[Any]:
+        return self.pool.apply(
+            lambda env: env.get_wrapper_attr(method_name)(
+                *method_args, **method_kwargs
+            ),
+            self._get_indices(indices),
+        )
+
+    def env_is_wrapped(
+        self, wrapper_class: Type[gym.Wrapper], indices: VecEnvIndices = None
+    ) -> List[bool]:
+        return self.pool.apply(
+            lambda env: is_wrapped(env, wrapper_class), self._get_indices(indices)
+        )
+
+    def get_images(self) -> Sequence[Optional[np.ndarray]]:
+        return self.pool.apply(lambda env: env.render())
@@ -0,0 +1,144 @@
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Type
+
+import gymnasium as gym
+import numpy as np
+import torch
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv, VecEnvIndices
+
+
+class TensorVecEnv(VecEnv):
+    """
+    stable-baselines3 ``VecEnv`` adapter for batched simulators (IsaacLab
+    ``ManagerBasedRLEnv``/``DirectRLEnv`` or ``MockBatchedSim``) that keeps
+    everything as tensors on the simulator device, for the teacher-student agents.
+
+    ``step`` returns ``(observations, rewards, dones, infos)`` where
+
+    - ``observations`` maps each group (e.g. ``"teacher"``/``"student"``) to a view
+      into one preallocated ``(num_envs, sum of group dims)`` buffer,
+    - ``rewards`` is a float tensor and ``dones`` a long tensor of shape
+      ``(num_envs,)``,
+    - ``infos`` is the simulator ``extras`` dict with ``time_outs`` (truncations,
+      used for bootstrapping) added.
+
+    The buffer is double-buffered: the observations returned by a step stay valid
+    until the step after the next one, which is what rollout collection needs
+    (``_last_obs`` is added to the rollout buffer after the next step). Copy them to
+    keep them longer.
+
+    The simulator is expected to reset finished environments on its own. Its
+    attributes and methods are shared by all environments: ``get_attr`` returns the
+    same value for every index, while ``set_attr`` and ``env_method`` only accept
+    all the environments.
+
+    :param sim: Batched simulator with ``num_envs``, ``device``, ``render_mode``,
+        ``single_observation_space`` (a ``Dict`` of observation groups),
+        ``single_action_space``, ``reset() -> (obs, extras)`` and
+        ``step(actions) -> (obs, rewards, terminated, truncated, extras)``
+    :param groups: Maps the returned group names to the simulator group names,
+        defaults to the simulator groups
+    :param clip_actions: When set, actions are clipped to ``[-clip_actions,
+        clip_actions]`` before being sent to the simulator
+    """
+
+    def __init__(
+        self,
+        sim: Any,
+        groups: Optional[Mapping[str, str]] = None,
+        clip_actions: Optional[float] = None,
+    ):
+        self.sim = sim
+        self.device = torch.device(sim.device)
+        sim_space = sim.single_observation_space
+        if groups is None:
+            groups = {name: name for name in sim_space.spaces}
+        self.groups = dict(groups)
+        self.clip_actions = clip_actions
+
+        shapes = {name: sim_space[group].shape for name, group in self.groups.items()}
+        for name, shape in shapes.items():
+            assert len(shape) == 1, f"Group '{name}' is not flat: {shape}"
+        sizes = [shape[0] for shape in shapes.values()]
+        num_envs = sim.num_envs
+        self.buffer = torch.zeros(2, num_envs, sum(sizes), device=self.device)
+        # one dict of views per half of the double buffer
+        self._views = [
+            dict(zip(self.groups, half.split(sizes, dim=-1))) for half in self.buffer
+        ]
+        self._current = 0
+
+        observation_space = spaces.Dict(
+            {
+                name: spaces.Box(-np.inf, np.inf, shape=shape, dtype=np.float32)
+                for name, shape in shapes.items()
+            }
+        )
+        super().__init__(num_envs, observation_space, sim.single_action_space)
+        self._actions: Optional[torch.Tensor] = None
+
+    def _write_observations(self, obs: Dict[str, torch.Tensor]):
+        self._current = 1 - self._current
+        views = self._views[self._current]
+        for name, group in self.groups.items():
+            views[name].copy_(obs[group])
+        return views
+
+    def reset(self) -> Dict[str, torch.Tensor]:
+        obs, _ = self.sim.reset()
+        return self._write_observations(obs)
+
+    def step_async(self, actions: torch.Tensor) -> None:
+        actions = torch.as_tensor(actions, device=self.device)
+        if self.clip_actions is not None:
+            actions = actions.clamp(-self.clip_actions, self.clip_actions)
+        self._actions = actions
+
+    def step_wait(self):
+        obs, rewards, terminated, truncated, extras = self.sim.step(self._actions)
+        infos = dict(extras)
+        infos["time_outs"] = truncated
+        dones = (terminated | truncated).long()
+        return self._write_observations(obs), rewards, dones, infos
+
+    def close(self) -> None:
+        self.sim.close()
+
+    def seed(self, seed: Optional[int] = None) -> Sequence[None]:
+        # the simulator is seeded at construction
+        return [None]
+
+    def _check_all_indices(self, indices: VecEnvIndices) -> List[int]:
+        # the simulator attributes and methods are shared by all environments
+        indices = list(self._get_indices(indices))
+        if sorted(indices) != list(range(self.num_envs)):
+            raise ValueError(
+                "The batched simulator cannot be modified for a subset of its "
+                f"environments, got indices {indices}"
+            )
+        return indices
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
+        return [getattr(self.sim, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(
+        self, attr_name: str, value: Any, indices: VecEnvIndices = None
+    ) -> None:
+        self._check_all_indices(indices)
+        setattr(self.sim, attr_name, value)
+
+    def env_method(
+        self,
+        method_name: str,
+        *method_args,
+        indices: VecEnvIndices = None,
+        **method_kwargs,
+    ) -> List[Any]:
+        indices = self._check_all_indices(indices)
+        result = getattr(self.sim, method_name)(*method_args, **method_kwargs)
+        return [result] * len(indices)
+
+    def env_is_wrapped(
+        self, wrapper_class: Type[gym.Wrapper], indices: VecEnvIndices = None
+    ) -> List[bool]:
+        return [False] * len(self._get_indices(indices))
@@ -0,0 +1,253 @@
+from typing import Dict, Optional
+
+import torch
+from tensordict import TensorDictBase
+from torchrl.data import Bounded, Composite, Unbounded
+from torchrl.envs.transforms import Transform
+
+from rlopt.envs.norm_stats import SharedRunningStats, merge_moments
+
+
+class FusedObservationNorm(Transform):
+    """
+    Single transform replacing the ``DoubleToFloat``, ``VecNorm``, ``ClipTransform``,
+    ``RewardSum`` and ``StepCounter`` chain of ``make_mujoco_env`` / ``make_gym_env``.
+
+    At each step the observation is cast to float32, the running statistics are
+    updated with the whole batch (Welford/Chan merge of the batch mean and variance),
+    and the observation is normalized and clipped in place. The episode reward and
+    step count are accumulated in the same call. With ``freeze()`` the statistics stop
+    being updated, and ``export_stats`` / ``load_stats`` move them to deployment.
+    Called outside of an environment (e.g. on replayed data), the transform normalizes
+    a copy of the observation and leaves the statistics unchanged, ``update_stats``
+    folds a batch into them explicitly.
+
+    Unlike ``VecNorm`` (exponentially decayed statistics), the statistics are the
+    exact mean and variance of every observation seen so far.
+
+    :param in_key: Observation key
+    :param reward_key: Reward key, summed into ``episode_reward``
+    :param eps: Minimum standard deviation
+    :param clip: Normalized observations are clipped to [-clip, clip]
+    :param max_steps: When set, episodes are truncated after ``max_steps`` steps
+    :param shared_stats: Master statistics shared with the transforms of other
+        processes. Every ``sync_interval`` updates the moments accumulated since the
+        last synchronization are merged into it and the merged statistics are used
+        from then on. A frozen transform reads a snapshot at each reset instead,
+        e.g. for an evaluation environment.
+    :param sync_interval: Number of updates between synchronizations
+    """
+
+    def __init__(
+        self,
+        in_key: str = "observation",
+        reward_key: str = "reward",
+        eps: float = 1e-2,
+        clip: float = 10.0,
+        max_steps: Optional[int] = None,
+        shared_stats: Optional[SharedRunningStats] = None,
+        sync_interval: int = 1,
+    ):
+        super().__init__(in_keys=[in_key], out_keys=[in_key])
+        self.reward_key = reward_key
+        self.eps = eps
+        self.clip = clip
+        self.max_steps = max_steps
+        self.frozen = False
+        # float64 statistics, lazily shaped from the first observation
+        self.register_buffer("count", torch.zeros((), dtype=torch.float64))
+        self.register_buffer("mean", torch.zeros(0, dtype=torch.float64))
+        self.register_buffer("m2", torch.zeros(0, dtype=torch.float64))
+        # float32 loc/scale used for normalization, refreshed after each update
+        self.register_buffer("loc", torch.zeros(0))
+        self.register_buffer("scale", torch.ones(0))
+        self.shared_stats = shared_stats
+        self.sync_interval = sync_interval
+        self._n_updates = 0
+        if shared_stats is not None:
+            self._set_moments(shared_stats.snapshot())
+            self._partial = self._zero_moments()
+
+    def freeze(self) -> "FusedObservationNorm":
+        self.frozen = True
+        return self
+
+    def unfreeze(self) -> "FusedObservationNorm":
+        self.frozen = False
+        return self
+
+    def export_stats(self) -> Dict[str, torch.Tensor]:
+        """Normalization statistics, e.g. to be saved next to a deployed policy."""
+        self.sync()
+        return {
+            "count": self.count.clone(),
+            "mean": self.mean.clone(),
+            "var": self.m2 / self.count.clamp_min(1.0),
+            "eps": torch.tensor(self.eps),
+            "clip": torch.tensor(self.clip),
+        }
+
+    def load_stats(self, stats: Dict[str, torch.Tensor]) -> None:
+        count = stats["count"].to(torch.float64)
+        mean = stats["mean"].to(torch.float64)
+        self.eps = float(stats["eps"])
+        self.clip = float(stats["clip"])
+        moments = (count, mean, stats["var"].to(torch.float64) * count.clamp_min(1.0))
+        if self.shared_stats is not None:
+            self.shared_stats.load(moments)
+            self._partial = self._zero_moments()
+        self._set_moments(moments)
+
+    def update_stats(self, tensordict: TensorDictBase) -> None:
+        """Update the statistics with the observations of ``tensordict``, unless frozen."""
+        if not self.frozen:
+            self._update(tensordict.get(self.in_keys[0]).to(torch.float32))
+
+    def sync(self) -> None:
+        """Exchange statistics with ``shared_stats``, if any."""
+        if self.shared_stats is None:
+            return
+        if self.frozen:
+            self._set_moments(self.shared_stats.snapshot())
+        elif self._partial[0] > 0:
+            self._set_moments(self.shared_stats.push(self._partial))
+            self._partial = self._zero_moments()
+
+    def _zero_moments(self):
+        return (
+            torch.zeros((), dtype=torch.float64, device=self.mean.device),
+            torch.zeros_like(self.mean),
+            torch.zeros_like(self.m2),
+        )
+
+    def _set_moments(self, moments) -> None:
+        device = self.count.device
+        self.count, self.mean, self.m2 = (t.to(device, torch.float64) for t in moments)
+        self._refresh()
+
+    def _refresh(self) -> None:
+        var = self.m2 / self.count.clamp_min(1.0)
+        self.loc = self.mean.float()
+        self.scale = var.sqrt().clamp_min(self.eps).float()
+
+    def _update(self, obs: torch.Tensor, mask: Optional[torch.Tensor] = None) -> None:
+        if self.mean.numel() == 0:
+            # first call: the observation is the last dimension
+            self.mean = torch.zeros(
+                obs.shape[-1:], dtype=torch.float64, device=obs.device
+            )
+            self.m2 = torch.zeros_like(self.mean)
+            self.count = self.count.to(obs.device)
+        event_shape = self.mean.shape
+        batch = obs.reshape(-1, *event_shape)
+        if mask is not None:
+            batch = batch[mask.reshape(-1)]
+        n = batch.shape[0]
+        if n == 0:
+            return
+        batch_var, batch_mean = torch.var_mean(
+            batch.to(torch.float64), dim=0, correction=0
+        )
+        moments = (
+            torch.tensor(float(n), dtype=torch.float64),
+            batch_mean,
+            batch_var * n,
+        )
+        self.count, self.mean, self.m2 = merge_moments(
+            (self.count, self.mean, self.m2), moments
+        )
+        self._refresh()
+        if self.shared_stats is not None:
+            self._partial = merge_moments(self._partial, moments)
+            self._n_updates += 1
+            if self._n_updates % self.sync_interval == 0:
+                self.sync()
+
+    def _normalize(self, obs: torch.Tensor, mask=None, update=True) -> torch.Tensor:
+        # a new float32 tensor when casting, otherwise modified in place
+        obs = obs.to(torch.float32)
+        if update and not self.frozen:
+            self._update(obs, mask)
+        return obs.sub_(self.loc).div_(self.scale).clamp_(-self.clip, self.clip)
+
+    def _batch_mask(self, tensordict: Optional[TensorDictBase], like: torch.Tensor):
+        reset = None if tensordict is None else tensordict.get("_reset", None)
+        if reset is None:
+            return torch.ones_like(like, dtype=torch.bool)
+        return reset.reshape(like.shape)
+
+    def _step(
+        self, tensordict: TensorDictBase, next_tensordict: TensorDictBase
+    ) -> TensorDictBase:
+        in_key = self.in_keys[0]
+        next_tensordict.set(in_key, self._normalize(next_tensordict.get(in_key)))
+
+        reward = next_tensordict.get(self.reward_key)
+        next_tensordict.set("episode_reward", tensordict.get("episode_reward") + reward)
+        step_count = tensordict.get("step_count") + 1
+        next_tensordict.set("step_count", step_count)
+        if self.max_steps is not None and "truncated" in next_tensordict.keys():
+            truncated = next_tensordict.get("truncated") | (
+                step_count >= self.max_steps
+            )
+            next_tensordict.set("truncated", truncated)
+            next_tensordict.set("done", next_tensordict.get("done") | truncated)
+        return next_tensordict
+
+    def _reset(
+        self, tensordict: TensorDictBase, tensordict_reset: TensorDictBase
+    ) -> TensorDictBase:
+        in_key = self.in_keys[0]
+        if self.frozen:
+            self.sync()
+        done = tensordict_reset.get("done")
+        reset = self._batch_mask(tensordict, done)
+        # only the observations of the reset environments are new
+        tensordict_reset.set(
+            in_key, self._normalize(tensordict_reset.get(in_key), reset[..., 0])
+        )
+
+        for key, dtype in (
+            ("episode_reward", torch.float32),
+            ("step_count", torch.int64),
+        ):
+            value = None if tensordict is None else tensordict.get(key, None)
+            if value is None:
+                value = torch.zeros(done.shape, dtype=dtype, device=done.device)
+            else:
+                value = torch.where(reset, torch.zeros_like(value), value)
+            tensordict_reset.set(key, value)
+        return tensordict_reset
+
+    def _call(self, next_tensordict: TensorDictBase) -> TensorDictBase:
+        # only used outside of an environment (e.g. on replayed data): the observation
+        # may be stored elsewhere, so it is copied and the statistics are not updated
+        in_key = self.in_keys[0]
+        obs = next_tensordict.get(in_key).to(torch.float32, copy=True)
+        next_tensordict.set(in_key, self._normalize(obs, update=False))
+        return next_tensordict
+
+    forward = _call
+
+    def transform_observation_spec(self, observation_spec: Composite) -> Composite:
+        in_key = self.in_keys[0]
+        spec = observation_spec[in_key]
+        observation_spec[in_key] = Unbounded(
+            shape=spec.shape, dtype=torch.float32, device=spec.device
+        )
+        batch_shape = self.parent.batch_size
+        observation_spec["episode_reward"] = Unbounded(
+            shape=(*batch_shape, 1), device=spec.device
+        )
+        observation_spec["step_count"] = Bounded(
+            0,
+            (
+                self.max_steps
+                if self.max_steps is not None
+                else torch.iinfo(torch.int64).max
+            ),
+            shape=(*batch_shape, 1),
+            dtype=torch.int64,
+            device=spec.device,
+        )
+        return observation_spec
@@ -1,8 +1,22 @@
+import math
+
 import torch
+from torch.func import vmap
+
 from .gd import Optimizer
 
 
 class AutoConditionedFastGradidentDescent(Optimizer):
+    _state_names = Optimizer._state_names + (
+        "_z",
+        "_y",
+        "L_t",
+        "eta_t",
+        "tau_t",
+        "tau_prev_t",
+        "_detected_nonconvex",
+    )
+
     def __init__(
         self,
         oracle,
@@ -12,20 +26,35 @@ class AutoConditionedFastGradidentDescent(Optimizer):
         n_iter: int = 100,
         tol: float = 1e-10,
         stop_nonconvex=False,
+        line_search: str = "sequential",
+        n_candidates: int = 8,
         **kwargs
     ):
+        """
+        :param line_search: "sequential" doubles/halves the first step size one oracle
+            call at a time, "speculative" first evaluates a grid of ``n_candidates``
+            step sizes in one stacked oracle call (see ``speculative_line_search_eta``)
+        :param n_candidates: Number of step sizes of the speculative grid
+        """
         super().__init__(oracle, x_init, projection, n_iter, tol, **kwargs)
         assert 0 <= alpha <= 1.0
+        assert line_search in ("sequential", "speculative")
+        assert n_candidates >= 1
 
         self._z = self._x.clone()
         self._y = self._x.clone()
-        self.beta = 1.0 - torch.sqrt(3) / 2
+        self.beta = 1.0 - math.sqrt(3) / 2
         self.alpha = alpha
         self.L_t = ...
         self.eta_t = ...
         self.stop_nonconvex = stop_nonconvex
-        self._detected_nonconvex = False
+        # per-problem quantities are tensors of shape `batch_shape`
+        self._detected_nonconvex = torch.zeros(
+            self.batch_shape, dtype=torch.bool, device=self._x.device
+        )
         self._first_eta = kwargs.get("first_eta", -1)
+        self.line_search = line_search
+        self.n_candidates = n_candidates
 
     @property
     def detected_nonconvex(self):
@@ -37,25 +66,32 @@ class AutoConditionedFastGradidentDescent(Optimizer):
 
     def step(self, t: int = 1):
         if t == 1:
-            self._first_eta = self.eta_t = self.line_search_eta()
-            self.tau_t = 0
+            if self.line_search == "speculative":
+                self.eta_t = self.speculative_line_search_eta()
+            else:
+                self.eta_t = self.line_search_eta()
+            self._first_eta = self.eta_t
+            self.tau_t = torch.zeros_like(self.eta_t)
         elif t == 2:
             # TODO: This is a hacky solution
-            if self.L_t == 0:
-                self.eta_t = 2 * (1 - self.beta) * self._first_eta
-            else:
-                self.eta_t = torch.min(
+            self.eta_t = torch.where(
+                self.L_t == 0,
+                2 * (1 - self.beta) * self._first_eta,
+                torch.minimum(
                     2 * (1 - self.beta) * self._first_eta, self.beta / (2 * self.L_t)
-                )
+                ),
+            )
             self.tau_prev_t = self.tau_t
-            self.tau_t = 2
+            self.tau_t = torch.full_like(self.tau_t, 2.0)
         else:
             min_a = (self.tau_prev_t + 1) / self.tau_t * self.eta_t
-            min_b = min_a if self.L_t == 0 else self.beta * self.tau_t / (4 * self.L_t)
-            self.eta_t = torch.min(min_a, min_b)
+            min_b = torch.where(
+                self.L_t == 0, min_a, self.beta * self.tau_t / (4 * self.L_t)
+            )
+            self.eta_t = torch.minimum(min_a, min_b)
             self.tau_prev_t = self.tau_t
             self.tau_t = self.tau_prev_t + self.alpha / 2
-            self.tau_t += (
+            self.tau_t = self.tau_t + (
                 2
                 * (1 - self.alpha)
                 * self.eta_t
@@ -63,96 +99,168 @@ class AutoConditionedFastGradidentDescent(Optimizer):
                 / (self.beta * self.tau_prev_t)
             )
 
-        self._z = self.projection(self._y - self.eta_t * self._grad)
+        eta_t = self._per_problem(self.eta_t)
+        tau_t = self._per_problem(self.tau_t)
+        self._z = self.projection(self._y - eta_t * self._grad)
         self._y = (1 - self.beta) * self._y + self.beta * self._z
-        next_x = (self._z + self.tau_t * self._x) / (1.0 + self.tau_t)
-        next_f = self.oracle.f(next_x)
-        next_grad = self.oracle.df(next_x)
+        next_x = (self._z + tau_t * self._x) / (1.0 + tau_t)
+        next_f, next_grad = self.oracle.f_and_df(next_x)
 
         self.L_t = self.est_L(next_x, next_f, next_grad, first_iter=(t == 1))
         self._x = next_x
         self._f = next_f
         self._grad = next_grad
 
-        self.early_stop = self.stop_nonconvex and self._detected_nonconvex
+        self.early_stop = self._detected_nonconvex & self.stop_nonconvex
         # warnings.warn(f"Detected non-convex function (res: {linearization_diff:.4e})")
 
-    def line_search_eta(self, first_eta: int = -1):
+    def _initial_eta(self) -> torch.Tensor:
+        first_eta = torch.as_tensor(
+            self._first_eta, dtype=self._grad.dtype, device=self._grad.device
+        ).expand(self.batch_shape)
+        return torch.where(first_eta > 0, first_eta, torch.ones_like(first_eta))
+
+    def line_search_eta(self, first_eta=None):
         """
         Line search for $eta$ so that
         $$
             frac{beta}{4(1-beta)L} leq eta leq frac{1}{3L}
+
+        The doubling phase and the bisection are run for all problems at once, each
+        problem keeping its own bracket until its step size is accepted.
+
+        :param first_eta: Per-problem step sizes to start from, defaults to the
+            ``first_eta`` given to the constructor (1 when unset)
         """
-        eta = self._first_eta if self._first_eta > 0 else 1
+        if first_eta is None:
+            eta = self._initial_eta()
+        else:
+            eta = torch.as_tensor(
+                first_eta, dtype=self._grad.dtype, device=self._grad.device
+            ).expand(self.batch_shape)
         tau_t = 0
 
-        phase_I = True
+        phase_I = torch.ones_like(eta, dtype=torch.bool)
         first_iter = True
-        eta_lb = ...
-        eta_ub = ...
-        phase_I_incr = ...
+        phase_I_incr = torch.zeros_like(eta, dtype=torch.bool)
+        eta_lb = torch.zeros_like(eta)
+        eta_ub = torch.zeros_like(eta)
+        searching = torch.ones_like(eta, dtype=torch.bool)
+        result = eta.clone()
 
         while 1:
-            z = self.projection(self._y - eta * self._grad)
-            y = (1 - self.beta) * self._y + self.beta * z
+            z = self.projection(self._y - self._per_problem(eta) * self._grad)
             next_x = (z + tau_t * self._x) / (1.0 + tau_t)
             next_grad = self.oracle.df(next_x)
 
             L = self.est_L(next_x, ..., next_grad, first_iter=True)
-            if L == 0 or (self.stop_nonconvex and self._detected_nonconvex):
-                # TODO: This is a hacky solution
-                return 1.0 / 3
-
             lb = self.beta / (4 * (1.0 - self.beta) * L)
             ub = 1.0 / (3 * L)
-            if lb <= eta <= ub:
-                return eta
-            elif phase_I:
-                # check if we should start/continue doubling search
-                if (first_iter or phase_I_incr) and eta < lb:
-                    eta *= 2
-                    phase_I_incr = True
-                elif (first_iter or not phase_I_incr) and ub < eta:
-                    eta /= 2
-                    phase_I_incr = False
-                # below prepares line search for binary search
-                elif phase_I_incr and ub < eta:
-                    eta_ub = eta
-                    eta_lb = eta / 2
-                    eta = (eta_lb + eta_ub) / 2
-                    phase_I = False
-                else:
-                    eta_ub = eta * 2
-                    eta_lb = eta
-                    eta = (eta_lb + eta_ub) / 2
-                    phase_I = False
-                first_iter = False
-            else:
-                if eta < lb:
-                    eta_lb = eta
-                else:
-                    eta_ub = eta
-                eta = (eta_lb + eta_ub) / 2
+            # TODO: This is a hacky solution
+            give_up = (L == 0) | (self._detected_nonconvex & self.stop_nonconvex)
+            found = (lb <= eta) & (eta <= ub)
+            result = torch.where(searching & found, eta, result)
+            result = torch.where(searching & give_up, 1.0 / 3, result)
+            searching = searching & ~found & ~give_up
+            if not searching.any():
+                return result
+
+            # phase I: check if we should start/continue doubling search
+            double = phase_I & (first_iter | phase_I_incr) & (eta < lb)
+            halve = phase_I & ~double & (first_iter | ~phase_I_incr) & (ub < eta)
+            # phase I -> II: prepares line search for binary search
+            bracket = phase_I & ~double & ~halve
+            bracket_down = bracket & phase_I_incr & (ub < eta)
+            bracket_up = bracket & ~bracket_down
+            # phase II: binary search
+            raise_lb = ~phase_I & (eta < lb)
+            lower_ub = ~phase_I & ~(eta < lb)
+
+            eta_lb = torch.where(bracket_down, eta / 2, eta_lb)
+            eta_lb = torch.where(bracket_up | raise_lb, eta, eta_lb)
+            eta_ub = torch.where(bracket_down | lower_ub, eta, eta_ub)
+            eta_ub = torch.where(bracket_up, eta * 2, eta_ub)
+            next_eta = torch.where(double, eta * 2, (eta_lb + eta_ub) / 2)
+            next_eta = torch.where(halve, eta / 2, next_eta)
+            eta = torch.where(searching, next_eta, eta)
+
+            phase_I_incr = (phase_I_incr | double) & ~halve
+            phase_I = phase_I & (double | halve)
+            first_iter = False
 
         return eta
 
+    def speculative_line_search_eta(self):
+        """
+        Line search for the same bracket as ``line_search_eta``, evaluating the
+        geometric grid ``eta_0 * 2^k`` of ``n_candidates`` step sizes around the
+        initial step size at once: the candidate iterates are stacked along a new
+        leading dimension and their gradients come from a single
+        ``oracle.df_stacked`` call. Each problem takes the largest candidate inside
+        its bracket. Problems without such a candidate fall back to the sequential
+        search, started from the center of the bracket estimated at the closest
+        candidate.
+        """
+        eta_0 = self._initial_eta()
+        n_batch = len(self.batch_shape)
+        # largest step size first, so that argmax picks the largest accepted one
+        exponents = torch.arange(
+            self.n_candidates // 2,
+            self.n_candidates // 2 - self.n_candidates,
+            -1,
+            device=eta_0.device,
+        )
+        etas = (2.0**exponents).to(eta_0.dtype).reshape(-1, *[1] * n_batch) * eta_0
+        etas_x = etas.reshape(etas.shape + (1,) * (self._x.dim() - n_batch))
+
+        # first iteration: tau = 0, so the next iterate is z
+        next_xs = vmap(self.projection)(self._y - etas_x * self._grad)
+        next_grads = self.oracle.df_stacked(next_xs)
+
+        def norm(v):
+            return torch.linalg.norm(v.flatten(1 + n_batch), dim=-1)
+
+        L = norm(next_grads - self._grad) / (1e-3 + norm(next_xs - self._x))
+        lb = self.beta / (4 * (1.0 - self.beta) * L)
+        ub = 1.0 / (3 * L)
+        found = (lb <= etas) & (etas <= ub)
+        found_any = found.any(0)
+        first_found = found.int().argmax(0, keepdim=True)
+        eta = etas.gather(0, first_found).squeeze(0)
+        if found_any.all():
+            return eta
+
+        # distance of each candidate to its bracket on a log scale
+        center = torch.sqrt(lb * ub)
+        distance = torch.nan_to_num(
+            (torch.log(etas) - torch.log(center)).abs(), nan=torch.inf
+        )
+        closest = distance.argmin(0, keepdim=True)
+        start = center.gather(0, closest).squeeze(0)
+        start = torch.where(torch.isfinite(start) & (start > 0), start, eta_0)
+        return torch.where(found_any, eta, self.line_search_eta(start))
+
     def est_L(self, next_x, next_f, next_grad, first_iter=False, tol=1e-10):
         """
         :param tol: tolerance for non-convexity/linearization
         """
         if first_iter:
             # need to add a small value below in case too close ...
-            return torch.linalg.norm(next_grad - self._grad) / (
-                1e-3 + torch.linalg.norm(next_x - self._x)
+            return self._norm(next_grad - self._grad) / (
+                1e-3 + self._norm(next_x - self._x)
             )
 
-        linearization_diff = self._f - next_f - torch.dot(next_grad, self._x - next_x)
-        if linearization_diff > 0:
-            L = torch.norm(self._grad - next_grad) ** 2 / (2 * linearization_diff)
-        elif abs(linearization_diff) <= tol:
-            L = 0
-        else:
-            self._detected_nonconvex = True
-            L = 0
+        linearization_diff = (
+            self._f - next_f - self._dot(next_grad, self._x - next_x)
+        )
+        L = torch.where(
+            linearization_diff > 0,
+            self._norm(self._grad - next_grad) ** 2 / (2 * linearization_diff),
+            torch.zeros_like(linearization_diff),
+        )
+        # below -tol the function is not convex along the step, L is then set to 0
+        self._detected_nonconvex = self._detected_nonconvex | (
+            linearization_diff < -tol
+        )
 
         return L
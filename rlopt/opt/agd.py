@@ -4,10 +4,12 @@ from .gd import Optimizer
 
 
 class AcceleratedGradientDescent(Optimizer):
+    _state_names = Optimizer._state_names + ("_xt", "_uxt", "_oxt")
+
     def __init__(
         self, oracle, x_init, n_iter=100, tol=1e-10, eta_0=0.001, mu=0, **kwargs
     ):
-        super().__init__(oracle, x_init, n_iter, tol, *kwargs)
+        super().__init__(oracle, x_init, None, n_iter, tol, **kwargs)
         self._xt = torch.clone(self._x)
         self._uxt = torch.clone(self._x)
         self._oxt = torch.clone(self._x)
@@ -29,5 +31,4 @@ class AcceleratedGradientDescent(Optimizer):
         self._oxt = (1 - a_t) * self._oxt + a_t * self._xt
 
         self._x = self._oxt
-        self._f = self.oracle.f(self._x)
-        self._grad = self.oracle.df(self._x)
+        self._f, self._grad = self.oracle.f_and_df(self._x)
@@ -3,36 +3,99 @@ from abc import ABC, abstractmethod
 
 import torch.linalg as la
 
+from .oracle import CachedOracle
+
 
 class Optimizer(ABC):
     """
     Convex smooth optimization
+
+    With ``batched=True``, ``x_init`` has a leading dimension of independent problems.
+    The oracle then returns per-problem values of shape (batch,) and gradients shaped
+    like ``x``, and the projection must act on the batched iterate. Step sizes are
+    tracked per problem, and problems that have converged are frozen while the others
+    keep iterating.
+
+    The oracle is wrapped in a ``CachedOracle``: repeated queries at the same iterate
+    are free, a fused ``f_and_df`` is used when the oracle provides one, and the
+    number of oracle calls is reported by ``solve(return_counters=True)``.
     """
 
+    # attributes holding per-problem state, frozen once a problem has converged
+    _state_names = ("_x", "_f", "_grad")
+
     def __init__(
         self,
         oracle,
         x_init: torch.Tensor,
-        projection,
-        n_iter: int,
-        tol: float,
+        projection=None,
+        n_iter: int = 100,
+        tol: float = 1e-10,
+        batched: bool = False,
         **kwargs
     ):
-        self.oracle = oracle
+        self.oracle = CachedOracle(oracle)
         self.n_iter = n_iter
         self.tol = tol
+        self.batched = batched
         self._x = x_init.clone()
-        self.projection = projection
-        self._f = self.oracle.f(self._x)
-        self._grad = self.oracle.df(self._x).clone()
+        self.projection = projection if projection is not None else (lambda x: x)
+        self._f, grad = self.oracle.f_and_df(self._x)
+        self._grad = grad.clone()
         self.early_stop = False
 
+    @property
+    def batch_shape(self) -> torch.Size:
+        """Shape of per-problem quantities, () unless batched."""
+        return self._x.shape[:1] if self.batched else torch.Size()
+
     def set_oracle(self, oracle):
-        self.oracle = oracle
+        self.oracle = CachedOracle(oracle)
 
     def set_x(self, x):
         self._x = x.clone()
 
+    def _norm(self, v: torch.Tensor) -> torch.Tensor:
+        if self.batched:
+            return la.norm(v.flatten(1), dim=-1)
+        return la.norm(v)
+
+    def _dot(self, a: torch.Tensor, b: torch.Tensor) -> torch.Tensor:
+        if self.batched:
+            return (a * b).flatten(1).sum(-1)
+        return torch.dot(a.flatten(), b.flatten())
+
+    def _per_problem(self, s):
+        """Reshape per-problem scalars of shape (batch,) to broadcast against ``x``."""
+        if self.batched and torch.is_tensor(s) and s.dim() == 1:
+            return s.reshape(-1, *[1] * (self._x.dim() - 1))
+        return s
+
+    def _freeze(self, previous: dict, active: torch.Tensor):
+        """Restore the state of inactive problems after a step."""
+        for name, old in previous.items():
+            new = getattr(self, name, None)
+            if torch.is_tensor(old) and torch.is_tensor(new) and old.shape == new.shape:
+                mask = active.reshape(active.shape + (1,) * (new.dim() - active.dim()))
+                setattr(self, name, torch.where(mask, new, old))
+
+    def _iteration(self, t: int, active: torch.Tensor):
+        """
+        One step followed by the convergence update, without host synchronization.
+        Problems that are no longer active keep their previous state.
+        """
+        previous = {name: getattr(self, name, None) for name in self._state_names}
+        self.step(t)
+        self._freeze(previous, active)
+        grad_norm = self._norm(self._grad)
+        if t >= 10:
+            active = active & (grad_norm > self.tol)
+        if torch.is_tensor(self.early_stop):
+            active = active & ~self.early_stop
+        elif self.early_stop:
+            active = torch.zeros_like(active)
+        return grad_norm, active
+
     @abstractmethod
     def step(self, t: int = 1):
         """
@@ -40,25 +103,54 @@ class Optimizer(ABC):
         """
         raise NotImplemented
 
-    def solve(self, n_iter: int = -1, verbose: int = 0):
+    def solve(
+        self,
+        n_iter: int = -1,
+        verbose: int = 0,
+        return_counters: bool = False,
+        check_every: int = 1,
+        compile: bool = False,
+    ):
         """
         Optimizers until `n_iter` iterations or gradient tolerance is met,
         whichever is first. Returns last iterate and its gradient.
+
+        In batched mode the traces have shape (n_iter, batch) and the solve stops
+        once every problem has converged. With `return_counters`, the number of
+        oracle evaluations made during the solve is returned as a fourth element.
+
+        The traces live on the device of the iterate and convergence is tracked with
+        a device-side mask, so the host only synchronizes every `check_every`
+        iterations to decide whether to stop. Converged problems are frozen in the
+        meantime, so the result does not depend on `check_every`. With `compile`,
+        each iteration runs through `torch.compile`.
         """
+        self.oracle.reset_counters()
         n_iter = self.n_iter if n_iter <= 0 else n_iter
-        f_arr = torch.zeros(n_iter, dtype=torch.float64)
-        grad_arr = torch.zeros(n_iter, dtype=torch.float64)
+        device = self._x.device
+        f_arr = torch.zeros(n_iter, *self.batch_shape, dtype=torch.float64, device=device)
+        grad_arr = torch.zeros_like(f_arr)
+        active_arr = torch.ones(n_iter, dtype=torch.bool, device=device)
+        active = torch.ones(self.batch_shape, dtype=torch.bool, device=device)
+        iteration = torch.compile(self._iteration) if compile else self._iteration
+
         t = 1
         while t <= n_iter:
-            self.step(t)
+            grad_norm, active = iteration(t, active)
             f_arr[t - 1] = self._f
-            grad_arr[t - 1] = la.norm(self._grad)
-            if (la.norm(self._grad) <= self.tol and t >= 10) or self.early_stop:
-                # print(f"Early termination at iteration {t+1}/{n_iter}")
-                f_arr = f_arr[:t]
-                break
+            grad_arr[t - 1] = grad_norm
+            active_arr[t - 1] = active.any()
+            if t % check_every == 0 or t == n_iter:
+                stopped = (~active_arr[:t]).nonzero()
+                if len(stopped) > 0:
+                    # print(f"Early termination at iteration {t+1}/{n_iter}")
+                    t = int(stopped[0]) + 1
+                    break
             t += 1
+        t = min(t, n_iter)
 
+        if return_counters:
+            return self._x.clone(), f_arr[:t], grad_arr[:t], dict(self.oracle.counters)
         return self._x.clone(), f_arr[:t], grad_arr[:t]
 
 
@@ -73,14 +165,13 @@ class GradientDescent(Optimizer):
         eta_0: float = 0.001,
         **kwargs
     ):
-        super().__init__(oracle, x_init, n_iter, tol, *kwargs)
+        super().__init__(oracle, x_init, None, n_iter, tol, **kwargs)
         self.stepsize = stepsize
         self.eta_0 = eta_0
 
     def step(self, t: int = 1):
         eta = self.eta_0
         if not (self.stepsize == "constant"):
-            eta = self.eta_0 * torch.sqrt(1.0 / t)
-        self._x -= eta * self._grad
-        self._f = self.oracle.f(self._x)
-        self._grad = self.oracle.df(self._x)
+            eta = self.eta_0 * (1.0 / t) ** 0.5
+        self._x = self._x - eta * self._grad
+        self._f, self._grad = self.oracle.f_and_df(self._x)
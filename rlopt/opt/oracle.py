@@ -0,0 +1,135 @@
+import torch
+from torch.func import grad_and_value, vmap
+
+
+class Oracle:
+    """
+    First-order oracle protocol used by the optimizers in ``rlopt.opt``.
+
+    Subclasses implement ``f`` and ``df``, or a fused ``f_and_df`` when the value and
+    the gradient share work (e.g. a forward pass followed by autograd). ``df_stacked``
+    evaluates the gradient at several iterates stacked along a new leading dimension,
+    by default by vectorizing ``df`` with ``torch.func.vmap``.
+    """
+
+    def f(self, x: torch.Tensor) -> torch.Tensor:
+        return self.f_and_df(x)[0]
+
+    def df(self, x: torch.Tensor) -> torch.Tensor:
+        return self.f_and_df(x)[1]
+
+    def f_and_df(self, x: torch.Tensor):
+        return self.f(x), self.df(x)
+
+    def df_stacked(self, xs: torch.Tensor) -> torch.Tensor:
+        return vmap(self.df)(xs)
+
+
+class AutogradOracle(Oracle):
+    """
+    Oracle of a differentiable function, with value and gradient from a single
+    ``torch.func.grad_and_value`` call.
+
+    :param fn: Function of ``x`` returning a scalar, or per-problem values of shape
+        (batch,) when ``x`` is batched
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+
+        def _summed(x):
+            value = fn(x)
+            return value.sum(), value
+
+        # problems of a batch are independent, so the gradient of the sum is the
+        # per-problem gradient
+        self._grad_and_value = grad_and_value(_summed, has_aux=True)
+
+    def f(self, x: torch.Tensor) -> torch.Tensor:
+        return self.fn(x)
+
+    def f_and_df(self, x: torch.Tensor):
+        grad, (_, value) = self._grad_and_value(x)
+        return value, grad
+
+
+class CachedOracle(Oracle):
+    """
+    Wrap an oracle with a cache of the last evaluated iterate and call counters.
+
+    Entries are keyed by the identity (and version counter) of the iterate tensor, so
+    asking for ``f`` and then ``df`` at the same iterate evaluates it once when the
+    wrapped oracle provides a fused ``f_and_df``.
+
+    :param oracle: Any object with ``f`` and ``df`` methods, and optionally ``f_and_df``
+    """
+
+    def __init__(self, oracle):
+        self.oracle = oracle
+        if isinstance(oracle, Oracle):
+            # the base class f_and_df just calls f and df
+            self.fused = type(oracle).f_and_df is not Oracle.f_and_df
+        else:
+            self.fused = callable(getattr(oracle, "f_and_df", None))
+        self.reset_counters()
+        self.clear()
+
+    def reset_counters(self):
+        self.counters = {
+            "f": 0,
+            "df": 0,
+            "f_and_df": 0,
+            "df_stacked": 0,
+            "cache_hits": 0,
+        }
+
+    def clear(self):
+        self._x = None
+        self._version = -1
+        self._f = None
+        self._df = None
+
+    def _lookup(self, x: torch.Tensor) -> bool:
+        if x is self._x and x._version == self._version:
+            return True
+        # keep a reference so that the id of the cached iterate cannot be reused
+        self._x, self._version = x, x._version
+        self._f, self._df = None, None
+        return False
+
+    def _evaluate(self, x: torch.Tensor, need_f: bool, need_df: bool):
+        if self._lookup(x) and (self._f is not None or not need_f) and (
+            self._df is not None or not need_df
+        ):
+            self.counters["cache_hits"] += 1
+            return
+        if self.fused and need_df:
+            self._f, self._df = self.oracle.f_and_df(x)
+            self.counters["f_and_df"] += 1
+            return
+        if need_f and self._f is None:
+            self._f = self.oracle.f(x)
+            self.counters["f"] += 1
+        if need_df and self._df is None:
+            self._df = self.oracle.df(x)
+            self.counters["df"] += 1
+
+    def f(self, x: torch.Tensor) -> torch.Tensor:
+        self._evaluate(x, need_f=True, need_df=False)
+        return self._f  # type: ignore
+
+    def df(self, x: torch.Tensor) -> torch.Tensor:
+        self._evaluate(x, need_f=False, need_df=True)
+        return self._df  # type: ignore
+
+    def f_and_df(self, x: torch.Tensor):
+        self._evaluate(x, need_f=True, need_df=True)
+        return self._f, self._df
+
+    def df_stacked(self, xs: torch.Tensor) -> torch.Tensor:
+        """Gradients at stacked iterates, in one call that bypasses the cache."""
+        self.counters["df_stacked"] += 1
+        df_stacked = getattr(self.oracle, "df_stacked", None)
+        if callable(df_stacked):
+            return df_stacked(xs)
+        return vmap(self.oracle.df)(xs)
@@ -0,0 +1,211 @@
+import math
+from typing import Optional
+
+import torch
+from torch.optim import Optimizer as TorchOptimizer
+
+
+def _global_norm(tensors) -> torch.Tensor:
+    return torch.linalg.vector_norm(torch.stack(torch._foreach_norm(tensors)))
+
+
+def _global_dot(a, b) -> torch.Tensor:
+    return torch.stack([t.sum() for t in torch._foreach_mul(a, b)]).sum()
+
+
+class ACFGD(TorchOptimizer):
+    """
+    Auto-conditioned fast gradient descent (see ``AutoConditionedFastGradidentDescent``)
+    as a ``torch.optim`` optimizer over parameter groups.
+
+    The parameters hold the iterate ``x`` at which gradients are evaluated. The
+    Lipschitz estimate ``L`` of a step is computed at the beginning of the next step,
+    once the gradient at the new iterate is known: from the linearization gap when a
+    closure returns the loss, and from the gradient difference otherwise. The first
+    step size is ``lr`` instead of the line search, so a step costs one gradient
+    evaluation like other ``torch.optim`` optimizers. All parameters of a group are
+    updated with multi-tensor (``torch._foreach_*``) kernels, and the step sizes stay on
+    device.
+
+    :param params: Parameters or parameter groups
+    :param lr: First step size
+    :param alpha: AC-FGD averaging parameter in [0, 1]
+    """
+
+    def __init__(self, params, lr: float = 1e-3, alpha: float = 0.5):
+        if not 0.0 <= alpha <= 1.0:
+            raise ValueError(f"alpha must be in [0, 1], got {alpha}")
+        super().__init__(params, dict(lr=lr, alpha=alpha))
+        self.beta = 1.0 - math.sqrt(3) / 2
+
+    def _estimate_L(self, group_state, params, grads, x_prev, grad_prev, loss):
+        dx = torch._foreach_sub(params, x_prev)
+        dg = torch._foreach_sub(grads, grad_prev)
+        dg_norm = _global_norm(dg)
+        f_prev = group_state.get("f_prev")
+        if loss is None or f_prev is None or group_state["step"] == 1:
+            return dg_norm / _global_norm(dx).clamp_min(1e-12)
+        linearization_diff = f_prev - loss.detach() + _global_dot(grads, dx)
+        return torch.where(
+            linearization_diff > 0,
+            dg_norm**2 / (2 * linearization_diff),
+            torch.zeros_like(linearization_diff),
+        )
+
+    @torch.no_grad()
+    def step(self, closure=None):
+        loss = None
+        if closure is not None:
+            with torch.enable_grad():
+                loss = closure()
+
+        beta = self.beta
+        for group in self.param_groups:
+            params = [p for p in group["params"] if p.grad is not None]
+            if not params:
+                continue
+            grads = [p.grad for p in params]
+            states = [self.state[p] for p in params]
+            for p, state in zip(params, states):
+                if "y" not in state:
+                    state["y"] = p.detach().clone()
+                    state["x_prev"] = p.detach().clone()
+                    state["grad_prev"] = p.grad.detach().clone()
+            y = [state["y"] for state in states]
+            x_prev = [state["x_prev"] for state in states]
+            grad_prev = [state["grad_prev"] for state in states]
+            # step sizes are shared by the group, they live in the state of its first parameter
+            group_state = self.state[group["params"][0]]
+            t = group_state.get("step", 0) + 1
+
+            if t == 1:
+                eta = torch.as_tensor(
+                    group["lr"], dtype=params[0].dtype, device=params[0].device
+                )
+                tau = torch.zeros_like(eta)
+                group_state["first_eta"] = eta
+            else:
+                L = self._estimate_L(
+                    group_state, params, grads, x_prev, grad_prev, loss
+                )
+                first_eta, eta, tau = (
+                    group_state["first_eta"],
+                    group_state["eta"],
+                    group_state["tau"],
+                )
+                if t == 2:
+                    eta = torch.where(
+                        L == 0,
+                        2 * (1 - beta) * first_eta,
+                        torch.minimum(2 * (1 - beta) * first_eta, beta / (2 * L)),
+                    )
+                    tau_prev, tau = tau, torch.full_like(tau, 2.0)
+                else:
+                    min_a = (group_state["tau_prev"] + 1) / tau * eta
+                    min_b = torch.where(L == 0, min_a, beta * tau / (4 * L))
+                    eta = torch.minimum(min_a, min_b)
+                    tau_prev = tau
+                    tau = (
+                        tau_prev
+                        + group["alpha"] / 2
+                        + 2 * (1 - group["alpha"]) * eta * L / (beta * tau_prev)
+                    )
+                group_state["tau_prev"] = tau_prev
+
+            # z = y - eta * grad, y = (1 - beta) y + beta z, x = (z + tau x) / (1 + tau)
+            z = torch._foreach_mul(grads, -eta)
+            torch._foreach_add_(z, y)
+            torch._foreach_lerp_(y, z, beta)
+            torch._foreach_copy_(x_prev, params)
+            torch._foreach_copy_(grad_prev, grads)
+            torch._foreach_mul_(params, tau)
+            torch._foreach_add_(params, z)
+            torch._foreach_div_(params, 1 + tau)
+
+            group_state.update(step=t, eta=eta, tau=tau)
+            if loss is not None:
+                group_state["f_prev"] = loss.detach()
+
+        return loss
+
+
+class AGD(TorchOptimizer):
+    """
+    Accelerated gradient descent (see ``AcceleratedGradientDescent``) as a
+    ``torch.optim`` optimizer over parameter groups.
+
+    The parameters hold the extrapolated point at which the gradient is evaluated;
+    the averaged output sequence of the method is kept in the ``output`` state of each
+    parameter. All parameters of a group are updated with multi-tensor kernels.
+
+    :param params: Parameters or parameter groups
+    :param lr: Base step size ``eta_0``, the step size of step ``t`` is ``t * lr / 2``
+    :param mu: Strong convexity parameter
+    """
+
+    def __init__(self, params, lr: float = 1e-3, mu: float = 0.0):
+        super().__init__(params, dict(lr=lr, mu=mu))
+
+    @torch.no_grad()
+    def step(self, closure=None):
+        loss = None
+        if closure is not None:
+            with torch.enable_grad():
+                loss = closure()
+
+        for group in self.param_groups:
+            params = [p for p in group["params"] if p.grad is not None]
+            if not params:
+                continue
+            grads = [p.grad for p in params]
+            states = [self.state[p] for p in params]
+            for p, state in zip(params, states):
+                if "step" not in state:
+                    state["step"] = 0
+                    state["xt"] = p.detach().clone()
+                    state["output"] = p.detach().clone()
+            t = states[0]["step"] + 1
+            xt = [state["xt"] for state in states]
+            output = [state["output"] for state in states]
+
+            a_t = 2.0 / (t + 1)
+            # divide by /2 is important here
+            eta_t = t * group["lr"] / 2
+            mu = group["mu"]
+
+            # xt = (xt + mu eta uxt - eta grad) / (1 + mu eta), uxt being the parameters
+            if mu != 0:
+                torch._foreach_add_(xt, torch._foreach_mul(params, mu * eta_t))
+            torch._foreach_sub_(xt, torch._foreach_mul(grads, eta_t))
+            if mu != 0:
+                torch._foreach_div_(xt, 1.0 + mu * eta_t)
+            torch._foreach_lerp_(output, xt, a_t)
+            # next extrapolated point uxt = (1 - q) output + q xt
+            torch._foreach_copy_(params, output)
+            torch._foreach_lerp_(params, xt, 2.0 / (t + 2))
+
+            for state in states:
+                state["step"] = t
+
+        return loss
+
+
+OPTIMIZERS = {"adam": torch.optim.Adam, "acfgd": ACFGD, "agd": AGD}
+
+
+def make_torch_optimizer(
+    name: str, params, lr, adam_kwargs: Optional[dict] = None, **kwargs
+) -> TorchOptimizer:
+    """
+    Build the optimizer ``name`` ("adam", "acfgd" or "agd").
+
+    :param adam_kwargs: Extra keyword arguments only used by Adam (e.g. ``eps``)
+    :param kwargs: Extra keyword arguments of the optimizer
+    """
+    if name not in OPTIMIZERS:
+        raise ValueError(
+            f"Unknown optimizer {name}, expected one of {list(OPTIMIZERS)}"
+        )
+    if name == "adam":
+        kwargs = {**(adam_kwargs or {}), **kwargs}
+    return OPTIMIZERS[name](params, lr=lr, **kwargs)
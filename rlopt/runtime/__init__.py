@@ -0,0 +1,47 @@
+"""
+Inference-only runtime for trained policies.
+
+``RuntimePolicy`` only depends on torch, ``OnnxRuntimePolicy`` only on numpy and
+onnxruntime, and neither imports stable-baselines3, torchrl, hydra or gymnasium.
+Both expose a batched ``act(obs, state, episode_start)``.
+"""
+
+from typing import TYPE_CHECKING
+
+from rlopt._lazy import lazy_getattr
+
+if TYPE_CHECKING:
+    from .onnx import OnnxRuntimePolicy
+    from .policy import RuntimePolicy, export_runtime_policy
+
+# the ONNX backend does not need torch, only import the backend that is used
+__getattr__, __dir__ = lazy_getattr(
+    __name__,
+    {
+        "OnnxRuntimePolicy": ".onnx",
+        "RuntimePolicy": ".policy",
+        "export_runtime_policy": ".policy",
+    },
+)
+
+
+def load_policy(path: str, device="cpu"):
+    """
+    Load a policy for inference.
+
+    :param path: File written by ``export_runtime_policy``, or an ONNX export
+        (``export_to_onnx`` / ``export_recurrent_to_onnx``)
+    :param device: Device of a ``RuntimePolicy`` (ONNX policies run on CPU)
+    :return: A ``RuntimePolicy`` in eval mode, or an ``OnnxRuntimePolicy``
+    """
+    if path.endswith(".onnx"):
+        from .onnx import OnnxRuntimePolicy
+
+        return OnnxRuntimePolicy(path)
+
+    from .policy import RuntimePolicy
+
+    return RuntimePolicy.load(path, device=device)
+
+
+__all__ = ["OnnxRuntimePolicy", "RuntimePolicy", "export_runtime_policy", "load_policy"]
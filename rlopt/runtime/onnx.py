@@ -0,0 +1,77 @@
+"""
+ONNX Runtime backend of ``rlopt.runtime``, with no torch import.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class OnnxRuntimePolicy:
+    """
+    ``act`` interface over an ONNX export of a policy, run with ONNX Runtime on CPU.
+    Requires ``onnxruntime``.
+
+    :param onnx_filename: File written by ``export_to_onnx`` or
+        ``export_recurrent_to_onnx``
+    :param intra_op_num_threads: Number of threads of the ONNX Runtime session
+    """
+
+    def __init__(self, onnx_filename: str, intra_op_num_threads: int = 1):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "onnxruntime is required to run ONNX policies, "
+                "install it with `pip install onnxruntime`"
+            ) from e
+
+        session_options = ort.SessionOptions()
+        session_options.intra_op_num_threads = intra_op_num_threads
+        self.session = ort.InferenceSession(
+            onnx_filename, session_options, providers=["CPUExecutionProvider"]
+        )
+        inputs = {node.name: node for node in self.session.get_inputs()}
+        self.recurrent = "hidden_state" in inputs
+        self.input_name = "observation" if self.recurrent else next(iter(inputs))
+        self.state_shape = None
+        if self.recurrent:
+            n_layers, _, hidden_size = inputs["hidden_state"].shape
+            self.state_shape = (n_layers, hidden_size)
+
+    def initial_state(self, batch_size: int = 1) -> Optional[Tuple[np.ndarray, ...]]:
+        if self.state_shape is None:
+            return None
+        n_layers, hidden_size = self.state_shape
+        shape = (n_layers, batch_size, hidden_size)
+        return (
+            np.zeros(shape, dtype=np.float32),
+            np.zeros(shape, dtype=np.float32),
+        )
+
+    def act(
+        self,
+        obs: np.ndarray,
+        state: Optional[Tuple[np.ndarray, ...]] = None,
+        episode_start: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, Optional[Tuple[np.ndarray, ...]]]:
+        """Same as ``RuntimePolicy.act``, with numpy outputs."""
+        obs = np.asarray(obs, dtype=np.float32)
+        if not self.recurrent:
+            # ``export_to_onnx`` graphs return (actions, values, log_prob) or actions
+            outputs = self.session.run(None, {self.input_name: obs})
+            return outputs[0], None
+        if state is None:
+            state = self.initial_state(obs.shape[0])
+        if episode_start is None:
+            episode_start = np.zeros(obs.shape[0], dtype=np.float32)
+        actions, hidden_state, cell_state = self.session.run(
+            None,
+            {
+                "observation": obs,
+                "hidden_state": np.asarray(state[0], dtype=np.float32),
+                "cell_state": np.asarray(state[1], dtype=np.float32),
+                "episode_start": np.asarray(episode_start, dtype=np.float32),
+            },
+        )
+        return actions, (hidden_state, cell_state)
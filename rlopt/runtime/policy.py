@@ -0,0 +1,244 @@
+"""
+Inference-only policies rebuilt from the weights and architecture metadata of a
+trained actor, without stable-baselines3, torchrl, hydra or gymnasium.
+
+``export_runtime_policy`` writes the actor branch of an ``ActorCriticPolicy`` or
+``RecurrentActorCriticPolicy`` (features flattening, optional actor LSTM, policy MLP
+and action head) to a single ``torch.save`` file, ``RuntimePolicy.load`` rebuilds it as
+a plain ``torch.nn.Module`` with the same parameter names.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import torch as th
+from torch import nn
+
+RUNTIME_FORMAT_VERSION = 1
+
+LSTMStates = Tuple[th.Tensor, th.Tensor]
+
+# parameters of the actor branch, named as in the stable-baselines3 policies
+_ACTOR_PREFIXES = ("lstm_actor.", "mlp_extractor.policy_net.", "action_net.")
+
+
+def reset_lstm_states(
+    hidden_state: th.Tensor, cell_state: th.Tensor, episode_start: th.Tensor
+) -> LSTMStates:
+    """Zero the LSTM states of shape (n_layers, batch, hidden_size) where
+    ``episode_start`` (batch,) is 1."""
+    # (batch,) -> (1, batch, 1), broadcast over (n_layers, batch, hidden)
+    mask = (1.0 - episode_start.float()).reshape(1, -1, 1)
+    return hidden_state * mask, cell_state * mask
+
+
+def postprocess_actions(
+    actions: th.Tensor,
+    action_low: Optional[th.Tensor],
+    action_high: Optional[th.Tensor],
+    squash_output: bool,
+) -> th.Tensor:
+    """
+    Deterministic actions from the action head output, as in
+    ``predict_and_return_tensor``: unscaled (``squash_output``) or clipped to the
+    bounds of a Box action space, the argmax for a Discrete one (``action_low`` is
+    ``None``).
+    """
+    if action_low is None:
+        return th.argmax(actions, dim=-1)
+    if squash_output:
+        actions = th.tanh(actions)
+        return action_low + 0.5 * (actions + 1.0) * (action_high - action_low)
+    return th.clamp(actions, action_low, action_high)
+
+
+class RuntimePolicy(nn.Module):
+    """
+    Deterministic actor of a trained policy.
+
+    :param metadata: Architecture metadata written by ``export_runtime_policy``
+    """
+
+    def __init__(self, metadata: Dict[str, Any]):
+        super().__init__()
+        self.metadata = metadata
+        self.obs_shape = tuple(metadata["obs_shape"])
+        self.is_box = metadata["action_type"] == "box"
+        self.squash_output = metadata["squash_output"]
+
+        features_dim = int(np.prod(self.obs_shape))
+        self.lstm_actor: Optional[nn.LSTM] = None
+        if metadata["lstm"] is not None:
+            self.lstm_actor = nn.LSTM(
+                features_dim,
+                metadata["lstm"]["hidden_size"],
+                num_layers=metadata["lstm"]["n_layers"],
+            )
+            features_dim = metadata["lstm"]["hidden_size"]
+
+        layers: List[nn.Module] = []
+        for size in metadata["net_arch"]:
+            layers += [
+                nn.Linear(features_dim, size),
+                getattr(nn, metadata["activation"])(),
+            ]
+            features_dim = size
+        # same attribute path as ``MlpExtractor.policy_net`` so the state dict matches
+        self.mlp_extractor = nn.Module()
+        self.mlp_extractor.policy_net = nn.Sequential(*layers)
+        self.action_net = nn.Linear(features_dim, metadata["action_dim"])
+
+        if self.is_box:
+            # rebuilt from the metadata, not part of the exported weights
+            self.register_buffer(
+                "action_low",
+                th.as_tensor(metadata["action_low"], dtype=th.float32),
+                persistent=False,
+            )
+            self.register_buffer(
+                "action_high",
+                th.as_tensor(metadata["action_high"], dtype=th.float32),
+                persistent=False,
+            )
+
+    @classmethod
+    def load(cls, path: str, device: Union[th.device, str] = "cpu") -> "RuntimePolicy":
+        """
+        Load a file written by ``export_runtime_policy``.
+
+        :param path: Path of the file
+        :param device: Device of the policy
+        :return: The policy, in eval mode
+        """
+        checkpoint = th.load(path, map_location="cpu", weights_only=True)
+        if checkpoint.get("format_version") != RUNTIME_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported runtime policy format {checkpoint.get('format_version')} "
+                f"in {path}, expected {RUNTIME_FORMAT_VERSION}"
+            )
+        policy = cls(checkpoint["metadata"])
+        policy.load_state_dict(checkpoint["state_dict"])
+        return policy.to(device).eval()
+
+    @property
+    def recurrent(self) -> bool:
+        return self.lstm_actor is not None
+
+    @property
+    def device(self) -> th.device:
+        return self.action_net.weight.device
+
+    def initial_state(self, batch_size: int = 1) -> Optional[LSTMStates]:
+        """Zero LSTM states of shape (n_layers, batch_size, hidden_size)."""
+        if self.lstm_actor is None:
+            return None
+        shape = (self.lstm_actor.num_layers, batch_size, self.lstm_actor.hidden_size)
+        return (
+            th.zeros(shape, device=self.device),
+            th.zeros(shape, device=self.device),
+        )
+
+    def forward(
+        self,
+        observation: th.Tensor,
+        hidden_state: Optional[th.Tensor] = None,
+        cell_state: Optional[th.Tensor] = None,
+        episode_start: Optional[th.Tensor] = None,
+    ) -> Tuple[th.Tensor, Optional[th.Tensor], Optional[th.Tensor]]:
+        features = observation.float().flatten(1)
+        if self.lstm_actor is not None:
+            if episode_start is not None:
+                hidden_state, cell_state = reset_lstm_states(
+                    hidden_state, cell_state, episode_start
+                )
+            latent, (hidden_state, cell_state) = self.lstm_actor(
+                features.unsqueeze(0), (hidden_state, cell_state)
+            )
+            features = latent.squeeze(0)
+        actions = self.action_net(self.mlp_extractor.policy_net(features))
+
+        actions = postprocess_actions(
+            actions,
+            self.action_low if self.is_box else None,
+            self.action_high if self.is_box else None,
+            self.squash_output,
+        )
+        return actions, hidden_state, cell_state
+
+    @th.inference_mode()
+    def act(
+        self,
+        obs: Union[np.ndarray, th.Tensor],
+        state: Optional[LSTMStates] = None,
+        episode_start: Optional[Union[np.ndarray, th.Tensor]] = None,
+    ) -> Tuple[th.Tensor, Optional[LSTMStates]]:
+        """
+        Deterministic actions of a batch of observations.
+
+        :param obs: Observations of shape (batch, *obs_shape)
+        :param state: LSTM hidden and cell states of shape (n_layers, batch, hidden_size),
+            zeros when ``None``. Ignored by feed-forward policies.
+        :param episode_start: Flags of shape (batch,), the states of the flagged
+            entries are reset before the step
+        :return: Actions and the next LSTM states (``None`` for feed-forward policies)
+        """
+        obs = th.as_tensor(obs, device=self.device).reshape(-1, *self.obs_shape)
+        if self.lstm_actor is None:
+            return self.forward(obs)[0], None
+        if state is None:
+            state = self.initial_state(obs.shape[0])
+        if episode_start is not None:
+            episode_start = th.as_tensor(episode_start, device=self.device)
+        actions, hidden_state, cell_state = self.forward(obs, *state, episode_start)
+        return actions, (hidden_state, cell_state)
+
+
+def export_runtime_policy(policy: nn.Module, path: str) -> Dict[str, Any]:
+    """
+    Write the actor of a trained policy, with the metadata needed to rebuild it
+    without its training dependencies.
+
+    :param policy: An ``ActorCriticPolicy`` or ``RecurrentActorCriticPolicy`` with
+        flattened (``FlattenExtractor``) observations and a Box or Discrete action space
+    :param path: Output file
+    :return: The architecture metadata
+    """
+    if type(policy.pi_features_extractor).__name__ != "FlattenExtractor":
+        raise ValueError("Only policies with a FlattenExtractor can be exported")
+
+    policy_net = policy.mlp_extractor.policy_net
+    linear_layers = [m for m in policy_net if isinstance(m, nn.Linear)]
+    activations = [type(m).__name__ for m in policy_net if not isinstance(m, nn.Linear)]
+    action_space = policy.action_space
+    is_box = hasattr(action_space, "low")
+
+    lstm = getattr(policy, "lstm_actor", None)
+    metadata = {
+        "obs_shape": list(policy.observation_space.shape),
+        "lstm": (
+            None
+            if lstm is None
+            else {"n_layers": lstm.num_layers, "hidden_size": lstm.hidden_size}
+        ),
+        "net_arch": [layer.out_features for layer in linear_layers],
+        "activation": activations[0] if activations else "Tanh",
+        "action_type": "box" if is_box else "discrete",
+        "action_dim": policy.action_net.out_features,
+        "squash_output": bool(policy.squash_output),
+        "action_low": action_space.low.tolist() if is_box else None,
+        "action_high": action_space.high.tolist() if is_box else None,
+    }
+    state_dict = {
+        key: value.detach().cpu()
+        for key, value in policy.state_dict().items()
+        if key.startswith(_ACTOR_PREFIXES)
+    }
+    th.save(
+        {
+            "format_version": RUNTIME_FORMAT_VERSION,
+            "metadata": metadata,
+            "state_dict": state_dict,
+        },
+        path,
+    )
+    return metadata
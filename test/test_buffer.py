@@ -1,11 +1,16 @@
+import tempfile
 import unittest
+from unittest import mock
 from rlopt.common.buffer import (
     ReplayBuffer,
     RolloutBuffer,
     DictReplayBuffer,
     DictRolloutBuffer,
+    RecurrentRolloutBuffer,
+    RecurrentSequenceDictRolloutBuffer,
 )
 from gymnasium import spaces
+from sb3_contrib.common.recurrent.type_aliases import RNNStates
 import torch as th
 
 
@@ -126,6 +131,114 @@ class TestBuffer(unittest.TestCase):
             self.assertEqual(sample.old_log_prob.shape, (buffer_size,))
             self.assertEqual(sample.old_values.shape, (buffer_size,))
 
+    def test_replay_buffer_snapshot(self):
+        observation_space = spaces.Box(low=0, high=1, shape=(4,))
+        action_space = spaces.Box(low=-1, high=1, shape=(2,))
+        buffer = ReplayBuffer(100, observation_space, action_space, device="cpu")
+
+        def add(n):
+            for _ in range(n):
+                buffer.add(
+                    th.rand(1, 4),
+                    th.rand(1, 4),
+                    th.rand(1, 2),
+                    th.rand(1),
+                    th.zeros(1),
+                    [{"TimeLimit.truncated": False}],
+                )
+
+        snapshot_dir = tempfile.mkdtemp()
+        add(50)
+        meta = buffer.save_snapshot(snapshot_dir, chunk_size=16)
+        self.assertEqual(meta["n_chunks_written"], 4)
+
+        # only the chunks touched since the last snapshot are written again
+        add(20)
+        meta = buffer.save_snapshot(snapshot_dir, chunk_size=16)
+        self.assertEqual(meta["n_chunks_written"], 2)
+
+        # a snapshot that is never written is included in the next one
+        add(20)
+        buffer.snapshot_chunks(snapshot_dir, chunk_size=16)
+        add(10)
+        meta = buffer.save_snapshot(snapshot_dir, chunk_size=16)
+        self.assertEqual(meta["n_chunks_written"], 3)
+
+        # an interrupted write leaves the previous snapshot readable
+        observations = buffer.observations.clone()
+        add(50)
+        with mock.patch("rlopt.common.checkpoint.json.dump", side_effect=OSError):
+            with self.assertRaises(OSError):
+                buffer.save_snapshot(snapshot_dir, chunk_size=16)
+        restored = ReplayBuffer(100, observation_space, action_space, device="cpu")
+        restored.load_snapshot(snapshot_dir)
+        self.assertEqual(restored.pos, 0)
+        self.assertTrue(th.equal(restored.observations, observations))
+
+        # wrap around the ring buffer
+        buffer.save_snapshot(snapshot_dir, chunk_size=16)
+
+        restored = ReplayBuffer(100, observation_space, action_space, device="cpu")
+        restored.load_snapshot(snapshot_dir)
+        self.assertEqual((restored.pos, restored.full), (buffer.pos, buffer.full))
+        self.assertTrue(th.equal(restored.observations, buffer.observations))
+        self.assertTrue(th.equal(restored.next_observations, buffer.next_observations))
+        self.assertTrue(th.equal(restored.actions, buffer.actions))
+        self.assertTrue(th.equal(restored.rewards, buffer.rewards))
+
+    def test_recurrent_rollout_buffers(self):
+        buffer_size, n_envs, hidden_size = 16, 4, 8
+        box = spaces.Box(low=0, high=1, shape=(4,))
+        action_space = spaces.Box(low=-1, high=1, shape=(2,))
+        hidden_state_shape = (buffer_size, 1, n_envs, hidden_size)
+        lstm_states = RNNStates(
+            (th.rand(1, n_envs, hidden_size), th.rand(1, n_envs, hidden_size)),
+            (th.rand(1, n_envs, hidden_size), th.rand(1, n_envs, hidden_size)),
+        )
+
+        def fill(buffer, obs):
+            for t in range(buffer_size):
+                buffer.add(
+                    obs(),
+                    th.rand(n_envs, 2),
+                    th.rand(n_envs),
+                    th.full((n_envs,), float(t % 5 == 0)),
+                    th.rand(n_envs),
+                    th.rand(n_envs),
+                    lstm_states=lstm_states,
+                )
+            buffer.compute_returns_and_advantage(th.rand(n_envs), th.zeros(n_envs))
+
+        buffer = RecurrentRolloutBuffer(
+            buffer_size,
+            box,
+            action_space,
+            hidden_state_shape,
+            device="cpu",
+            n_envs=n_envs,
+        )
+        fill(buffer, lambda: th.rand(n_envs, 4))
+        n_samples = 0
+        for sample in buffer.get(batch_size=16):
+            self.assertEqual(sample.lstm_states.pi[0].shape[-1], hidden_size)
+            n_samples += int(sample.mask.sum())
+        self.assertEqual(n_samples, buffer_size * n_envs)
+
+        # batches of whole sequences (padded to the longest)
+        buffer = RecurrentSequenceDictRolloutBuffer(
+            buffer_size,
+            spaces.Dict({"obs1": box, "obs2": box}),
+            action_space,
+            hidden_state_shape,
+            device="cpu",
+            n_envs=n_envs,
+        )
+        fill(buffer, lambda: {"obs1": th.rand(n_envs, 4), "obs2": th.rand(n_envs, 4)})
+        for sample in buffer.get(batch_size=2):
+            seq_len = sample.mask.shape[0]
+            self.assertEqual(sample.observations["obs1"].shape, (seq_len, 2, 4))
+            self.assertEqual(sample.actions.shape, (seq_len, 2, 2))
+
 
 if __name__ == "__main__":
     unittest.main()
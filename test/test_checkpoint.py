@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+import torch as th
+
+from rlopt.common.checkpoint import AsyncCheckpointer, load_checkpoint
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.net = th.nn.Linear(8, 4)
+        self.optimizer = th.optim.Adam(self.net.parameters())
+        self.net(th.randn(2, 8)).sum().backward()
+        self.optimizer.step()
+
+    def components(self, step):
+        return {
+            "policy": self.net.state_dict(),
+            "optimizers": {"policy": self.optimizer.state_dict()},
+            "meta": {"step_count": step},
+        }
+
+    def test_rotation_and_selective_load(self):
+        checkpointer = AsyncCheckpointer(keep_last=2)
+        for step in range(4):
+            checkpointer.save_state(
+                os.path.join(self.directory, f"checkpoint_{step}"),
+                self.components(step),
+            )
+        checkpointer.close()
+        self.assertEqual(
+            sorted(os.listdir(self.directory)), ["checkpoint_2", "checkpoint_3"]
+        )
+        self.assertEqual(len(checkpointer.stall_times), 4)
+
+        loaded = load_checkpoint(
+            os.path.join(self.directory, "checkpoint_3"), components=["policy"]
+        )
+        self.assertEqual(list(loaded), ["policy"])
+        th.testing.assert_close(loaded["policy"]["weight"], self.net.weight.detach())
+
+    def test_snapshot_is_decoupled_from_training(self):
+        checkpointer = AsyncCheckpointer()
+        path = os.path.join(self.directory, "checkpoint")
+        expected = self.net.weight.detach().clone()
+        checkpointer.save_state(path, self.components(0))
+        with th.no_grad():
+            self.net.weight.add_(1.0)
+        checkpointer.wait()
+        loaded = load_checkpoint(path, components=["policy"])
+        th.testing.assert_close(loaded["policy"]["weight"], expected)
+
+    def test_legacy_single_file(self):
+        path = os.path.join(self.directory, "legacy.pt")
+        th.save({"policy": self.net.state_dict(), "step_count": 1}, path)
+        loaded = load_checkpoint(path, components=["policy"])
+        self.assertEqual(list(loaded), ["policy"])
+
+
+if __name__ == "__main__":
+    unittest.main()
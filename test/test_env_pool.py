@@ -0,0 +1,146 @@
+import unittest
+from functools import partial
+
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.monitor import Monitor
+from stable_baselines3.common.vec_env import DummyVecEnv
+from torchrl.envs.utils import check_env_specs
+
+from rlopt.envs.pool_env import EnvPoolEnv
+from rlopt.envs.pool_vec_env import SharedMemoryVecEnv
+
+
+def make_cartpole():
+    return Monitor(gym.make("CartPole-v1"))
+
+
+class TeacherStudentObservation(gym.ObservationWrapper):
+    """Teacher (full state) and student (positions only) observation groups."""
+
+    def __init__(self, env: gym.Env):
+        super().__init__(env)
+        box = env.observation_space
+        self.observation_space = gym.spaces.Dict(
+            {
+                "teacher": box,
+                "student": gym.spaces.Box(box.low[::2], box.high[::2], dtype=box.dtype),
+            }
+        )
+
+    def observation(self, observation):
+        return {"teacher": observation, "student": observation[::2].copy()}
+
+
+def make_teacher_student_cartpole():
+    return Monitor(TeacherStudentObservation(gym.make("CartPole-v1")))
+
+
+class FailingStep(gym.Wrapper):
+
+    def step(self, action):
+        raise ValueError("step failed")
+
+
+def make_failing_cartpole():
+    return FailingStep(gym.make("CartPole-v1"))
+
+
+class TestEnvPool(unittest.TestCase):
+
+    def test_vec_env_matches_dummy_vec_env(self):
+        # 6 environments in blocks of 4 and 2
+        env = SharedMemoryVecEnv([make_cartpole] * 6, envs_per_worker=4)
+        reference = DummyVecEnv([make_cartpole] * 6)
+        env.seed(0)
+        reference.seed(0)
+        np.testing.assert_array_equal(env.reset(), reference.reset())
+
+        rng = np.random.default_rng(0)
+        n_episodes = 0
+        for _ in range(100):
+            actions = rng.integers(0, 2, size=6)
+            obs, rewards, dones, infos = env.step(actions)
+            ref_obs, ref_rewards, ref_dones, ref_infos = reference.step(actions)
+            np.testing.assert_array_equal(obs, ref_obs)
+            np.testing.assert_array_equal(rewards, ref_rewards)
+            np.testing.assert_array_equal(dones, ref_dones)
+            for i in np.flatnonzero(dones):
+                np.testing.assert_array_equal(
+                    infos[i]["terminal_observation"],
+                    ref_infos[i]["terminal_observation"],
+                )
+                for key in ("r", "l"):
+                    self.assertEqual(
+                        infos[i]["episode"][key], ref_infos[i]["episode"][key]
+                    )
+                n_episodes += 1
+        self.assertGreater(n_episodes, 0)
+        self.assertEqual(env.env_is_wrapped(Monitor), [True] * 6)
+        env.close()
+
+    def test_dict_observations(self):
+        env = SharedMemoryVecEnv([make_teacher_student_cartpole] * 3, envs_per_worker=2)
+        reference = DummyVecEnv([make_teacher_student_cartpole] * 3)
+        env.seed(0)
+        reference.seed(0)
+        obs, ref_obs = env.reset(), reference.reset()
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            for key in ("teacher", "student"):
+                np.testing.assert_array_equal(obs[key], ref_obs[key])
+            actions = rng.integers(0, 2, size=3)
+            obs, _, dones, infos = env.step(actions)
+            ref_obs, _, ref_dones, ref_infos = reference.step(actions)
+            np.testing.assert_array_equal(dones, ref_dones)
+            for i in np.flatnonzero(dones):
+                for key in ("teacher", "student"):
+                    np.testing.assert_array_equal(
+                        infos[i]["terminal_observation"][key],
+                        ref_infos[i]["terminal_observation"][key],
+                    )
+        env.close()
+
+        env = EnvPoolEnv([make_teacher_student_cartpole] * 2)
+        check_env_specs(env)
+        env.close()
+
+    def test_worker_error(self):
+        env = SharedMemoryVecEnv([make_failing_cartpole, make_cartpole])
+        env.reset()
+        with self.assertRaisesRegex(RuntimeError, "step failed"):
+            env.step(np.zeros(2, dtype=np.int64))
+        # the reply of the healthy worker was read, later commands get fresh replies
+        self.assertEqual(env.env_is_wrapped(Monitor), [False, True])
+        self.assertEqual(env.reset().shape, (2, 4))
+        env.close()
+
+    def test_torchrl_env_partial_resets(self):
+        seed, num_envs, n_steps = 3, 4, 250
+        env = EnvPoolEnv(
+            [partial(gym.make, "Pendulum-v1")] * num_envs, envs_per_worker=3
+        )
+        check_env_specs(env)
+        env.set_seed(seed)
+        # Pendulum is truncated after 200 steps, the pool then resets those envs
+        rollout = env.rollout(n_steps, break_when_any_done=False)
+        env.close()
+        self.assertTrue(rollout["next", "truncated"][:, 199].all())
+
+        for i in range(num_envs):
+            reference = gym.make("Pendulum-v1")
+            obs, _ = reference.reset(seed=seed + i)
+            for t in range(n_steps):
+                np.testing.assert_allclose(rollout["observation"][i, t], obs, rtol=1e-6)
+                obs, reward, terminated, truncated, _ = reference.step(
+                    rollout["action"][i, t].numpy()
+                )
+                self.assertAlmostEqual(
+                    rollout["next", "reward"][i, t].item(), reward, places=4
+                )
+                if terminated or truncated:
+                    obs, _ = reference.reset()
+
+
+if __name__ == "__main__":
+    unittest.main()
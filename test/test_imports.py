@@ -0,0 +1,39 @@
+import subprocess
+import sys
+import unittest
+
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_packages_do_not_import_dependencies(self):
+        result = run_python(
+            "import sys\n"
+            "import rlopt, rlopt.agent, rlopt.common, rlopt.envs, rlopt.opt\n"
+            "heavy = ('torch', 'torchrl', 'stable_baselines3', 'sb3_contrib', "
+            "'gymnasium', 'hydra', 'wandb')\n"
+            "print(','.join(m for m in heavy if m in sys.modules))\n"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_missing_optional_dependency(self):
+        # a None entry in sys.modules makes the import of sb3_contrib fail
+        result = run_python(
+            "import sys\n"
+            "sys.modules['sb3_contrib'] = None\n"
+            "from rlopt.agent import RecurrentL2T\n"
+        )
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn(
+            "rlopt.agent.RecurrentL2T requires sb3_contrib, "
+            "install it with `pip install sb3-contrib`",
+            result.stderr,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
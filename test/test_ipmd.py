@@ -0,0 +1,286 @@
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import unittest
+import warnings
+from types import SimpleNamespace
+
+import torch
+from omegaconf import OmegaConf
+from tensordict import TensorDict
+from tensordict.nn import TensorDictModule
+from torchrl.data import Bounded, LazyTensorStorage, TensorDictReplayBuffer
+
+IPMD_DIR = os.path.join(os.path.dirname(__file__), "..", "rlopt", "agent", "ipmd")
+sys.path.insert(0, IPMD_DIR)
+
+from async_eval import AsyncEvaluator  # noqa: E402
+from expert_data import (  # noqa: E402
+    ExpertBatchPrefetcher,
+    ShardedExpertDataset,
+    write_expert_shards,
+)
+from replay_prefetch import PrefetchReplaySampler  # noqa: E402
+
+try:
+    with warnings.catch_warnings():
+        # torchrl deprecates parts of its collectors module on import
+        warnings.simplefilter("ignore", DeprecationWarning)
+        import ipmd
+except ImportError:  # the IPMD script needs torchrl's SyncDataCollector
+    ipmd = None
+
+OBS_DIM, ACTION_DIM = 5, 2
+
+
+def make_cfg(**optim):
+    cfg = OmegaConf.load(os.path.join(IPMD_DIR, "config.yaml"))
+    cfg.optim.batch_size = 16
+    cfg.network.hidden_sizes = [32, 32]
+    cfg.optim.update(optim)
+    return cfg
+
+
+def make_fake_env():
+    return SimpleNamespace(
+        action_spec=Bounded(-1.0, 1.0, (ACTION_DIM,)),
+        batch_size=torch.Size([]),
+        fake_tensordict=lambda: TensorDict(
+            {"observation": torch.zeros(OBS_DIM), "action": torch.zeros(ACTION_DIM)},
+            [],
+        ),
+    )
+
+
+def make_batch(batch_size: int) -> TensorDict:
+    return TensorDict(
+        {
+            "observation": torch.randn(batch_size, OBS_DIM),
+            "action": torch.rand(batch_size, ACTION_DIM) * 2 - 1,
+            ("next", "observation"): torch.randn(batch_size, OBS_DIM),
+            ("next", "reward"): torch.randn(batch_size, 1),
+            ("next", "done"): torch.zeros(batch_size, 1, dtype=torch.bool),
+            ("next", "terminated"): torch.zeros(batch_size, 1, dtype=torch.bool),
+        },
+        [batch_size],
+    )
+
+
+def make_update(cfg, seed: int = 0):
+    torch.manual_seed(seed)
+    env = make_fake_env()
+    model, _ = ipmd.make_ipmd_agent(cfg, env, env, "cpu")
+    loss_module, target_net_updater = ipmd.make_loss_module(cfg, model)
+    optimizers = ipmd.make_ipmd_optimizer(cfg, loss_module)
+    update = ipmd.make_ipmd_update(cfg, loss_module, target_net_updater, optimizers)
+    multi_update = ipmd.make_ipmd_multi_update(
+        cfg, loss_module, target_net_updater, optimizers
+    )
+    return loss_module, update, multi_update
+
+
+def assert_same_state(module, other):
+    """Compare parameters and buffers, including the target networks."""
+    other_state = other.state_dict()
+    for name, value in module.state_dict().items():
+        torch.testing.assert_close(value, other_state[name])
+
+
+@unittest.skipIf(ipmd is None, "the IPMD script cannot be imported")
+class TestIPMDUpdate(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+
+    def test_fused_matches_sequential(self):
+        batches = [make_batch(16) for _ in range(3)]
+        sequential_loss, sequential_update, _ = make_update(make_cfg())
+        fused_loss, fused_update, _ = make_update(make_cfg(fused_update=True))
+        for i, batch in enumerate(batches):
+            # the losses sample actions, replay the same draws for both updates
+            torch.manual_seed(i)
+            expected = sequential_update(batch.clone(), batch.exclude("next"))
+            torch.manual_seed(i)
+            actual = fused_update(batch.clone(), batch.exclude("next"))
+            for key in ipmd.IPMD_LOSS_KEYS:
+                torch.testing.assert_close(actual[key], expected[key])
+        assert_same_state(fused_loss, sequential_loss)
+
+    def test_reward_estimated_in_one_pass(self):
+        loss_module, _, _ = make_update(make_cfg())
+        batch, expert = make_batch(16), make_batch(8).exclude("next")
+        loss_td = loss_module(batch, expert)
+
+        policy_reward = loss_module.estimate_rewards(batch)
+        expert_reward = loss_module.estimate_rewards(expert)
+        torch.testing.assert_close(batch.get(("next", "reward")), policy_reward)
+        torch.testing.assert_close(
+            loss_td["loss_reward"],
+            loss_module.compute_reward_loss(policy_reward, expert_reward),
+        )
+
+    def test_multi_update_matches_sequential(self):
+        batches = make_batch(5 * 16).reshape(5, 16)
+        experts = make_batch(3 * 8).reshape(3, 8).exclude("next")
+        # the fused update runs as a functional scan, the default one as a loop
+        for fused_update in (True, False):
+            with self.subTest(fused_update=fused_update):
+                cfg = make_cfg(fused_update=fused_update)
+                sequential_loss, update, _ = make_update(cfg)
+                batched_loss, _, multi_update = make_update(cfg)
+
+                torch.manual_seed(1)
+                expected = [update(batches[i].clone(), experts[i]) for i in range(3)]
+                # without an expert batch the reward network is not updated
+                expected += [update(batches[i].clone()) for i in range(3, 5)]
+                torch.manual_seed(1)
+                actual = multi_update(batches[:3].clone(), experts).unbind(0)
+                actual += multi_update(batches[3:].clone()).unbind(0)
+
+                self.assertEqual(len(actual), 5)
+                for actual_td, expected_td in zip(actual, expected):
+                    for key in actual_td.keys():
+                        torch.testing.assert_close(actual_td[key], expected_td[key])
+                assert_same_state(batched_loss, sequential_loss)
+
+
+class FailingStorage:
+    """Expert dataset or replay buffer whose reads fail."""
+
+    def sample(self, *args, **kwargs):
+        raise OSError("storage is unreadable")
+
+
+class TestExpertData(unittest.TestCase):
+
+    def test_sharded_sampling(self):
+        data = TensorDict({"observation": torch.arange(10.0).unsqueeze(-1)}, [10])
+        with tempfile.TemporaryDirectory() as directory:
+            paths = write_expert_shards(data, directory, shard_size=4)
+            self.assertEqual(len(paths), 3)
+            dataset = ShardedExpertDataset(directory)
+            self.assertEqual(len(dataset), 10)
+            rows = dataset.get(torch.tensor([9, 0, 4, 3]))
+            torch.testing.assert_close(
+                rows["observation"], data["observation"][[9, 0, 4, 3]]
+            )
+
+            prefetcher = ExpertBatchPrefetcher(dataset, batch_size=6, seed=0)
+            try:
+                batches = [prefetcher.next() for _ in range(3)]
+            finally:
+                prefetcher.close()
+            for batch in batches:
+                self.assertEqual(batch.shape, torch.Size([6]))
+
+    def test_prefetch_error_is_raised(self):
+        prefetcher = ExpertBatchPrefetcher(FailingStorage(), batch_size=6)
+        try:
+            with self.assertRaises(RuntimeError) as context:
+                prefetcher.next()
+            self.assertIsInstance(context.exception.__cause__, OSError)
+            # the worker has stopped, later calls fail instead of blocking
+            with self.assertRaises(RuntimeError):
+                prefetcher.next()
+        finally:
+            prefetcher.close()
+
+
+class TestPrefetchReplaySampler(unittest.TestCase):
+
+    def test_batches_from_buffer(self):
+        replay_buffer = TensorDictReplayBuffer(
+            storage=LazyTensorStorage(32), batch_size=8
+        )
+        replay_buffer.extend(
+            TensorDict({"observation": torch.arange(32.0).unsqueeze(-1)}, [32])
+        )
+        sampler = PrefetchReplaySampler(replay_buffer, prefetch=2)
+        try:
+            staged = []
+            for _ in range(4):
+                batch = sampler.next()
+                self.assertEqual(batch.shape, torch.Size([8]))
+                # the sampled rows are the stored ones
+                torch.testing.assert_close(
+                    batch["observation"].squeeze(-1), batch["index"].float()
+                )
+                staged.append(id(batch))
+        finally:
+            sampler.close()
+        # the batches are staged in a ring of two reused buffers
+        self.assertEqual(len(set(staged)), 2)
+
+    def test_prefetch_error_is_raised(self):
+        sampler = PrefetchReplaySampler(FailingStorage())
+        try:
+            with self.assertRaises(RuntimeError) as context:
+                sampler.next()
+            self.assertIsInstance(context.exception.__cause__, OSError)
+        finally:
+            sampler.close()
+
+
+def make_evaluator(target, args=()):
+    """An evaluator whose process runs ``target`` instead of evaluation rollouts."""
+    context = multiprocessing.get_context("spawn")
+    evaluator = AsyncEvaluator.__new__(AsyncEvaluator)
+    evaluator._requests = context.Queue()
+    evaluator._results = context.Queue()
+    evaluator._process = context.Process(target=target, args=args)
+    return evaluator
+
+
+class TestAsyncEvaluator(unittest.TestCase):
+
+    def test_evaluates_newest_snapshot(self):
+        cfg = OmegaConf.create(
+            {
+                "env": {
+                    "library": "gymnasium",
+                    "name": "Pendulum-v1",
+                    "max_episode_steps": 5,
+                    "seed": 0,
+                }
+            }
+        )
+        actor = TensorDictModule(
+            torch.nn.Linear(3, 1), in_keys=["observation"], out_keys=["action"]
+        )
+        evaluator = AsyncEvaluator(cfg, actor, num_episodes=2)
+        results = []
+        try:
+            evaluator.submit(actor, 1)
+            with torch.no_grad():
+                actor.module.weight.zero_()
+            evaluator.submit(actor, 2)
+            results += evaluator.poll()
+        finally:
+            results += evaluator.close()
+        # queued requests are coalesced, the last evaluation is the newest snapshot
+        self.assertEqual(results[-1][0], 2)
+        self.assertEqual(set(results[-1][1]), {"eval/reward", "eval/episode_length"})
+        self.assertEqual(results[-1][1]["eval/episode_length"], 5.0)
+
+    def test_close_after_process_died(self):
+        # the process exits without sending the closing sentinel
+        evaluator = make_evaluator(time.sleep, (0.5,))
+        evaluator._results.put((10, {"eval/reward": 1.0}))
+        evaluator._process.start()
+        self.assertEqual(evaluator.close(), [(10, {"eval/reward": 1.0})])
+        self.assertFalse(evaluator._process.is_alive())
+
+    def test_close_terminates_stuck_process(self):
+        evaluator = make_evaluator(time.sleep, (60,))
+        evaluator._process.start()
+        evaluator._results.put(None)
+        start = time.perf_counter()
+        self.assertEqual(evaluator.close(timeout=0.5), [])
+        self.assertLess(time.perf_counter() - start, 30)
+        self.assertFalse(evaluator._process.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
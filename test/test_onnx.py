@@ -0,0 +1,57 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import torch as th
+from gymnasium import spaces
+
+from rlopt.agent.l2t.policies import RecurrentActorCriticPolicy
+from rlopt.common.utils import (
+    OnnxableRecurrentPolicy,
+    compare_recurrent_onnx,
+    export_recurrent_to_onnx,
+)
+
+
+class TestRecurrentOnnx(unittest.TestCase):
+
+    def setUp(self):
+        th.manual_seed(0)
+        self.policy = RecurrentActorCriticPolicy(
+            spaces.Box(low=-1, high=1, shape=(8,)),
+            spaces.Box(low=-1, high=1, shape=(3,)),
+            lambda _: 3e-4,
+            lstm_hidden_size=16,
+        )
+
+    def test_wrapper_matches_policy(self):
+        obs = th.randn(4, 8)
+        states = (th.randn(1, 4, 16), th.randn(1, 4, 16))
+        episode_start = th.tensor([1.0, 0.0, 0.0, 1.0])
+        actions, (hidden, cell) = self.policy.predict_and_return_tensor(
+            obs, states, episode_start, deterministic=True
+        )
+        with th.no_grad():
+            onnx_actions, onnx_hidden, onnx_cell = OnnxableRecurrentPolicy(
+                self.policy
+            )(obs, *states, episode_start)
+        th.testing.assert_close(onnx_actions, actions)
+        th.testing.assert_close(onnx_hidden, hidden)
+        th.testing.assert_close(onnx_cell, cell)
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("onnxruntime"), "onnxruntime is not installed"
+    )
+    def test_onnx_parity(self):
+        onnx_filename = os.path.join(tempfile.mkdtemp(), "policy.onnx")
+        export_recurrent_to_onnx(self.policy, onnx_filename)
+        for batch_size in (1, 5):
+            result = compare_recurrent_onnx(
+                self.policy, onnx_filename, n_steps=20, batch_size=batch_size
+            )
+            self.assertTrue(result["parity"], result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,236 @@
+import unittest
+
+import torch as th
+
+from rlopt.opt.ac_fgd import AutoConditionedFastGradidentDescent
+from rlopt.opt.agd import AcceleratedGradientDescent
+from rlopt.opt.oracle import AutogradOracle, CachedOracle, Oracle
+from rlopt.opt.torch_optim import ACFGD, AGD
+
+
+class QuadraticOracle:
+    """f(x) = 0.5 x^T A x - b^T x, for one problem or a batch of problems."""
+
+    def __init__(self, A, b):
+        self.A = A
+        self.b = b
+
+    def f(self, x):
+        if x.dim() == 1:
+            return 0.5 * x @ self.A @ x - self.b @ x
+        return 0.5 * th.einsum("bi,bij,bj->b", x, self.A, x) - (self.b * x).sum(-1)
+
+    def df(self, x):
+        if x.dim() == 1:
+            return self.A @ x - self.b
+        return th.einsum("bij,bj->bi", self.A, x) - self.b
+
+
+class SeparateQuadraticOracle(QuadraticOracle, Oracle):
+    """``Oracle`` subclass with separate ``f`` and ``df``."""
+
+
+class TestBatchedSolve(unittest.TestCase):
+
+    def setUp(self):
+        th.manual_seed(0)
+        self.n_problems, self.dim = 16, 5
+        M = th.randn(self.n_problems, self.dim, self.dim, dtype=th.float64)
+        self.A = M @ M.transpose(1, 2) / self.dim + 0.5 * th.eye(
+            self.dim, dtype=th.float64
+        )
+        self.b = th.randn(self.n_problems, self.dim, dtype=th.float64)
+
+    def _compare(self, optimizer_class, atol, **kwargs):
+        x_init = th.zeros(self.n_problems, self.dim, dtype=th.float64)
+        x_batched, f_arr, grad_arr = optimizer_class(
+            QuadraticOracle(self.A, self.b), x_init, batched=True, **kwargs
+        ).solve()
+        self.assertEqual(f_arr.shape[1], self.n_problems)
+        self.assertEqual(grad_arr.shape, f_arr.shape)
+
+        for i in range(self.n_problems):
+            x_single, _, _ = optimizer_class(
+                QuadraticOracle(self.A[i], self.b[i]), x_init[i], **kwargs
+            ).solve()
+            th.testing.assert_close(x_batched[i], x_single, atol=atol, rtol=0)
+
+    def test_ac_fgd(self):
+        self._compare(
+            AutoConditionedFastGradidentDescent,
+            atol=1e-6,
+            projection=None,
+            alpha=0.5,
+            n_iter=200,
+            tol=1e-8,
+        )
+
+    def test_agd(self):
+        self._compare(
+            AcceleratedGradientDescent, atol=1e-12, n_iter=200, tol=1e-8, eta_0=0.1
+        )
+
+    def test_converged_problems_are_frozen(self):
+        x_init = th.zeros(self.n_problems, self.dim, dtype=th.float64)
+        # the first problem starts at its optimum
+        x_init[0] = th.linalg.solve(self.A[0], self.b[0])
+        optimizer = AcceleratedGradientDescent(
+            QuadraticOracle(self.A, self.b),
+            x_init,
+            n_iter=50,
+            tol=1e-6,
+            eta_0=0.1,
+            batched=True,
+        )
+        x, _, grad_arr = optimizer.solve()
+        self.assertEqual(len(grad_arr), 50)
+        self.assertTrue(th.all(grad_arr[10:, 0] == grad_arr[9, 0]))
+        th.testing.assert_close(x[0], x_init[0])
+
+    def test_check_every(self):
+        x_init = th.zeros(self.n_problems, self.dim, dtype=th.float64)
+        results = [
+            AutoConditionedFastGradidentDescent(
+                QuadraticOracle(self.A, self.b),
+                x_init,
+                projection=None,
+                alpha=0.5,
+                n_iter=1000,
+                tol=1e-4,
+                batched=True,
+            ).solve(check_every=check_every)
+            for check_every in (1, 7)
+        ]
+        self.assertLess(len(results[0][1]), 1000)
+        for expected, actual in zip(*results):
+            th.testing.assert_close(actual, expected, atol=0, rtol=0)
+
+    def test_speculative_line_search(self):
+        x_init = th.zeros(self.n_problems, self.dim, dtype=th.float64)
+        # a larger curvature forces some problems to the sequential fallback
+        for scale in (1.0, 100.0):
+            optimizer = AutoConditionedFastGradidentDescent(
+                QuadraticOracle(scale * self.A, self.b),
+                x_init,
+                projection=None,
+                alpha=0.5,
+                batched=True,
+                line_search="speculative",
+            )
+            eta = optimizer.speculative_line_search_eta()
+            self.assertEqual(optimizer.oracle.counters["df_stacked"], 1)
+
+            # accepted step sizes are inside the bracket of the sequential search
+            next_x = x_init - optimizer._per_problem(eta) * optimizer._grad
+            L = optimizer.est_L(
+                next_x, ..., optimizer.oracle.df(next_x), first_iter=True
+            )
+            beta = optimizer.beta
+            self.assertTrue(
+                ((beta / (4 * (1 - beta) * L) <= eta) & (eta <= 1 / (3 * L))).all()
+            )
+
+
+class TestOracle(unittest.TestCase):
+
+    def test_autograd_oracle(self):
+        th.manual_seed(0)
+        A, b = th.eye(3, dtype=th.float64) * 2, th.randn(3, dtype=th.float64)
+        oracle = AutogradOracle(lambda x: 0.5 * x @ A @ x - b @ x)
+        x = th.randn(3, dtype=th.float64)
+        f, df = oracle.f_and_df(x)
+        reference = QuadraticOracle(A, b)
+        th.testing.assert_close(f, reference.f(x))
+        th.testing.assert_close(df, reference.df(x))
+
+    def test_cache_and_counters(self):
+        A = th.eye(3, dtype=th.float64)
+        b = th.ones(3, dtype=th.float64)
+        oracle = CachedOracle(AutogradOracle(lambda x: 0.5 * x @ A @ x - b @ x))
+        x = th.zeros(3, dtype=th.float64)
+        oracle.f(x)
+        oracle.df(x)
+        oracle.f_and_df(x)
+        self.assertEqual(oracle.counters["f"], 1)
+        self.assertEqual(oracle.counters["f_and_df"], 1)
+        self.assertEqual(oracle.counters["cache_hits"], 1)
+        # an in-place update invalidates the entry
+        x.add_(1.0)
+        th.testing.assert_close(oracle.df(x), x - b)
+
+        _, _, _, counters = AcceleratedGradientDescent(
+            AutogradOracle(lambda x: 0.5 * x @ A @ x - b @ x),
+            th.zeros(3, dtype=th.float64),
+            n_iter=20,
+            eta_0=0.1,
+        ).solve(return_counters=True)
+        # one gradient at the extrapolated point and one fused call at the iterate
+        self.assertEqual(counters["f"], 0)
+        self.assertEqual(counters["f_and_df"], 40)
+
+    def test_separate_oracle_is_not_fused(self):
+        A = th.eye(3, dtype=th.float64)
+        b = th.ones(3, dtype=th.float64)
+        oracle = CachedOracle(SeparateQuadraticOracle(A, b))
+        self.assertFalse(oracle.fused)
+        x = th.zeros(3, dtype=th.float64)
+        th.testing.assert_close(oracle.df(x), -b)
+        oracle.f(x)
+        # the gradient alone does not evaluate f
+        self.assertEqual(oracle.counters["df"], 1)
+        self.assertEqual(oracle.counters["f"], 1)
+        self.assertEqual(oracle.counters["f_and_df"], 0)
+
+
+class TestTorchOptimizers(unittest.TestCase):
+
+    def setUp(self):
+        th.manual_seed(0)
+        M = th.randn(6, 6, dtype=th.float64)
+        self.A = M @ M.T / 6 + 0.5 * th.eye(6, dtype=th.float64)
+        self.b = th.randn(6, dtype=th.float64)
+
+    def _loss(self, x):
+        return 0.5 * x @ self.A @ x - self.b @ x
+
+    def test_agd_matches_solver(self):
+        x_ref, _, _ = AcceleratedGradientDescent(
+            AutogradOracle(self._loss),
+            th.zeros(6, dtype=th.float64),
+            n_iter=30,
+            tol=0.0,
+            eta_0=0.05,
+        ).solve()
+        param = th.nn.Parameter(th.zeros(6, dtype=th.float64))
+        optimizer = AGD([param], lr=0.05)
+        for _ in range(30):
+            optimizer.zero_grad()
+            self._loss(param).backward()
+            optimizer.step()
+        th.testing.assert_close(optimizer.state[param]["output"], x_ref)
+
+    def test_acfgd_converges(self):
+        x_opt = th.linalg.solve(self.A, self.b)
+        for use_closure in (True, False):
+            param = th.nn.Parameter(th.zeros(6, dtype=th.float64))
+            optimizer = ACFGD([param], lr=0.1)
+
+            def closure(optimizer=optimizer, param=param):
+                optimizer.zero_grad()
+                loss = self._loss(param)
+                loss.backward()
+                return loss
+
+            for _ in range(200):
+                if use_closure:
+                    optimizer.step(closure)
+                else:
+                    closure()
+                    optimizer.step()
+            with th.no_grad():
+                gap = (self._loss(param) - self._loss(x_opt)).item()
+            self.assertLess(gap, 1e-2)
+
+
+if __name__ == "__main__":
+    unittest.main()
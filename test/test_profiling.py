@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import unittest
+
+import torch
+
+from rlopt.common import profiling
+from rlopt.common.profiling import TrainingProfiler, iter_phase, record_phase
+
+
+def training_iteration(model: torch.nn.Module, optimizer: torch.optim.Optimizer):
+    with record_phase("collection"):
+        batches = [torch.randn(16, 4) for _ in range(2)]
+    for batch in iter_phase("minibatch_sampling", batches):
+        with record_phase("forward"):
+            loss = model(batch).pow(2).mean()
+        optimizer.zero_grad()
+        with record_phase("backward"):
+            loss.backward()
+        with record_phase("optimizer_step"):
+            optimizer.step()
+
+
+class TestTrainingProfiler(unittest.TestCase):
+
+    def test_disabled(self):
+        profiler = TrainingProfiler.from_config({"enabled": False})
+        self.assertFalse(profiler.enabled)
+        profiler.start()
+        self.assertFalse(profiler.running)
+        # the labels are no-ops without a running profiler
+        self.assertEqual(list(iter_phase("minibatch_sampling", range(3))), [0, 1, 2])
+
+    def test_export(self):
+        model = torch.nn.Linear(4, 1)
+        optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+        with tempfile.TemporaryDirectory() as output_dir:
+            profiler = TrainingProfiler.from_config(
+                {"enabled": True, "iterations": [1, 2, 4], "output_dir": output_dir}
+            )
+            profiler.start(tag="train")
+            for _ in range(6):
+                training_iteration(model, optimizer)
+                profiler.step()
+            # stopped after the last recorded iteration
+            self.assertFalse(profiler.running)
+            self.assertEqual(
+                sorted(os.listdir(output_dir)),
+                [
+                    "top_ops_train_1-2.txt",
+                    "top_ops_train_4-4.txt",
+                    "trace_train_1-2.json",
+                    "trace_train_4-4.json",
+                ],
+            )
+            with open(os.path.join(output_dir, "trace_train_1-2.json")) as f:
+                names = {event.get("name") for event in json.load(f)["traceEvents"]}
+            for phase in (
+                "collection",
+                "minibatch_sampling",
+                "forward",
+                "backward",
+                "optimizer_step",
+            ):
+                self.assertIn(phase, names)
+            # the profiler is saved with the agents
+            self.assertIsNone(profiler.__getstate__()["_profiler"])
+
+    def test_stop_exports_pending_window(self):
+        model = torch.nn.Linear(4, 1)
+        optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+        with tempfile.TemporaryDirectory() as output_dir:
+            profiler = TrainingProfiler.from_config(
+                {"enabled": True, "iterations": [1, 2, 3], "output_dir": output_dir}
+            )
+            with self.assertRaises(KeyboardInterrupt):
+                try:
+                    profiler.start()
+                    for i in range(6):
+                        training_iteration(model, optimizer)
+                        if i == 2:
+                            raise KeyboardInterrupt
+                        profiler.step()
+                finally:
+                    profiler.stop()
+            # the labels are switched off again
+            self.assertEqual(profiling._num_active, 0)
+            self.assertEqual(
+                sorted(os.listdir(output_dir)), ["top_ops_1-2.txt", "trace_1-2.json"]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import warnings
+
+import torch as th
+from gymnasium import spaces
+
+from rlopt.agent.l2t.policies import RecurrentActorCriticPolicy
+from rlopt.common.quantization import (
+    prune_policy_heads,
+    quantize_policy,
+    rollout_action_parity,
+)
+
+
+class TestQuantization(unittest.TestCase):
+
+    def setUp(self):
+        th.manual_seed(0)
+        self.policy = RecurrentActorCriticPolicy(
+            spaces.Box(low=-1, high=1, shape=(8,)),
+            spaces.Box(low=-1, high=1, shape=(3,)),
+            lambda _: 3e-4,
+            lstm_hidden_size=32,
+        )
+
+    def test_quantized_policy_parity(self):
+        with warnings.catch_warnings():
+            # torchao has no dynamic LSTM quantization to migrate to
+            warnings.filterwarnings(
+                "ignore",
+                message="torch.ao.quantization is deprecated",
+                category=DeprecationWarning,
+            )
+            warnings.filterwarnings(
+                "ignore", message="torch.quantize_per_tensor", category=UserWarning
+            )
+            quantized = quantize_policy(self.policy)
+        self.assertIsInstance(self.policy.lstm_actor, th.nn.LSTM)
+        self.assertNotIsInstance(quantized.lstm_actor, th.nn.LSTM)
+
+        episode_starts = th.zeros(16, 4)
+        episode_starts[0] = 1.0
+        episode_starts[8, 2] = 1.0
+        parity = rollout_action_parity(
+            self.policy, quantized, th.randn(16, 4, 8), episode_starts
+        )
+        self.assertLess(parity["max_action_diff"], 5e-2)
+
+    def test_prune_policy_heads(self):
+        sparsity = prune_policy_heads(self.policy, amount=0.5)
+        self.assertIn("action_net", sparsity)
+        for value in sparsity.values():
+            self.assertAlmostEqual(value, 0.5, places=2)
+        self.assertFalse(hasattr(self.policy.action_net, "weight_orig"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import torch as th
+from gymnasium import spaces
+from stable_baselines3.common.policies import ActorCriticPolicy
+
+from rlopt.agent.l2t.policies import RecurrentActorCriticPolicy
+from rlopt.common.utils import export_recurrent_to_onnx
+from rlopt.runtime import RuntimePolicy, export_runtime_policy, load_policy
+
+
+class TestRuntimePolicy(unittest.TestCase):
+
+    def setUp(self):
+        th.manual_seed(0)
+        self.directory = tempfile.mkdtemp()
+        self.policy = RecurrentActorCriticPolicy(
+            spaces.Box(low=-1, high=1, shape=(8,)),
+            spaces.Box(low=-1, high=1, shape=(3,)),
+            lambda _: 3e-4,
+            lstm_hidden_size=16,
+        )
+
+    def test_recurrent_matches_policy(self):
+        path = os.path.join(self.directory, "policy.pt")
+        export_runtime_policy(self.policy, path)
+        runtime = load_policy(path)
+        self.assertIsInstance(runtime, RuntimePolicy)
+
+        states, runtime_state = (th.zeros(1, 4, 16), th.zeros(1, 4, 16)), None
+        for step in range(5):
+            obs = th.randn(4, 8)
+            episode_start = th.tensor([float(step == 0), 0.0, float(step == 3), 0.0])
+            actions, states = self.policy.predict_and_return_tensor(
+                obs, states, episode_start, deterministic=True
+            )
+            runtime_actions, runtime_state = runtime.act(
+                obs, runtime_state, episode_start
+            )
+            th.testing.assert_close(runtime_actions, actions)
+            th.testing.assert_close(runtime_state[0], states[0])
+
+    def test_discrete_feed_forward(self):
+        policy = ActorCriticPolicy(
+            spaces.Box(low=-1, high=1, shape=(6,)),
+            spaces.Discrete(4),
+            lambda _: 3e-4,
+            net_arch=[32, 32],
+            activation_fn=th.nn.ReLU,
+        )
+        path = os.path.join(self.directory, "policy.pt")
+        export_runtime_policy(policy, path)
+        obs = th.randn(10, 6)
+        actions, state = load_policy(path).act(obs)
+        self.assertIsNone(state)
+        th.testing.assert_close(actions, policy._predict(obs, deterministic=True))
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("onnxruntime"), "onnxruntime is not installed"
+    )
+    def test_onnx_policy(self):
+        path = os.path.join(self.directory, "policy.pt")
+        onnx_filename = os.path.join(self.directory, "policy.onnx")
+        export_runtime_policy(self.policy, path)
+        export_recurrent_to_onnx(self.policy, onnx_filename)
+        obs = th.randn(3, 8)
+        actions, (hidden_state, _) = load_policy(path).act(obs)
+        onnx_actions, (onnx_hidden_state, _) = load_policy(onnx_filename).act(obs)
+        th.testing.assert_close(th.as_tensor(onnx_actions), actions, atol=1e-5, rtol=0)
+        th.testing.assert_close(
+            th.as_tensor(onnx_hidden_state), hidden_state, atol=1e-5, rtol=0
+        )
+
+    def test_runtime_does_not_import_training_dependencies(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, rlopt.runtime\n"
+                "heavy = ('torchrl', 'stable_baselines3', 'sb3_contrib', "
+                "'gymnasium', 'hydra', 'wandb')\n"
+                "print(','.join(m for m in heavy if m in sys.modules))\n",
+            ],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
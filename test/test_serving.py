@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import unittest
+
+import torch as th
+from gymnasium import spaces
+
+from rlopt.agent.l2t.policies import RecurrentActorCriticPolicy
+from rlopt.common.serving import HiddenStateSlotTable, InferenceServer
+
+
+class TestServing(unittest.TestCase):
+
+    def setUp(self):
+        th.manual_seed(0)
+        self.policy = RecurrentActorCriticPolicy(
+            spaces.Box(low=-1, high=1, shape=(8,)),
+            spaces.Box(low=-1, high=1, shape=(3,)),
+            lambda _: 3e-4,
+            lstm_hidden_size=16,
+        )
+
+    def test_slot_table_lru_eviction(self):
+        table = HiddenStateSlotTable(num_slots=2, n_layers=1, hidden_size=4)
+        slot_a, new_a = table.acquire("a")
+        table.acquire("b")
+        self.assertTrue(new_a)
+        self.assertEqual(table.acquire("a"), (slot_a, False))
+        # "b" is now least recently used and gets evicted
+        table.acquire("c")
+        self.assertIn("a", table)
+        self.assertNotIn("b", table)
+        self.assertEqual(len(table), 2)
+
+    def test_slots_cover_a_batch(self):
+        with self.assertRaises(AssertionError):
+            InferenceServer(self.policy, max_batch_size=8, num_slots=4)
+
+    def test_batched_matches_sequential(self):
+        n_clients, n_steps = 4, 3
+        observations = th.randn(n_steps, n_clients, 8)
+
+        # reference: each client stepped on its own
+        expected = []
+        for client in range(n_clients):
+            state = None
+            actions = []
+            for step in range(n_steps):
+                action, state = self.policy.predict_and_return_tensor(
+                    observations[step, client : client + 1],
+                    state=state,
+                    episode_start=th.tensor([float(step == 0)]),
+                    deterministic=True,
+                )
+                actions.append(action.reshape(-1))
+            expected.append(th.stack(actions))
+
+        async def run():
+            with InferenceServer(
+                self.policy, max_batch_size=n_clients, max_latency_ms=5.0
+            ) as server:
+
+                async def client(i):
+                    actions = []
+                    for step in range(n_steps):
+                        actions.append(
+                            await server.act(
+                                i, observations[step, i], episode_start=step == 0
+                            )
+                        )
+                    return th.stack([a.reshape(-1) for a in actions])
+
+                return await asyncio.gather(*[client(i) for i in range(n_clients)])
+
+        served = asyncio.run(run())
+        for client in range(n_clients):
+            th.testing.assert_close(served[client], expected[client])
+
+    def test_end_session_waits_for_batch(self):
+        entered, resume = threading.Event(), threading.Event()
+        predict = self.policy.predict_and_return_tensor
+
+        def blocking_predict(*args, **kwargs):
+            entered.set()
+            resume.wait()
+            return predict(*args, **kwargs)
+
+        self.policy.predict_and_return_tensor = blocking_predict
+        with InferenceServer(self.policy, max_latency_ms=0.0) as server:
+            client = threading.Thread(
+                target=lambda: asyncio.run(server.act("a", th.zeros(8)))
+            )
+            client.start()
+            self.assertTrue(entered.wait(timeout=10))
+            end = threading.Thread(target=server.end_session, args=("a",))
+            end.start()
+            # the slot of "a" is in use by the running batch
+            end.join(timeout=0.1)
+            self.assertTrue(end.is_alive())
+            resume.set()
+            client.join(timeout=10)
+            end.join(timeout=10)
+            self.assertNotIn("a", server.slot_table)
+
+
+if __name__ == "__main__":
+    unittest.main()
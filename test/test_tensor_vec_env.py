@@ -0,0 +1,63 @@
+import unittest
+
+import torch
+
+from rlopt.envs.mock_sim import MockBatchedSim
+from rlopt.envs.tensor_vec_env import TensorVecEnv
+
+
+class TestTensorVecEnv(unittest.TestCase):
+
+    def test_matches_simulator(self):
+        num_envs = 4096
+        env = TensorVecEnv(
+            MockBatchedSim(num_envs, max_episode_length=50, seed=1),
+            groups={"teacher": "policy", "student": "student"},
+        )
+        reference = MockBatchedSim(num_envs, max_episode_length=50, seed=1)
+        obs = env.reset()
+        ref_obs, _ = reference.reset()
+        self.assertEqual(obs["teacher"].shape, (num_envs, 48))
+        self.assertEqual(obs["student"].shape, (num_envs, 30))
+        # both groups are views into the same preallocated buffer
+        for view in obs.values():
+            self.assertEqual(
+                view.untyped_storage().data_ptr(),
+                env.buffer.untyped_storage().data_ptr(),
+            )
+
+        n_time_outs = 0
+        last_obs = {k: v.clone() for k, v in obs.items()}
+        for _ in range(60):
+            actions = torch.rand(num_envs, 12) * 2 - 1
+            new_obs, rewards, dones, infos = env.step(actions)
+            ref_obs, ref_rewards, terminated, truncated, _ = reference.step(actions)
+            # the previous observations are still valid after one step
+            for name, value in last_obs.items():
+                torch.testing.assert_close(obs[name], value)
+            torch.testing.assert_close(new_obs["teacher"], ref_obs["policy"])
+            torch.testing.assert_close(new_obs["student"], ref_obs["student"])
+            torch.testing.assert_close(rewards, ref_rewards)
+            torch.testing.assert_close(dones, (terminated | truncated).long())
+            torch.testing.assert_close(infos["time_outs"], truncated)
+            n_time_outs += int(truncated.sum())
+            obs, last_obs = new_obs, {k: v.clone() for k, v in new_obs.items()}
+        # randomized initial episode lengths spread the time outs
+        self.assertGreater(n_time_outs, num_envs // 2)
+
+    def test_attributes_are_shared(self):
+        env = TensorVecEnv(MockBatchedSim(4, seed=1))
+        self.assertIsNone(env.render_mode)
+        self.assertEqual(env.get_attr("max_episode_length", [0, 2]), [1000, 1000])
+        env.set_attr("max_episode_length", 50)
+        self.assertEqual(env.get_attr("max_episode_length"), [50] * 4)
+        self.assertEqual(len(env.env_method("reset")), 4)
+        # a subset of the environments cannot be modified on its own
+        with self.assertRaises(ValueError):
+            env.set_attr("max_episode_length", 10, indices=[1])
+        with self.assertRaises(ValueError):
+            env.env_method("reset", indices=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
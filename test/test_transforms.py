@@ -0,0 +1,141 @@
+import multiprocessing as mp
+import unittest
+
+import torch
+from tensordict import TensorDict
+from torchrl.envs import SerialEnv, TransformedEnv
+from torchrl.envs.libs.gym import GymEnv
+from torchrl.envs.utils import check_env_specs
+
+from rlopt.envs.norm_stats import SharedRunningStats
+from rlopt.envs.transforms import FusedObservationNorm
+
+
+def push_observations(stats: SharedRunningStats, seed: int):
+    torch.manual_seed(seed)
+    transform = FusedObservationNorm(shared_stats=stats, sync_interval=3)
+    for _ in range(10):
+        transform.update_stats(
+            TensorDict({"observation": torch.randn(8, 3) * seed}, [8])
+        )
+    transform.sync()
+
+
+class TestFusedObservationNorm(unittest.TestCase):
+
+    def test_running_statistics(self):
+        torch.manual_seed(0)
+        transform = FusedObservationNorm(clip=2.0)
+        batches = [torch.randn(n, 3, dtype=torch.float64) * 4 + 1 for n in (1, 7, 64)]
+        for batch in batches:
+            td = TensorDict({"observation": batch.clone()}, [len(batch)])
+            transform.update_stats(td)
+            out = transform(td)
+        var, mean = torch.var_mean(torch.cat(batches), dim=0, correction=0)
+        stats = transform.export_stats()
+        torch.testing.assert_close(stats["mean"], mean)
+        torch.testing.assert_close(stats["var"], var)
+        self.assertEqual(stats["count"].item(), 72)
+
+        expected = ((batches[-1] - mean) / var.sqrt()).clamp(-2, 2).float()
+        self.assertEqual(out["observation"].dtype, torch.float32)
+        torch.testing.assert_close(out["observation"], expected)
+
+        # frozen copy used for deployment
+        deployed = FusedObservationNorm()
+        deployed.load_stats(stats)
+        deployed.freeze()
+        td = TensorDict({"observation": batches[0].clone()}, [1])
+        deployed(td)
+        self.assertEqual(deployed.export_stats()["count"].item(), 72)
+        torch.testing.assert_close(
+            td["observation"], ((batches[0] - mean) / var.sqrt()).clamp(-2, 2).float()
+        )
+
+    def test_replayed_data(self):
+        transform = FusedObservationNorm()
+        transform.update_stats(TensorDict({"observation": torch.randn(16, 3)}, [16]))
+        stored = torch.randn(4, 3) + 5
+        raw = stored.clone()
+        out = transform(TensorDict({"observation": stored}, [4]))
+        # the stored observations and the statistics are left unchanged
+        torch.testing.assert_close(stored, raw)
+        self.assertEqual(transform.export_stats()["count"].item(), 16)
+        torch.testing.assert_close(
+            out["observation"], (raw - transform.loc) / transform.scale
+        )
+
+    def test_episode_bookkeeping(self):
+        env = TransformedEnv(
+            SerialEnv(2, lambda: GymEnv("Pendulum-v1")),
+            FusedObservationNorm(max_steps=30),
+        )
+        check_env_specs(env)
+        env.set_seed(0)
+        rollout = env.rollout(70, break_when_any_done=False)
+        env.close()
+
+        step_count = rollout["next", "step_count"][..., 0]
+        expected_count = torch.arange(70) % 30 + 1
+        torch.testing.assert_close(step_count, expected_count.expand(2, 70))
+        self.assertTrue(rollout["next", "truncated"][:, 29].all())
+
+        reward = rollout["next", "reward"][..., 0]
+        episode_reward = rollout["next", "episode_reward"][..., 0]
+        torch.testing.assert_close(episode_reward[:, 29], reward[:, :30].sum(-1))
+        torch.testing.assert_close(episode_reward[:, 35], reward[:, 30:36].sum(-1))
+
+
+class TestSharedRunningStats(unittest.TestCase):
+
+    def test_workers_merge_into_master(self):
+        stats = SharedRunningStats((3,), start_method="spawn")
+        ctx = mp.get_context("spawn")
+        workers = [
+            ctx.Process(target=push_observations, args=(stats, seed)) for seed in (1, 2)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+
+        observations = []
+        for seed in (1, 2):
+            torch.manual_seed(seed)
+            observations += [torch.randn(8, 3) * seed for _ in range(10)]
+        var, mean = torch.var_mean(
+            torch.cat(observations).double(), dim=0, correction=0
+        )
+        count, master_mean, m2 = stats.snapshot()
+        self.assertEqual(count.item(), 160)
+        torch.testing.assert_close(master_mean, mean)
+        torch.testing.assert_close(m2 / count, var)
+
+    def test_eval_snapshot(self):
+        stats = SharedRunningStats((3,))
+        train = FusedObservationNorm(shared_stats=stats, sync_interval=2)
+        evaluation = FusedObservationNorm(shared_stats=stats).freeze()
+        td = TensorDict({"observation": torch.randn(4, 3) + 5}, [4])
+        train.update_stats(td)
+        # not synchronized yet
+        self.assertEqual(stats.snapshot()[0].item(), 0)
+        train.update_stats(td)
+        self.assertEqual(stats.snapshot()[0].item(), 8)
+
+        # the frozen transform reads the master copy and never writes it
+        evaluation.sync()
+        torch.testing.assert_close(evaluation.mean, train.mean)
+        evaluation(td.clone())
+        self.assertEqual(stats.snapshot()[0].item(), 8)
+
+        # checkpoints restore the shared statistics
+        saved = train.export_stats()
+        train.update_stats(td)
+        train.sync()
+        train.load_stats(saved)
+        self.assertEqual(stats.snapshot()[0].item(), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()